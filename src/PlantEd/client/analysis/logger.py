@@ -1,103 +1,156 @@
+"""
+Game logs, one row per Game.update.
+
+Rows are collected in typed NumPy columns and written in batches of
+buffer_rows, on flush and on close, so long games don't do a small write
+per update and keep no file open in between.
+
+Every log is a model_logs.csv. With binary=True the columns are also
+appended to model_logs/<column>.<dtype> as raw little endian arrays, with
+the actions as one line each in model_logs/action.txt. read_columns maps
+them into memory without parsing.
+"""
 import csv
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+
+from PlantEd.constants import LOG_BUFFER_ROWS, LOG_BINARY
+
+# name and dtype of every column, in the order of the csv
+COLUMNS = (
+    ("time", "<f8"),
+    ("temperature", "<f8"),
+    ("sun_intensity", "<f8"),
+    ("humidity", "<f8"),
+    ("precipitation", "<f8"),
+    ("accessible_water", "<f8"),
+    ("accessible_nitrate", "<f8"),
+    ("leaf_biomass", "<f8"),
+    ("stem_biomass", "<f8"),
+    ("root_biomass", "<f8"),
+    ("seed_biomass", "<f8"),
+    ("starch_pool", "<f8"),
+    ("max_starch_pool", "<f8"),
+    ("water_pool", "<f8"),
+    ("max_water_pool", "<f8"),
+    ("leaf_percent", "<f8"),
+    ("stem_percent", "<f8"),
+    ("root_percent", "<f8"),
+    ("seed_percent", "<f8"),
+    ("starch_percent", "<f8"),
+    ("n_leaves", "<i8"),
+    ("n_stems", "<i8"),
+    ("n_roots", "<i8"),
+    ("n_seeds", "<i8"),
+    ("green_thumbs", "<i8"),
+    ("open_spots", "<i8"),
+    ("action", "O"),
+    # added later, at the end so existing columns keep their position
+    ("stomata", "|b1"),
+    )
+COLUMN_NAMES = tuple(name for name, dtype in COLUMNS)
+
+BINARY_DIR = "model_logs"
+
+
+def read_columns(path) -> dict:
+    """
+    Memory-map the binary columns of the log in path. The actions are read
+    as a list of strings.
+    """
+    binary_path = os.path.join(path, BINARY_DIR)
+    columns = {}
+    for name, dtype in COLUMNS:
+        if name == "action":
+            with open(os.path.join(binary_path, "action.txt")) as file:
+                columns[name] = file.read().splitlines()
+            continue
+        file_path = os.path.join(binary_path, f"{name}.{dtype[1:]}")
+        if os.path.getsize(file_path) == 0:
+            columns[name] = np.empty(0, dtype=dtype)
+        else:
+            columns[name] = np.memmap(file_path, dtype=dtype, mode="r")
+    return columns
+
+
+def copy_log(path, new_path):
+    # e.g. for forks, flush the log first
+    shutil.copyfile(os.path.join(path, "model_logs.csv"), os.path.join(new_path, "model_logs.csv"))
+    if os.path.isdir(os.path.join(path, BINARY_DIR)):
+        shutil.copytree(os.path.join(path, BINARY_DIR), os.path.join(new_path, BINARY_DIR))
 
 
 class Log:
-    def __init__(self, path):
-        self.model_file = open(path + "/model_logs.csv", "w")
-        self.model_writer = csv.writer(self.model_file)
-        self.model_writer.writerow(
-            [
-                "time",
-                "temperature",
-                "sun_intensity",
-                "humidity",
-                "precipitation",
-                "accessible_water",
-                "accessible_nitrate",
-                "leaf_biomass",
-                "stem_biomass",
-                "root_biomass",
-                "seed_biomass",
-                "starch_pool",
-                "max_starch_pool",
-                "water_pool",
-                "max_water_pool",
-                "leaf_percent",
-                "stem_percent",
-                "root_percent",
-                "seed_percent",
-                "starch_percent",
-                "n_leaves",
-                "n_stems",
-                "n_roots",
-                "n_seeds",
-                "green_thumbs",
-                "open_spots",
-                "action"
-            ]
-        )
-
-    def append_model_row(
-        self,
-            time,
-            temperature,
-            sun_intensity,
-            humidity,
-            precipitation,
-            accessible_water,
-            accessible_nitrate,
-            leaf_biomass,
-            stem_biomass,
-            root_biomass,
-            seed_biomass,
-            starch_pool,
-            max_starch_pool,
-            water_pool,
-            max_water_pool,
-            leaf_percent,
-            stem_percent,
-            root_percent,
-            seed_percent,
-            starch_percent,
-            n_leaves,
-            n_stems,
-            n_roots,
-            n_seeds,
-            green_thumbs,
-            open_spots,
-            action,
-    ):
-        self.model_writer.writerow(
-            [
-                time,
-                temperature,
-                sun_intensity,
-                humidity,
-                precipitation,
-                accessible_water,
-                accessible_nitrate,
-                leaf_biomass,
-                stem_biomass,
-                root_biomass,
-                seed_biomass,
-                starch_pool,
-                max_starch_pool,
-                water_pool,
-                max_water_pool,
-                leaf_percent,
-                stem_percent,
-                root_percent,
-                seed_percent,
-                starch_percent,
-                n_leaves,
-                n_stems,
-                n_roots,
-                n_seeds,
-                green_thumbs,
-                open_spots,
-                action,
-            ]
-        )
+    def __init__(self, path, append=False, buffer_rows=LOG_BUFFER_ROWS, binary=LOG_BINARY):
+        # append continues the log of a restored or forked game
+        self.csv_path = os.path.join(path, "model_logs.csv")
+        self.binary_path = os.path.join(path, BINARY_DIR) if binary else None
+        self.buffer_rows = max(1, buffer_rows)
+        self.columns = {name: np.empty(self.buffer_rows, dtype=dtype) for name, dtype in COLUMNS}
+        self.n_rows = 0
+
+        if not (append and os.path.exists(self.csv_path)):
+            with open(self.csv_path, "w", newline="") as file:
+                csv.writer(file).writerow(COLUMN_NAMES)
+        if self.binary_path is not None:
+            os.makedirs(self.binary_path, exist_ok=True)
+            for name, dtype in COLUMNS:
+                file_name = "action.txt" if name == "action" else f"{name}.{dtype[1:]}"
+                open(os.path.join(self.binary_path, file_name), "a" if append else "w").close()
+            with open(os.path.join(self.binary_path, "columns.json"), "w") as file:
+                json.dump(COLUMNS, file)
+
+    def append_model_row(self, **row):
+        """
+        Takes one keyword argument per entry of COLUMNS.
+        """
+        for name in COLUMN_NAMES:
+            self.columns[name][self.n_rows] = row[name]
+        self.n_rows += 1
+        if self.n_rows == self.buffer_rows:
+            self.flush()
+
+    def flush(self):
+        if self.n_rows == 0:
+            return
+        n = self.n_rows
+        # tolist gives python numbers, written exactly like single rows were
+        values = [self.columns[name][:n].tolist() for name in COLUMN_NAMES]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(zip(*values))
+        with open(self.csv_path, "a", newline="") as file:
+            file.write(buffer.getvalue())
+
+        if self.binary_path is not None:
+            for name, dtype in COLUMNS:
+                if name == "action":
+                    with open(os.path.join(self.binary_path, "action.txt"), "a") as file:
+                        file.writelines(str(action) + "\n" for action in self.columns[name][:n])
+                else:
+                    with open(os.path.join(self.binary_path, f"{name}.{dtype[1:]}"), "ab") as file:
+                        file.write(self.columns[name][:n].tobytes())
+        self.n_rows = 0
+        # don't keep references to the actions of written rows
+        self.columns["action"][:] = None
+
+    def close_model_file(self):
+        self.flush()
+
+
+class NullLog:
+    """
+    Stands in for Log when a game is not logged, e.g. in ensembles.
+    """
+
+    def append_model_row(self, **row):
+        pass
+
+    def flush(self):
+        pass
 
     def close_model_file(self):
-        self.model_file.close()
+        pass
@@ -2,23 +2,33 @@ import requests
 import json
 import pandas as pd
 
+from PlantEd.constants import SCORE_UPLOAD_URL, UPLOAD_TIMEOUT
 
-def upload_score(name, score, path_to_logs, icon_name):
-    files = {
-        "logfile": open(path_to_logs + '/model_logs.csv', 'rb')  # ,
-        #           'plant_json': open(path_to_logs + '/plant.json', 'rb'),
-        #           'plant_jpeg': open(path_to_logs + '/plant.jpeg', 'rb'),
-        }
+
+def upload_score(name, score, path_to_logs, icon_name, url=SCORE_UPLOAD_URL) -> str | None:
+    """
+    Post a score and its model log. Returns None on success, otherwise the
+    error message.
+    """
     try:
-        response = requests.post(
-            "https://planted.ipk-gatersleben.de/highscores/post.php",
-            files=files,
-            data={"name": name, "icon_name": icon_name, "score": score},
-            )
+        with open(path_to_logs + '/model_logs.csv', 'rb') as logfile:
+            files = {
+                "logfile": logfile  # ,
+                #           'plant_json': open(path_to_logs + '/plant.json', 'rb'),
+                #           'plant_jpeg': open(path_to_logs + '/plant.jpeg', 'rb'),
+                }
+            response = requests.post(
+                url,
+                files=files,
+                data={"name": name, "icon_name": icon_name, "score": score},
+                timeout=UPLOAD_TIMEOUT,
+                )
         response.raise_for_status()
         print("score uploaded successfully")
-    except requests.RequestException as e:
+        return None
+    except (requests.RequestException, OSError) as e:
         print(f"Failed to upload score: {e}")
+        return str(e)
 
 
 def get_scores():
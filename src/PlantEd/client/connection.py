@@ -0,0 +1,102 @@
+import asyncio
+import json
+
+import websockets
+
+from PlantEd.constants import MAX_REQUESTS_IN_FLIGHT, RECONNECT_ATTEMPTS, RECONNECT_DELAY
+from PlantEd.server import wire
+
+
+class ServerConnection:
+    """
+    Long-lived websocket connection to the game server.
+
+    Requests get an id that the server sends back with its response, so
+    several requests can be in flight on the same connection. Callers
+    check busy before sending to apply backpressure. A lost connection is
+    reestablished with the next request; requests that were in flight
+    when it was lost fail with a ConnectionError and are not resent.
+
+    Args:
+        uri: websocket address of the server
+        max_in_flight: number of requests that may wait for a response
+    """
+
+    def __init__(self, uri: str = "ws://localhost:8765", max_in_flight: int = MAX_REQUESTS_IN_FLIGHT):
+        self.uri = uri
+        self.max_in_flight = max_in_flight
+        self.websocket = None
+        self.receiver: asyncio.Task | None = None
+        self.pending: dict[int, asyncio.Future] = {}
+        self.in_flight = 0
+        self.next_request_id = 0
+        self.connect_lock = asyncio.Lock()
+
+    @property
+    def busy(self) -> bool:
+        return self.in_flight >= self.max_in_flight
+
+    async def connect(self):
+        async with self.connect_lock:
+            if self.websocket is not None:
+                return self.websocket
+            delay = RECONNECT_DELAY
+            for attempt in range(RECONNECT_ATTEMPTS):
+                try:
+                    websocket = await websockets.connect(self.uri, max_size=None)
+                except OSError as e:
+                    print(f"Failed to connect to {self.uri}: {e}")
+                    if attempt < RECONNECT_ATTEMPTS - 1:
+                        await asyncio.sleep(delay)
+                        delay *= 2
+                    continue
+                self.websocket = websocket
+                self.receiver = asyncio.create_task(self.receive(websocket))
+                return websocket
+            raise ConnectionError(f"Server at {self.uri} is not reachable")
+
+    async def receive(self, websocket):
+        try:
+            async for message in websocket:
+                # binary frames carry the compact encoding, text frames json
+                response = wire.decode(message) if isinstance(message, bytes) else json.loads(message)
+                future = self.pending.pop(response.pop("request_id", None), None)
+                if future is not None and not future.done():
+                    future.set_result(response)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if self.websocket is websocket:
+                self.websocket = None
+            pending, self.pending = self.pending, {}
+            for future in pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Connection to the server was lost"))
+
+    async def request(self, type: str, message: dict, **fields) -> dict:
+        """
+        Send a command and wait for its response. fields are added to the
+        command next to type and message, e.g. session_id.
+        """
+        self.in_flight += 1
+        try:
+            websocket = await self.connect()
+            request_id = self.next_request_id
+            self.next_request_id += 1
+            future = asyncio.get_running_loop().create_future()
+            self.pending[request_id] = future
+            command = {"type": type, "request_id": request_id, **fields, "message": message}
+            try:
+                await websocket.send(json.dumps(command))
+            except websockets.ConnectionClosed as e:
+                self.pending.pop(request_id, None)
+                raise ConnectionError("Connection to the server was lost") from e
+            return await future
+        finally:
+            self.in_flight -= 1
+
+    async def close(self):
+        if self.websocket is not None:
+            await self.websocket.close()
+        if self.receiver is not None:
+            await self.receiver
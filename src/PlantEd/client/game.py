@@ -9,16 +9,16 @@ from typing import List
 import numpy as np
 import pandas
 import pygame
-import websockets
 from pygame.locals import *
 
 from PlantEd import config
 from PlantEd.client.analysis import scoring, plot
 from PlantEd.client.camera import Camera
+from PlantEd.client.connection import ServerConnection
 from PlantEd.client.utils.icon_handler import IconHandler
 from PlantEd.client.utils.scores_handler import ScoreList, PlayerScore
 from PlantEd.constants import MAX_WATER_PER_CELL, ROOT_COST, BRANCH_COST, \
-    FLOWER_COST, LEAF_COST, BUFFER_TIMER, MAX_TIME_RESPONSE
+    FLOWER_COST, LEAF_COST, BUFFER_TIMER, MAX_TIME_RESPONSE, MAX_SIMULATION_LAG
 from PlantEd.data.assets import AssetHandler
 from PlantEd.data.sound_control import SoundControl
 from PlantEd.client.gameobjects.bee import Hive
@@ -44,6 +44,8 @@ from PlantEd.client.utils.particle import ParticleSystem, ParticleExplosion
 from PlantEd.client.weather import Environment
 from PlantEd.server.lsystem import DictToRoot
 from PlantEd.server.root_generator import RootGenerator
+from PlantEd.server import wire
+from PlantEd.server.delta import StateMirror
 
 GROWTH = 26
 WIN = pygame.USEREVENT + 1
@@ -226,9 +228,14 @@ class DefaultGameScene(object):
         self.temp_surface = pygame.Surface((self.screen_width, self.screen_height * 2), pygame.SRCALPHA)
 
         name = self.options.get("name") if self.options.get("name") is not None else "Player"
+        self.session_id = None
+        self.state_mirror = StateMirror()
+        self.connection = ServerConnection()
+        self.frames_waited = 0
         task = asyncio.create_task(self.load_level())
         self.fps = 0
         self.soft_stopp_timer = 0
+        self.catching_up = False  # game time is paused until the server caught up
         # self.server_game = Server_Game()
         since_epoch = time.time()
         self.asset_handler = AssetHandler.instance()
@@ -471,121 +478,144 @@ class DefaultGameScene(object):
             pygame.event.post(pygame.event.Event(WIN))
 
     async def end_level(self, player_name, icon_name):
-        async with websockets.connect("ws://localhost:8765") as websocket:
-            print(" --> End Level...")
-            game_state = {
-                "type": "end_level",
-                "message": {
+        print(" --> End Level...")
+        try:
+            await self.connection.request(
+                "end_level",
+                {
                     "player_name": player_name,
                     "icon_name": icon_name
-                }
-            }
-            await websocket.send(json.dumps(game_state))
-            response = await websocket.recv()
+                },
+                session_id=self.session_id,
+            )
+        except ConnectionError as e:
+            print(e)
+        await self.connection.close()
 
     async def load_level(self):
-        global request_running
-        if not request_running:
-            request_running = True
-            async with websockets.connect("ws://localhost:8765") as websocket:
-                print(" --> Send Load Level...")
-                game_state = {
-                    "type": "load_level",
-                    "message": {
-                        "player_name": self.options["name"],
-                        "icon_name": self.options["icon_name"],
-                        "level_name": "summer_low_nitrate",
-                    }
-                }
-                await websocket.send(json.dumps(game_state))
-                response = await websocket.recv()
-                # print(response)
-                request_running = False
+        print(" --> Send Load Level...")
+        try:
+            response = await self.connection.request(
+                "load_level",
+                {
+                    "player_name": self.options["name"],
+                    "icon_name": self.options["icon_name"],
+                    "level_name": "summer_low_nitrate",
+                    "encoding": wire.BINARY,
+                    "delta": True,
+                },
+            )
+        except ConnectionError as e:
+            print(e)
+            return
+        # print(response)
+        self.session_id = response.get("session_id")
 
     async def send_and_get_response(self, dt):
-        global request_running
-        if not request_running:
-            self.frames_waited = 0
-            request_running = True
-            async with websockets.connect("ws://localhost:8765") as websocket:
-                delta_t = self.gametime.get_time() / 1000 - self.seconds_at_last_request
-                self.seconds_at_last_request = self.gametime.get_time() / 1000
-                # print(" --> Sending request...")
-                game_state = {
-                    "type": "simulate",
-                    "message": {
-                        "delta_t": delta_t,
-                        "growth_percentages": {
-                            "leaf_percent": self.plant.organs[0].percentage,
-                            "stem_percent": self.plant.organs[1].percentage,
-                            "root_percent": self.plant.organs[2].percentage,
-                            "seed_percent": 0,
-                            "starch_percent": self.plant.organ_starch.percentage,
-                            "stomata": self.plant.organs[0].stomata_open,
-                        },
-                        "shop_actions": {
-                            "buy_watering_can": self.water_grid.pop_poured_cells(),
-                            "buy_nitrate": self.nitrate_grid.pop_cells_to_add(),
-                            "buy_leaf": self.plant.organs[0].pop_new_leaves(),
-                            "buy_branch": self.plant.organs[1].pop_new_branches(),
-                            "buy_root": self.plant.organs[2].pop_new_roots(),
-                            "buy_seed": self.plant.organs[3].pop_new_flowers(),
-                        }
-                    }
-                }
-                print("REQUEST SENT:")
-                print(game_state)
-                await websocket.send(json.dumps(game_state))
-                response = await websocket.recv()
-                # print(" --> Received response, updating state")
-                dic = json.loads(response)
-                if dic is not None:
-                    if len(dic) != 0:
-                        print("RESPONSE GOT:")
-                        print(dic)
-                        # print(f"RESPONSE: {dic}")
-                        self.environment.precipitation = dic["environment"]["precipitation"]
-                        self.ui.humidity = dic["environment"]["humidity"]
-                        self.ui.temperature = dic["environment"]["temperature"]
-
-                        self.nitrate_grid.grid = np.asarray(dic["environment"]["nitrate_grid"])
-                        if not self.shop.watering_can.active:
-                            self.water_grid.water_grid = np.asarray(dic["environment"]["water_grid"])
-
-                        # update plant
-                        self.plant.organs[0].update_masses(dic["plant"]["leafs_biomass"])
-                        self.plant.organs[1].update_masses(dic["plant"]["stems_biomass"])
-                        self.plant.organs[2].check_for_new_roots(dic["plant"]["root"])
-                        self.plant.organs[2].update_masses(dic["plant"]["roots_biomass"])
-                        self.plant.organs[3].update_masses(dic["plant"]["seeds_biomass"])
-                        self.plant.organ_starch.update_mass(dic["plant"]["starch_pool"])
-                        self.plant.organ_starch.max_pool = dic["plant"]["max_starch_pool"]
-                        self.plant.water_pool = dic["plant"]["water_pool"]
-                        self.plant.max_water_pool = dic["plant"]["max_water_pool"]
-
-                        # make simple root strucure from root_dict
-                        # self.plant.organs[2].ls = DictToRoot().load_root_system(dic["plant"]["root"])
-
-                        # self.ui.used_fluxes = dic["used_fluxes"]
-                        self.narrator.used_fluxes = dic["used_fluxes"]
-
-                        if not dic["running"]:
-                            # end
-                            print("end level")
-                            pygame.event.post(pygame.event.Event(WIN))
-                request_running = False
-        else:
+        if self.session_id is None:
+            # level is not loaded yet
+            return
+        if self.connection.busy:
+            # backpressure: wait for responses before sending more requests
             self.frames_waited += dt
-            if self.frames_waited >= MAX_TIME_RESPONSE:
+            if self.frames_waited >= MAX_TIME_RESPONSE and not self.catching_up:
                 self.soft_stopp_timer = BUFFER_TIMER
                 self.gametime.pause()
+            return
+
+        self.frames_waited = 0
+        delta_t = self.gametime.get_time() / 1000 - self.seconds_at_last_request
+        self.seconds_at_last_request = self.gametime.get_time() / 1000
+        # print(" --> Sending request...")
+        game_state = {
+            "delta_t": delta_t,
+            "growth_percentages": {
+                "leaf_percent": self.plant.organs[0].percentage,
+                "stem_percent": self.plant.organs[1].percentage,
+                "root_percent": self.plant.organs[2].percentage,
+                "seed_percent": 0,
+                "starch_percent": self.plant.organ_starch.percentage,
+                "stomata": self.plant.organs[0].stomata_open,
+            },
+            "shop_actions": {
+                "buy_watering_can": self.water_grid.pop_poured_cells(),
+                "buy_nitrate": self.nitrate_grid.pop_cells_to_add(),
+                "buy_leaf": self.plant.organs[0].pop_new_leaves(),
+                "buy_branch": self.plant.organs[1].pop_new_branches(),
+                "buy_root": self.plant.organs[2].pop_new_roots(),
+                "buy_seed": self.plant.organs[3].pop_new_flowers(),
+            }
+        }
+        print("REQUEST SENT:")
+        print(game_state)
+        try:
+            dic = await self.connection.request(
+                "simulate",
+                game_state,
+                session_id=self.session_id,
+                ack=self.state_mirror.revision,
+            )
+        except ConnectionError as e:
+            print(e)
+            return
+        # print(" --> Received response, updating state")
+        # rebuild the full state from keyframes and deltas, None if the base is unknown
+        dic = self.state_mirror.receive(dic)
+        if dic is not None:
+            if "error" in dic:
+                print(f"SERVER ERROR: {dic['error']}")
+            elif len(dic) != 0:
+                print("RESPONSE GOT:")
+                print(dic)
+                # the server simulates within a time budget and reports how far it is behind
+                lag = dic.get("lag", 0)
+                if lag > MAX_SIMULATION_LAG and not self.catching_up:
+                    self.catching_up = True
+                    if self.soft_stopp_timer <= 0:
+                        self.gametime.pause()
+                elif lag <= MAX_SIMULATION_LAG and self.catching_up:
+                    self.catching_up = False
+                    if self.soft_stopp_timer <= 0:
+                        self.gametime.unpause()
+                # print(f"RESPONSE: {dic}")
+                self.environment.precipitation = dic["environment"]["precipitation"]
+                self.ui.humidity = dic["environment"]["humidity"]
+                self.ui.temperature = dic["environment"]["temperature"]
+
+                self.nitrate_grid.grid = np.asarray(dic["environment"]["nitrate_grid"])
+                if not self.shop.watering_can.active:
+                    # copy, the watering can pours into this grid
+                    self.water_grid.water_grid = np.array(dic["environment"]["water_grid"])
+
+                # update plant
+                self.plant.organs[0].update_masses(dic["plant"]["leafs_biomass"])
+                self.plant.organs[1].update_masses(dic["plant"]["stems_biomass"])
+                self.plant.organs[2].check_for_new_roots(dic["plant"]["root"])
+                self.plant.organs[2].update_masses(
+                    [(int(id), float(mass)) for id, mass in dic["plant"]["roots_biomass"]])
+                self.plant.organs[3].update_masses(dic["plant"]["seeds_biomass"])
+                self.plant.organ_starch.update_mass(dic["plant"]["starch_pool"])
+                self.plant.organ_starch.max_pool = dic["plant"]["max_starch_pool"]
+                self.plant.water_pool = dic["plant"]["water_pool"]
+                self.plant.max_water_pool = dic["plant"]["max_water_pool"]
+
+                # make simple root strucure from root_dict
+                # self.plant.organs[2].ls = DictToRoot().load_root_system(dic["plant"]["root"])
+
+                # self.ui.used_fluxes = dic["used_fluxes"]
+                self.narrator.used_fluxes = dic["used_fluxes"]
+
+                if not dic["running"]:
+                    # end
+                    print("end level")
+                    pygame.event.post(pygame.event.Event(WIN))
 
     def update(self, dt):
         self.fps = 1 / dt
 
         if self.soft_stopp_timer > 0:
             self.soft_stopp_timer -= dt
-            if self.soft_stopp_timer <= 0:
+            if self.soft_stopp_timer <= 0 and not self.catching_up:
                 self.gametime.unpause()
         else:
             task = asyncio.create_task(self.send_and_get_response(dt))
@@ -1250,8 +1280,6 @@ class SceneMananger(object):
         # self.camera.render(screen_high, screen)
 
 
-request_running = False
-
 
 async def main():
     """
@@ -10,6 +10,13 @@ ROOT_GRID_SIZE = (20, 6)
 MAX_TIME_RESPONSE = 2
 BUFFER_TIMER = 2
 
+# client connection: requests sent before earlier responses arrived
+MAX_REQUESTS_IN_FLIGHT = 2
+RECONNECT_ATTEMPTS = 3
+RECONNECT_DELAY = 0.5  # seconds, doubled after each failed attempt
+# game time stops while the server is this many seconds of game time behind
+MAX_SIMULATION_LAG = 6 * 60 * 60
+
 ###############################################################################
 # Starch
 ###############################################################################
@@ -192,4 +199,90 @@ water_concentration_at_temp = [
     2.441,
     2.569,
     2.703,
-]
\ No newline at end of file
+]
+
+###############################################################################
+# Server
+###############################################################################
+
+# ↓ maximum number of games a single server process keeps at once
+MAX_SESSIONS = 256
+
+# ↓ sessions without a request for this many seconds get evicted
+SESSION_IDLE_TIMEOUT = 60 * 30
+
+# ↓ seconds between two sweeps for idle sessions
+SESSION_EVICTION_INTERVAL = 60
+
+# ↓ "inline" simulates on the event loop, "process" in a pool of workers
+SIMULATION_EXECUTOR = "inline"
+
+# ↓ number of worker processes for the "process" executor, None = cpu count
+SIMULATION_WORKERS = None
+
+# ↓ delta sync: every n-th revision is sent as a full keyframe
+KEYFRAME_INTERVAL = 100
+
+# ↓ delta sync: number of recent states kept to diff against / patch onto
+DELTA_HISTORY = 8
+
+# ↓ highscore endpoint finished games are uploaded to
+SCORE_UPLOAD_URL = "https://planted.ipk-gatersleben.de/highscores/post.php"
+
+# ↓ pending score uploads are kept here until they succeed
+SCORE_SPOOL_DIR = "./data/score_spool"
+
+# ↓ seconds before the first retry of a failed upload, doubled after each attempt
+UPLOAD_RETRY_DELAY = 5
+
+# ↓ upper limit for the delay between two retries
+UPLOAD_MAX_RETRY_DELAY = 60 * 10
+
+# ↓ uploads failing this often are given up and kept as .failed in the spool
+UPLOAD_MAX_ATTEMPTS = 20
+
+# ↓ seconds a single upload request may take
+UPLOAD_TIMEOUT = 10
+
+# ↓ directory the games of all sessions are saved to on shutdown and restored from on start, None = off
+SESSION_SNAPSHOT_DIR = None
+
+# ↓ adaptive time stepping: merge the FBA solves of calm hours into longer steps (see Game.next_step_hours)
+ADAPTIVE_STEPPING = False
+
+# ↓ adaptive time stepping: longest step in hours
+ADAPTIVE_MAX_STEP_HOURS = 8
+
+# ↓ adaptive time stepping: relative change of fluxes between two solves that still counts as calm
+ADAPTIVE_TOLERANCE = 0.02
+
+# ↓ number of FBA solutions cached per process (see server/flux_cache.py), 0 = off
+FLUX_CACHE_SIZE = 0
+
+# ↓ relative difference of bounds and mass ratios still answered from the cache, 0 = exact inputs only
+FLUX_CACHE_TOLERANCE = 0.001
+
+# ↓ seconds of simulation per request, hours that don't fit are caught up with later requests, None = no limit
+# ↓ a budget makes games depend on the speed of the server, they can't be replayed (see server/replay.py)
+SIMULATION_TIME_BUDGET = None
+
+# ↓ game log rows kept in memory before they are written in one batch
+LOG_BUFFER_ROWS = 256
+
+# ↓ also write the game log as memory-mappable binary columns (see client/analysis/logger.py)
+LOG_BINARY = False
+
+# ↓ parsed metabolic models are pickled here, keyed by the hash of the SBML file, None = always parse
+MODEL_CACHE_DIR = "./data/model_cache"
+
+# ↓ prepared copies of the metabolic model each process keeps for new games (see server/model_pool.py)
+MODEL_POOL_SIZE = 2
+
+# ↓ start every FBA solve from the optimal basis of the previous one, if the solver supports it
+WARM_START = True
+
+# ↓ metabolic model the server solves, relative to the package, e.g. the output of server/compress_model.py
+METABOLIC_MODEL = "data/PlantEd_model.sbml"
+
+# ↓ solver of the FBA: "cobra" (cobra and optlang) or "linprog" (scipy HiGHS, see server/linprog_backend.py)
+FBA_BACKEND = "cobra"
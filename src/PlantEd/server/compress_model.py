@@ -0,0 +1,206 @@
+"""
+Offline compression of the metabolic model for the game.
+
+The game only reads the fluxes of the exchange and biomass reactions in
+DynamicModel and changes the stoichiometry of the transfer reactions
+between organs. Everything else only has to give the same optimum, so
+the model can be compressed once before the server starts:
+
+    blocked reactions   reactions that can't carry flux with the widest
+                        bounds the game ever sets are removed
+    linear pathways     a metabolite made by one reaction and used by one
+                        other forces their fluxes into a fixed ratio, the
+                        two reactions are lumped into one
+
+Kept reactions (KEPT_REACTIONS and the transfers) are never removed or
+lumped. validate solves the original and the compressed model on a grid
+of bounds, growth percentages and organ masses and compares the fluxes
+the game reads.
+
+Usage: python compress_model.py [--input data/PlantEd_model.sbml]
+                                [--output data/PlantEd_model_compressed.sbml]
+
+--input is the SBML model to compress, by default METABOLIC_MODEL of
+constants.py relative to the package. Set METABOLIC_MODEL to the output
+to let the server load it instead of the full model.
+"""
+import argparse
+import itertools
+import math
+from pathlib import Path
+
+import cobra
+from cobra.flux_analysis import find_blocked_reactions
+
+from PlantEd.server.dynamic_model import DynamicModel, load_model, SBML_PATH, FLUX_REACTIONS, DYNAMIC_REACTIONS, \
+    BOUND_RANGES, WATER, NITRATE, PHOTON, CO2, STARCH_IN
+
+# read or bounded by DynamicModel
+KEPT_REACTIONS = tuple(sorted(set(FLUX_REACTIONS) | set(DYNAMIC_REACTIONS)))
+# transfer reactions, normalized by helpers.normalize
+TRANSFER_QUERIES = (r"\[root\|stem\]", r"\[stem\|leaf\]", r"\[leaf\|seed\]")
+
+COMPRESSED_PATH = Path(__file__).parent.parent / "data/PlantEd_model_compressed.sbml"
+
+# bounds of the inputs in the validation grid, as (lower, upper) per reaction
+VALIDATION_BOUNDS = {
+    PHOTON: [(0, 0), (0, 10), (0, 200)],
+    WATER: [(-1000, 0.5), (-1000, 50)],
+    NITRATE: [(-1000, 0.01), (-1000, 1)],
+    CO2: [(-1000, 0), (-1000, 1000)],
+    STARCH_IN: [(0, 0), (0, 5)],
+    }
+VALIDATION_PERCENTAGES = [
+    {"root_percent": 40, "stem_percent": 20, "leaf_percent": 30, "seed_percent": 0, "starch_percent": 10},
+    {"root_percent": 10, "stem_percent": 10, "leaf_percent": 10, "seed_percent": 60, "starch_percent": 0},
+    ]
+# root, stem, leaf, seed
+VALIDATION_MASSES = [(0.02, 0.02, 0.01, 0.01), (0.5, 0.3, 1.2, 0.4)]
+
+
+def kept_reactions(model: cobra.Model) -> set[str]:
+    kept = {reaction for reaction in KEPT_REACTIONS if reaction in model.reactions}
+    for query in TRANSFER_QUERIES:
+        kept.update(reaction.id for reaction in model.reactions.query(query))
+    return kept
+
+
+def remove_blocked(model: cobra.Model, kept: set[str]) -> list[str]:
+    # the widest bounds the game sets, blocked under these means blocked in every game. Not those of the
+    # SBML file, e.g. nitrate can't leave the plant there but calculate_bounds lets it
+    for reaction, bounds in BOUND_RANGES.items():
+        if reaction in model.reactions:
+            model.reactions.get_by_id(reaction).bounds = bounds
+    blocked = [reaction for reaction in find_blocked_reactions(model) if reaction not in kept]
+    model.remove_reactions(blocked, remove_orphans=True)
+    return blocked
+
+
+def lump_pair(model: cobra.Model, metabolite: cobra.Metabolite) -> str | None:
+    """
+    Merge the two reactions of metabolite into the first one and return
+    the id of the removed one. Steady state of the metabolite means
+    a * v1 + b * v2 = 0, so v2 = factor * v1 with factor = -a / b.
+    """
+    first, second = sorted(metabolite.reactions, key=lambda reaction: reaction.id)
+    factor = -first.metabolites[metabolite] / second.metabolites[metabolite]
+    low, high = second.lower_bound / factor, second.upper_bound / factor
+    if factor < 0:
+        low, high = high, low
+    lower_bound = max(first.lower_bound, low)
+    upper_bound = min(first.upper_bound, high)
+    if lower_bound > upper_bound:
+        return None
+    first.add_metabolites({other: factor * coefficient for other, coefficient in second.metabolites.items()})
+    # tiny leftovers of the lumped metabolite from rounding
+    if metabolite in first.metabolites:
+        first.subtract_metabolites({metabolite: first.metabolites[metabolite]})
+    first.bounds = (lower_bound, upper_bound)
+    first.notes["lumped"] = " ".join(filter(None, (first.notes.get("lumped"), second.id, second.notes.get("lumped"))))
+    model.remove_reactions([second], remove_orphans=True)
+    return second.id
+
+
+def lump_linear_pathways(model: cobra.Model, kept: set[str]) -> list[str]:
+    lumped = []
+    changed = True
+    while changed:
+        changed = False
+        for metabolite in list(model.metabolites):
+            reactions = metabolite.reactions
+            if len(reactions) != 2 or any(reaction.id in kept for reaction in reactions):
+                continue
+            removed = lump_pair(model, metabolite)
+            if removed is not None:
+                lumped.append(removed)
+                # the metabolites of the lumped reaction changed, start over
+                changed = True
+                break
+    return lumped
+
+
+def compress(model: cobra.Model) -> tuple[cobra.Model, dict]:
+    """
+    Return a compressed copy of model and a report of what was removed.
+    """
+    original = model
+    model = model.copy()
+    kept = kept_reactions(model)
+    blocked = remove_blocked(model, kept)
+    lumped = lump_linear_pathways(model, kept)
+    # remove_blocked opened the kept reactions, the game sets their bounds anyway
+    for reaction in kept:
+        model.reactions.get_by_id(reaction).bounds = original.reactions.get_by_id(reaction).bounds
+    return model, {
+        "reactions": (len(original.reactions), len(model.reactions)),
+        "metabolites": (len(original.metabolites), len(model.metabolites)),
+        "blocked": blocked,
+        "lumped": lumped,
+        }
+
+
+def solve(model: DynamicModel, bounds: dict, percentages: dict, masses: tuple) -> dict:
+    for reaction, reaction_bounds in bounds.items():
+        model.set_bounds(reaction, reaction_bounds)
+    constraint_masses = [masses[0], masses[1], masses[2], masses[3], masses[1]]
+    model.update_constraints({**percentages, "stomata": True}, mass_organ=constraint_masses)
+    model.normalize_model(*masses)
+    objective = model.optimize()
+    fluxes = model.index.fluxes()
+    fluxes["objective"] = objective
+    return fluxes
+
+
+def validate(original: cobra.Model, compressed: cobra.Model, rtol: float = 1e-6, atol: float = 1e-9) -> list[dict]:
+    """
+    Solve both models on the validation grid and return every solve in
+    which a flux the game reads differs.
+    """
+    models = [DynamicModel(None, None, model=model) for model in (original, compressed)]
+    for model in models:
+        # the same start for both, a warm basis could pick another of several optima
+        model.warm_start = False
+    mismatches = []
+    reactions = list(VALIDATION_BOUNDS)
+    for values in itertools.product(*VALIDATION_BOUNDS.values()):
+        bounds = dict(zip(reactions, values))
+        for percentages, masses in itertools.product(VALIDATION_PERCENTAGES, VALIDATION_MASSES):
+            expected, actual = (solve(model, bounds, percentages, masses) for model in models)
+            for name, value in expected.items():
+                if math.isnan(value) and math.isnan(actual[name]):
+                    continue
+                if not math.isclose(value, actual[name], rel_tol=rtol, abs_tol=atol):
+                    mismatches.append({
+                        "bounds": bounds,
+                        "percentages": percentages,
+                        "masses": masses,
+                        "flux": name,
+                        "expected": value,
+                        "actual": actual[name],
+                        })
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compress the metabolic model and validate the result")
+    parser.add_argument("--input", default=str(SBML_PATH))
+    parser.add_argument("--output", default=str(COMPRESSED_PATH))
+    args = parser.parse_args()
+
+    original = load_model(args.input, cache_dir=None)
+    compressed, report = compress(original)
+    print(f"reactions {report['reactions'][0]} -> {report['reactions'][1]}, "
+          f"metabolites {report['metabolites'][0]} -> {report['metabolites'][1]}, "
+          f"{len(report['blocked'])} blocked, {len(report['lumped'])} lumped")
+
+    mismatches = validate(original, compressed)
+    if mismatches:
+        for mismatch in mismatches[:10]:
+            print(mismatch)
+        raise SystemExit(f"{len(mismatches)} fluxes differ, {args.output} not written")
+    cobra.io.write_sbml_model(compressed, args.output)
+    print(f"validated and written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Revisioned delta sync of game states between server and client.
+
+Every simulate response of a delta session gets a revision number. The
+client acknowledges the revision of the state it holds with every request
+and the server answers with either a keyframe (the full state) or a delta
+against that revision:
+
+    keyframe    the full game state plus "revision" and "keyframe": True
+    delta       {"revision", "base", "keyframe": False, "changed", "cells",
+                "events"}
+                "changed" holds all changed values in the layout of the
+                game state, "cells" maps dotted paths of numpy grids to the
+                flat indices and new values of their changed cells.
+
+Both sides keep a few recent states, so a delta can be applied even if a
+request was sent before the previous response arrived.
+
+Events (EVENT_PATHS) are lists in the game state that only hold what
+happened since the last response, like the new roots. They are never
+diffed: deltas carry them in "events" and the kept states hold them
+empty. A client that can't apply a delta keeps its events and adds them
+to the next state it rebuilds, so none of them is lost.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from PlantEd.constants import KEYFRAME_INTERVAL, DELTA_HISTORY
+
+_MISSING = object()
+
+# one-shot lists of the game state, as dotted paths
+EVENT_PATHS = ("plant.root.roots",)
+
+
+def _equal(a, b) -> bool:
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return np.array_equal(a, b)
+    return a == b
+
+
+def _diff(old: dict, new: dict, path: tuple, changed: dict, cells: dict):
+    for key, value in new.items():
+        before = old.get(key, _MISSING)
+        if isinstance(value, dict) and isinstance(before, dict):
+            sub = {}
+            _diff(before, value, path + (key,), sub, cells)
+            if sub:
+                changed[key] = sub
+        elif isinstance(value, np.ndarray) and isinstance(before, np.ndarray) and value.shape == before.shape:
+            index = np.flatnonzero(value != before)
+            if len(index) > 0:
+                cells[".".join(path + (key,))] = [index.tolist(), value.ravel()[index].tolist()]
+        elif before is _MISSING or not _equal(before, value):
+            changed[key] = value
+
+
+def diff(old: dict, new: dict) -> tuple[dict, dict]:
+    """
+    Return the changed values and changed grid cells between two states.
+    """
+    changed = {}
+    cells = {}
+    _diff(old, new, (), changed, cells)
+    return changed, cells
+
+
+def _merge(base: dict, changed: dict) -> dict:
+    state = dict(base)
+    for key, value in changed.items():
+        if isinstance(value, dict) and isinstance(state.get(key), dict):
+            state[key] = _merge(state[key], value)
+        else:
+            state[key] = value
+    return state
+
+
+def apply(base: dict, changed: dict, cells: dict) -> dict:
+    """
+    Return a new state with the delta applied to base. base is not
+    modified, unchanged values are shared between both states.
+    """
+    state = _merge(base, changed)
+    for dotted_path, (index, values) in cells.items():
+        path = dotted_path.split(".")
+        node = state
+        for key in path[:-1]:
+            node[key] = dict(node[key])
+            node = node[key]
+        grid = np.array(node[path[-1]])
+        grid.ravel()[index] = values
+        node[path[-1]] = grid
+    return state
+
+
+def _get(state: dict, dotted_path: str):
+    node = state
+    for key in dotted_path.split("."):
+        if not isinstance(node, dict) or key not in node:
+            return None
+        node = node[key]
+    return node
+
+
+def _replace(state: dict, dotted_path: str, value) -> dict:
+    # copies the dicts along the path, state is not modified
+    key, _, rest = dotted_path.partition(".")
+    state = dict(state)
+    state[key] = _replace(state[key], rest, value) if rest else value
+    return state
+
+
+def split_events(state: dict) -> tuple[dict, dict]:
+    """
+    Return the state with empty events and the events by dotted path.
+    """
+    events = {}
+    for dotted_path in EVENT_PATHS:
+        value = _get(state, dotted_path)
+        if value is not None:
+            events[dotted_path] = value
+            state = _replace(state, dotted_path, [])
+    return state, events
+
+
+class StateSync:
+    """
+    Server side of the delta sync of one session.
+
+    Args:
+        keyframe_interval: every n-th revision is sent in full
+        history: number of sent states kept to diff against
+    """
+
+    def __init__(self, keyframe_interval: int = KEYFRAME_INTERVAL, history: int = DELTA_HISTORY):
+        self.keyframe_interval = keyframe_interval
+        self.history = history
+        self.revision = 0
+        self.states: OrderedDict[int, dict] = OrderedDict()
+
+    def encode(self, state: dict, ack: int = None) -> dict:
+        if not state:
+            return state
+        self.revision += 1
+        base = self.states.get(ack) if ack is not None else None
+
+        kept, events = split_events(state)
+        self.states[self.revision] = kept
+        while len(self.states) > self.history:
+            self.states.popitem(last=False)
+
+        if base is None or self.revision % self.keyframe_interval == 0:
+            return {**state, "revision": self.revision, "keyframe": True}
+        changed, cells = diff(base, kept)
+        return {
+            "revision": self.revision,
+            "base": ack,
+            "keyframe": False,
+            "changed": changed,
+            "cells": cells,
+            "events": events,
+            }
+
+
+class StateMirror:
+    """
+    Client side of the delta sync. Rebuilds full game states from the
+    responses of the server.
+    """
+
+    def __init__(self, history: int = DELTA_HISTORY):
+        self.history = history
+        self.revision = None  # None asks the server for a keyframe
+        self.states: OrderedDict[int, dict] = OrderedDict()
+        self.pending_events: dict[str, list] = {}  # events of responses that couldn't be applied
+
+    def receive(self, response: dict) -> dict | None:
+        """
+        Return the full state for a response, or None if the delta refers
+        to a state that is no longer known. In that case the next
+        acknowledged revision is None, so the server sends a keyframe,
+        and the events of the response come with the next state.
+        """
+        if "revision" not in response:
+            return response
+
+        if response["keyframe"]:
+            state = {key: value for key, value in response.items() if key not in ("revision", "keyframe")}
+            state, events = split_events(state)
+        else:
+            events = response.get("events", {})
+            base = self.states.get(response["base"])
+            if base is None:
+                for dotted_path, values in events.items():
+                    self.pending_events[dotted_path] = self.pending_events.get(dotted_path, []) + list(values)
+                self.revision = None
+                return None
+            state = apply(base, response["changed"], response["cells"])
+
+        self.states[response["revision"]] = state
+        while len(self.states) > self.history:
+            self.states.popitem(last=False)
+        if self.revision is None or response["revision"] > self.revision:
+            self.revision = response["revision"]
+
+        for dotted_path in EVENT_PATHS:
+            if _get(state, dotted_path) is not None:
+                values = self.pending_events.pop(dotted_path, []) + list(events.get(dotted_path, []))
+                state = _replace(state, dotted_path, values)
+        return state
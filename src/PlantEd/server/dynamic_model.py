@@ -1,10 +1,21 @@
 from pathlib import Path
+import hashlib
+import math
+import os
+import pickle
+import time
+from weakref import WeakKeyDictionary
 import cobra
 from cobra import Reaction
+from cobra.util.solver import check_solver_status
 from sympy import Add
-from PlantEd.server.helpers import normalize
+from PlantEd.server.helpers import normalize, normalized_masses
 from PlantEd.server.environment import Environment
-from PlantEd.constants import Vmax, Km, SLA_IN_SQUARE_METER_PER_GRAM
+from PlantEd.server.flux_cache import flux_cache
+from PlantEd.server.linprog_backend import LinprogProblem
+from PlantEd.server.metrics import Metrics
+from PlantEd.constants import Vmax, Km, SLA_IN_SQUARE_METER_PER_GRAM, MODEL_CACHE_DIR, WARM_START, \
+    METABOLIC_MODEL, FBA_BACKEND
 
 fileDir = Path(__file__)
 script_dir = fileDir.parent
@@ -23,60 +34,386 @@ PHOTON = "Photon_tx_leaf"
 CO2 = "CO2_tx_leaf"
 STARCH_IN = "Starch_in_tx_stem"
 
+# fluxes read after every solve
+FLUX_REACTIONS = (
+    WATER, NITRATE, PHOTON, CO2, STARCH_IN, STARCH_OUT, BIOMASS_ROOT, BIOMASS_STEM, BIOMASS_LEAF, BIOMASS_SEED
+    )
+
+# reactions whose bounds are changed while simulating
+DYNAMIC_REACTIONS = (
+    BIOMASS_ROOT, BIOMASS_STEM, BIOMASS_LEAF, BIOMASS_SEED, STARCH_OUT, NITRATE, WATER, PHOTON, CO2, STARCH_IN
+    )
+
+# widest bounds init_bounds, calculate_bounds and update_constraints ever set per reaction of DYNAMIC_REACTIONS,
+# upper bounds computed from the plant and the environment are open ended and given as 1000
+BOUND_RANGES = {
+    WATER: (-1000, 1000),
+    NITRATE: (-1000, 1000),
+    CO2: (-1000, 1000),
+    PHOTON: (0, 1000),
+    STARCH_IN: (0, 1000),
+    STARCH_OUT: (0, 1000),
+    BIOMASS_ROOT: (0, 1000),
+    BIOMASS_STEM: (0, 1000),
+    BIOMASS_LEAF: (0, 1000),
+    BIOMASS_SEED: (0, 1000),
+    }
+
+
+# reactions whose fluxes are kept in the ratio of the growth percentages, and their constraint names
+RATIO_REACTIONS = (BIOMASS_ROOT, BIOMASS_STEM, BIOMASS_LEAF, BIOMASS_SEED, STARCH_OUT)
+RATIO_NAMES = ("root", "stem", "leaf", "seed", "starch_out")
+
+# ratio constraints per model, see DynamicModel.ratio_constraints
+_ratio_constraints: WeakKeyDictionary = WeakKeyDictionary()
+# reactions, bounds and flux columns per model, see ModelIndex
+_model_indices: WeakKeyDictionary = WeakKeyDictionary()
+
+BACKENDS = ("cobra", "linprog")
+# backend of new models in this process, see configure_backend
+_backend = {"name": FBA_BACKEND}
+
+# constraints of a new game
+INITIAL_PERCENTAGES = {
+    "root_percent": 1,
+    "stem_percent": 0,
+    "leaf_percent": 0,
+    "seed_percent": 0,
+    "starch_percent": 0,
+    "stomata": False,
+    }
+
+SBML_PATH = script_dir.parent / METABOLIC_MODEL
+
+# parsed models of this process by path, see load_model
+_models: dict[str, cobra.Model] = {}
+# model of new games in this process, see configure_model
+_model_path = {"path": SBML_PATH}
+
+
+def configure_model(path=SBML_PATH):
+    """
+    Create the games of this process from the model in path. Call it
+    before the first game, models already in the model pool are kept.
+    """
+    _model_path["path"] = path
+
+
+def model_path():
+    return _model_path["path"]
+
+
+def load_model(path=None, cache_dir=MODEL_CACHE_DIR) -> cobra.Model:
+    """
+    The metabolic model in path, by default the one of configure_model,
+    parsed on first use. Parsing SBML is slow, so the parsed model is also
+    pickled to cache_dir under the hash of the file and later processes
+    load the pickle instead. Callers must copy the model before changing it.
+    """
+    path = str(model_path() if path is None else path)
+    model = _models.get(path)
+    if model is not None:
+        return model
+
+    cache_path = None
+    if cache_dir is not None:
+        with open(path, "rb") as file:
+            digest = hashlib.sha256(file.read()).hexdigest()
+        # pickles are only valid for the cobra version that wrote them
+        cache_path = os.path.join(cache_dir, f"{digest}-cobra{cobra.__version__}.pickle")
+        try:
+            with open(cache_path, "rb") as file:
+                model = pickle.load(file)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            model = None
+
+    if model is None:
+        model = cobra.io.read_sbml_model(path)
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+            # several workers may start at once, never let one read half a pickle
+            tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as file:
+                pickle.dump(model, file, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+    _models[path] = model
+    return model
+
+
+def get_basis(model: cobra.Model) -> dict | None:
+    """
+    Status of every row and column in the basis of the last solve, by name.
+    The solver starts the next solve from it, so models that should solve
+    bit-identically, e.g. a game and its restored snapshot, need the same
+    basis. Only available for GLPK.
+    """
+    if model.solver.interface.__name__ != "optlang.glpk_interface":
+        return None
+    import swiglpk
+    problem = model.solver.problem
+    return {
+        "rows": {swiglpk.glp_get_row_name(problem, i): swiglpk.glp_get_row_stat(problem, i)
+                 for i in range(1, swiglpk.glp_get_num_rows(problem) + 1)},
+        "cols": {swiglpk.glp_get_col_name(problem, i): swiglpk.glp_get_col_stat(problem, i)
+                 for i in range(1, swiglpk.glp_get_num_cols(problem) + 1)},
+        }
+
+
+def set_basis(model: cobra.Model, basis: dict):
+    if basis is None or model.solver.interface.__name__ != "optlang.glpk_interface":
+        return
+    import swiglpk
+    problem = model.solver.problem
+    for i in range(1, swiglpk.glp_get_num_rows(problem) + 1):
+        status = basis["rows"].get(swiglpk.glp_get_row_name(problem, i))
+        if status is not None:
+            swiglpk.glp_set_row_stat(problem, i, status)
+    for i in range(1, swiglpk.glp_get_num_cols(problem) + 1):
+        status = basis["cols"].get(swiglpk.glp_get_col_name(problem, i))
+        if status is not None:
+            swiglpk.glp_set_col_stat(problem, i, status)
+
+
+def reset_basis(model: cobra.Model):
+    # the basis a freshly built problem starts from
+    if model.solver.interface.__name__ == "optlang.glpk_interface":
+        import swiglpk
+        swiglpk.glp_std_basis(model.solver.problem)
+
+
+def iteration_count(model: cobra.Model) -> int | None:
+    # simplex iterations of the model so far, only available for GLPK
+    if model.solver.interface.__name__ != "optlang.glpk_interface":
+        return None
+    import swiglpk
+    return swiglpk.glp_get_it_cnt(model.solver.problem)
+
+
+def configure_backend(name: str = FBA_BACKEND):
+    """
+    Solve the models created from now on in this process with backend
+    name: "cobra" solves through cobra and optlang, "linprog" with
+    scipy.optimize.linprog, see linprog_backend.py.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown FBA backend: {name}")
+    _backend["name"] = name
+
+
+class ModelIndex:
+    """
+    The reactions of DYNAMIC_REACTIONS and FLUX_REACTIONS of one cobra
+    model, looked up once. Bounds set through the index are kept here, so
+    reading them and setting unchanged ones never reaches the solver. Every
+    DynamicModel of a shared model uses the same index, get it with
+    model_index.
+
+    With the linprog backend the index also holds the LinprogProblem of
+    the model, which then takes all bounds, coefficients and solves
+    instead of the cobra model.
+    """
+
+    def __init__(self, model: cobra.Model, backend: str = "cobra"):
+        self.model = model
+        self.backend = backend
+        self.reactions = {
+            reaction: model.reactions.get_by_id(reaction) for reaction in set(DYNAMIC_REACTIONS) | set(FLUX_REACTIONS)
+            }
+        self.problem = None
+        if backend == "linprog":
+            # the export reads the SBML stoichiometry, the normalization of the solver is applied again
+            self.problem = LinprogProblem(model)
+            masses = normalized_masses(model)
+            if masses is not None:
+                self.problem.normalize(model, *masses)
+        self.bounds = {}
+        self.refresh()
+        self.columns = None
+        self.n_columns = None
+
+    def refresh(self):
+        # bounds changed directly on the reactions, e.g. by tests or compress_model
+        if self.problem is not None:
+            self.bounds = {reaction: self.problem.get_bounds(reaction) for reaction in DYNAMIC_REACTIONS}
+        else:
+            self.bounds = {reaction: self.reactions[reaction].bounds for reaction in DYNAMIC_REACTIONS}
+
+    def set_bounds(self, reaction: str, bounds: tuple):
+        bounds = tuple(bounds)
+        if self.bounds.get(reaction) != bounds:
+            if self.problem is not None:
+                self.problem.set_bounds(reaction, bounds)
+            else:
+                self.reactions[reaction].bounds = bounds
+            self.bounds[reaction] = bounds
+
+    def flux_columns(self, problem) -> list[tuple[int, int]]:
+        # GLPK columns of the forward and reverse variables, found again if columns were added or removed
+        import swiglpk
+        n_columns = swiglpk.glp_get_num_cols(problem)
+        if self.columns is None or n_columns != self.n_columns:
+            self.columns = [
+                (swiglpk.glp_find_col(problem, self.reactions[reaction].forward_variable.name),
+                 swiglpk.glp_find_col(problem, self.reactions[reaction].reverse_variable.name))
+                for reaction in FLUX_REACTIONS
+                ]
+            self.n_columns = n_columns
+        return self.columns
+
+    def fluxes(self) -> dict:
+        """
+        Fluxes of FLUX_REACTIONS in the last solution, read in one pass
+        instead of through Reaction.flux, which checks the solver status
+        and looks up both variables for every reaction.
+        """
+        if self.problem is not None:
+            return self.problem.fluxes(FLUX_REACTIONS)
+        solver = self.model.solver
+        check_solver_status(solver.status)
+        if solver.interface.__name__ == "optlang.glpk_interface":
+            import swiglpk
+            problem = solver.problem
+            values = [
+                swiglpk.glp_get_col_prim(problem, forward) - swiglpk.glp_get_col_prim(problem, reverse)
+                for forward, reverse in self.flux_columns(problem)
+                ]
+        else:
+            primals = solver.primal_values
+            values = [
+                primals[self.reactions[reaction].forward_variable.name]
+                - primals[self.reactions[reaction].reverse_variable.name]
+                for reaction in FLUX_REACTIONS
+                ]
+        return dict(zip(FLUX_REACTIONS, values))
+
+
+def model_index(model: cobra.Model, backend: str = None) -> ModelIndex:
+    """
+    The index of model, created for backend, by default the one of
+    configure_backend. An index of another backend is replaced, the new
+    one starts from the bounds and constraints of the cobra model.
+    """
+    if backend is None:
+        backend = _backend["name"]
+    index = _model_indices.get(model)
+    if index is None or index.backend != backend:
+        index = ModelIndex(model, backend)
+        _model_indices[model] = index
+    return index
+
 
 class DynamicModel:
     def __init__(
             self,
             environment,
             plant,
-            model=cobra.io.read_sbml_model(script_dir.parent / "data/PlantEd_model.sbml"),
-            start_time=0
+            model: cobra.Model = None,
+            start_time=0,
+            metrics: Metrics = None,
+            copy_model: bool = True,
+            prepared: bool = False,
+            backend: str = None,
             ):
         self.environment: Environment = environment
         self.plant = plant
-        self.model = model.copy()
-        self.model.solver.configuration.timeout = 1  # avoid getting stuck in an infinite loop of numerical instability when working with seeds
+        self.metrics = metrics if metrics is not None else Metrics()
+        # every simulate sets all bounds, constraints and coefficients it depends on,
+        # so models solved one after another can share the cobra model
+        if model is None:
+            model = load_model()
+        self.model = model.copy() if copy_model else model
+        self.index = model_index(self.model, backend)
         self.time = start_time
-        self.set_objective()
         self.used_fluxes = None
+        self.fluxes = None  # raw fluxes of the last solve, per gram and second
+        self.input_bounds = None  # bounds of the inputs of the last step
+        self.percentages = dict(INITIAL_PERCENTAGES)  # percentages and organ masses of the current ratio constraints
+        self.constraint_masses = [0] * 5
+        self.normalized_masses = None  # organ masses the transfer reactions are normalized to
+        self.warm_start = WARM_START  # start each solve from the basis of the last one, see optimize
 
-        # initial percentages to set constraints
-        percentages = {
-            "root_percent": 1,
-            "stem_percent": 0,
-            "leaf_percent": 0,
-            "seed_percent": 0,
-            "starch_percent": 0,
-            "stomata": False,
-            }
+        if not prepared:
+            self.prepare()
 
-        self.update_constraints(percentages)
+    def prepare(self):
+        """
+        Set the objective, the initial constraints and bounds. Models
+        borrowed from the ModelPool are prepared already.
+        """
+        self.model.solver.configuration.timeout = 1  # avoid getting stuck in an infinite loop of numerical instability when working with seeds
+        self.set_objective()
+        self.reset()
+
+    def reset(self):
+        # only the root grows initially, so the masses of the constraints don't matter
+        self.index.refresh()
+        self.update_constraints(INITIAL_PERCENTAGES, mass_organ=[0] * 5)
         self.init_bounds()
+        reset_basis(self.model)
 
     def to_dict(self):
         pass
 
-    def update_bounds(self, delta_t: int, percentages: dict):
+    def get_state(self) -> dict:
+        """
+        Everything needed to bring a fresh model of the same plant into the
+        current state: bounds, ratio constraints, stoichiometry and the
+        basis the next solve starts from.
+        """
+        return {
+            "time": self.time,
+            "used_fluxes": self.used_fluxes,
+            "fluxes": self.fluxes,
+            "input_bounds": self.input_bounds,
+            "bounds": {reaction: self.get_bounds(reaction) for reaction in DYNAMIC_REACTIONS},
+            "percentages": self.percentages,
+            "constraint_masses": self.constraint_masses,
+            "normalized_masses": self.normalized_masses,
+            "basis": get_basis(self.model),
+            }
+
+    def set_state(self, state: dict):
+        self.time = state["time"]
+        self.used_fluxes = state["used_fluxes"]
+        self.fluxes = state["fluxes"]
+        self.input_bounds = state["input_bounds"]
+        # a copied model has to be normalized again, see helpers.normalize
+        if state["normalized_masses"] is not None:
+            self.normalize_model(*state["normalized_masses"])
+        self.update_constraints(state["percentages"], state["constraint_masses"])
+        # after the constraints, which also set the bounds of the biomass reactions
+        for reaction, bounds in state["bounds"].items():
+            self.set_bounds(reaction, bounds)
+        set_basis(self.model, state.get("basis"))
+
+    def update_bounds(self, delta_t: int, percentages: dict) -> dict:
+        bounds = self.calculate_bounds(delta_t, percentages)
+        for reaction, reaction_bounds in bounds.items():
+            self.set_bounds(reaction, reaction_bounds)
+        return bounds
+
+    def calculate_bounds(self, delta_t: int, percentages: dict) -> dict:
         """
         Bounds are normalized to gram/gram*second
         """
+        bounds = {}
         # update bounds: nitrate, water, photon, co2, starch
         # co2
         if percentages["stomata"]:
-            self.set_bounds(CO2, (-1000, 1000))
+            bounds[CO2] = (-1000, 1000)
         else:
-            self.set_bounds(CO2, (-1000, 0))
+            bounds[CO2] = (-1000, 0)
 
         # starch
         # STARCH_OUT stays 1000, since the plant is allowed to produce it anytime
         if percentages["starch_percent"] > 0:
-            self.set_bounds(STARCH_IN, (0, 0))
+            bounds[STARCH_IN] = (0, 0)
         else:
             upper_bound_starch_in = self.plant.calc_available_starch_in_mol_per_gram_and_time(
                 percentage=percentages["starch_percent"],
                 time_in_seconds=delta_t
                 )
-            self.set_bounds(STARCH_IN, (0, upper_bound_starch_in))
+            bounds[STARCH_IN] = (0, upper_bound_starch_in)
 
         # nitrate
         root_grid = self.plant.get_root_grid()
@@ -87,13 +424,13 @@ class DynamicModel:
             k_m=Km,
             root_grid=root_grid,
             )
-        self.set_bounds(NITRATE, (-1000, nitrate_upper_bound_env_pool))
+        bounds[NITRATE] = (-1000, nitrate_upper_bound_env_pool)
 
         # photon
         photon_upper_bound = (self.plant.leaf_mass * SLA_IN_SQUARE_METER_PER_GRAM  # m^2
                               * self.environment.micromol_photon_per_square_meter(self.time, self.time + delta_t)
                               ) / self.plant.leaf_mass  # g_organ -> normalize?
-        self.set_bounds(PHOTON, (0, photon_upper_bound))
+        bounds[PHOTON] = (0, photon_upper_bound)
 
         # water
         water_upper_bound_plant_pool = (
@@ -109,13 +446,19 @@ class DynamicModel:
             water_upper_bound_plant_pool + water_upper_bound_env_pool - transpiration_per_second_and_gram, 0
             )
 
-        self.set_bounds(WATER, (-1000, max_usable_water))
-
-    def normalize_model(self):
-        root_mass = self.plant.root_mass
-        stem_mass = self.plant.stem_mass
-        leaf_mass = self.plant.leaf_mass
-        seed_mass = self.plant.seed_mass
+        bounds[WATER] = (-1000, max_usable_water)
+        return bounds
+
+    def normalize_model(self, root_mass=None, stem_mass=None, leaf_mass=None, seed_mass=None):
+        if root_mass is None:
+            root_mass = self.plant.root_mass
+            stem_mass = self.plant.stem_mass
+            leaf_mass = self.plant.leaf_mass
+            seed_mass = self.plant.seed_mass
+        self.normalized_masses = (root_mass, stem_mass, leaf_mass, seed_mass)
+        if self.index.problem is not None:
+            self.index.problem.normalize(self.model, root_mass, stem_mass, leaf_mass, seed_mass)
+            return
         normalize(
             model=self.model,
             root=root_mass,
@@ -125,31 +468,63 @@ class DynamicModel:
             )
 
     def simulate(self, delta_t, percentages):
-        # slim optimize best case
-        self.update_bounds(delta_t, percentages)
-        self.update_constraints(percentages)
-        print(f"Inputs: \n"
-              f"Water: {self.get_bounds(WATER)} \n"
-              f"nitrate: {self.get_bounds(NITRATE)} \n"
-              f"starch_in: {self.get_bounds(STARCH_IN)} with a pool of {self.plant.starch_pool} \n"
-              f"co2: {self.get_bounds(CO2)} \n"
-              f"photon: {self.get_bounds(PHOTON)} \n"
-              )
+        start = time.perf_counter()
+        bounds = self.calculate_bounds(delta_t, percentages)
+        self.input_bounds = bounds
 
+        # also with a cached solution, so the state of the model (see get_state) belongs to this step
+        for reaction, reaction_bounds in bounds.items():
+            self.set_bounds(reaction, reaction_bounds)
+        self.update_constraints(percentages)
         self.normalize_model()
-        self.model.slim_optimize()
-
-        water_flux = self.model.reactions.get_by_id(WATER).flux
-        nitrate_flux = self.model.reactions.get_by_id(NITRATE).flux
-        photon_flux = self.model.reactions.get_by_id(PHOTON).flux
-        starch_in = self.model.reactions.get_by_id(STARCH_IN).flux
-        co2 = self.model.reactions.get_by_id(CO2).flux
-
-        water_used = max(0, water_flux / self.get_bounds(WATER)[1]) if self.get_bounds(WATER)[1] > 0 else 0
-        nitrate_used = nitrate_flux / self.get_bounds(NITRATE)[1] if self.get_bounds(NITRATE)[1] > 0 else 0
-        starch_in_used = starch_in / self.get_bounds(STARCH_IN)[1] if self.get_bounds(STARCH_IN)[1] > 0 else 0
-        co2_used = co2 / self.get_bounds(CO2)[1] if self.get_bounds(CO2)[1] > 0 else 0
-        photon_used = photon_flux / self.get_bounds(PHOTON)[1] if self.get_bounds(PHOTON)[1] > 0 else 0
+
+        fluxes = None
+        if flux_cache.enabled:
+            key = flux_cache.key(
+                upper_bounds=tuple(bounds[reaction][1] for reaction in (WATER, NITRATE, PHOTON, STARCH_IN, CO2)),
+                percentages=(
+                    percentages["root_percent"],
+                    percentages["stem_percent"],
+                    percentages["leaf_percent"],
+                    percentages["seed_percent"],
+                    min(max(percentages["starch_percent"], 0), 95),
+                    ),
+                masses=(self.plant.root_mass, self.plant.stem_mass, self.plant.leaf_mass, self.plant.seed_mass),
+                )
+            fluxes = flux_cache.get(key)
+            self.metrics.observe("flux_cache_hit", 0 if fluxes is None else 1)
+
+        if fluxes is None:
+            # slim optimize best case
+            print(f"Inputs: \n"
+                  f"Water: {self.get_bounds(WATER)} \n"
+                  f"nitrate: {self.get_bounds(NITRATE)} \n"
+                  f"starch_in: {self.get_bounds(STARCH_IN)} with a pool of {self.plant.starch_pool} \n"
+                  f"co2: {self.get_bounds(CO2)} \n"
+                  f"photon: {self.get_bounds(PHOTON)} \n"
+                  )
+
+            solver_start = time.perf_counter()
+            self.optimize()
+            solver_end = time.perf_counter()
+            self.metrics.observe("model_setup", solver_start - start)
+            self.metrics.observe("solver", solver_end - solver_start)
+            fluxes = self.index.fluxes()
+            if flux_cache.enabled:
+                flux_cache.put(key, fluxes)
+        self.fluxes = fluxes
+
+        water_flux = fluxes[WATER]
+        nitrate_flux = fluxes[NITRATE]
+        photon_flux = fluxes[PHOTON]
+        starch_in = fluxes[STARCH_IN]
+        co2 = fluxes[CO2]
+
+        water_used = max(0, water_flux / bounds[WATER][1]) if bounds[WATER][1] > 0 else 0
+        nitrate_used = nitrate_flux / bounds[NITRATE][1] if bounds[NITRATE][1] > 0 else 0
+        starch_in_used = starch_in / bounds[STARCH_IN][1] if bounds[STARCH_IN][1] > 0 else 0
+        co2_used = co2 / bounds[CO2][1] if bounds[CO2][1] > 0 else 0
+        photon_used = photon_flux / bounds[PHOTON][1] if bounds[PHOTON][1] > 0 else 0
         '''print(f"Percentage used of available: \n"
               f"water_used: {water_used} of pool: \n"
               f"nitrate_used: {nitrate_used} \n"
@@ -166,15 +541,15 @@ class DynamicModel:
             "photon_used": photon_used
             }
 
-        root_flux = self.model.reactions.get_by_id(BIOMASS_ROOT).flux
-        stem_flux = self.model.reactions.get_by_id(BIOMASS_STEM).flux
-        leaf_flux = self.model.reactions.get_by_id(BIOMASS_LEAF).flux
-        seed_flux = self.model.reactions.get_by_id(BIOMASS_SEED).flux
+        root_flux = fluxes[BIOMASS_ROOT]
+        stem_flux = fluxes[BIOMASS_STEM]
+        leaf_flux = fluxes[BIOMASS_LEAF]
+        seed_flux = fluxes[BIOMASS_SEED]
 
-        starch_out_flux = self.model.reactions.get_by_id(STARCH_OUT).flux
-        starch_in_flux = self.model.reactions.get_by_id(STARCH_IN).flux
+        starch_out_flux = fluxes[STARCH_OUT]
+        starch_in_flux = fluxes[STARCH_IN]
 
-        co2_flux = self.model.reactions.get_by_id(CO2).flux
+        co2_flux = fluxes[CO2]
 
         print(f"Output: \n"
               f"water_flux: {water_flux} \n"
@@ -194,6 +569,32 @@ class DynamicModel:
         self.update_environment(delta_t, water_per_second, nitrate_per_second)
 
         self.time += delta_t
+        self.metrics.observe("simulate", time.perf_counter() - start)
+
+    def optimize(self) -> float:
+        """
+        Solve the model. With warm_start the solver starts from the basis of
+        the last solve, which stays close to optimal since consecutive steps
+        only change a few bounds and coefficients. Without it, and again if
+        a warm solve fails, it starts from the standard basis. linprog
+        always solves from scratch.
+        """
+        problem = self.index.problem
+        if problem is not None:
+            objective = problem.solve()
+            self.metrics.observe("solver_iterations", problem.iterations)
+            return objective
+        iterations = iteration_count(self.model)
+        if not self.warm_start:
+            reset_basis(self.model)
+        objective = self.model.slim_optimize()
+        if math.isnan(objective) and self.warm_start:
+            self.metrics.observe("warm_start_fallback", 1)
+            reset_basis(self.model)
+            objective = self.model.slim_optimize()
+        if iterations is not None:
+            self.metrics.observe("solver_iterations", iteration_count(self.model) - iterations)
+        return objective
 
     def update_environment(self, delta_t, water_per_second, nitrate_per_second):
         # -> drain from ground, else take from pool -> try to fill pool
@@ -266,10 +667,10 @@ class DynamicModel:
         self.set_bounds(STARCH_IN, (0, 0))
 
     def set_bounds(self, reaction, bounds):
-        self.model.reactions.get_by_id(reaction).bounds = bounds
+        self.index.set_bounds(reaction, bounds)
 
     def get_bounds(self, reaction):
-        return self.model.reactions.get_by_id(reaction).bounds
+        return self.index.bounds[reaction]
 
     def set_objective(self):
         root: Reaction = self.model.reactions.get_by_id("Biomass_tx_root")
@@ -289,25 +690,48 @@ class DynamicModel:
             )
 
         self.model.objective = objective
+        if self.index.problem is not None:
+            self.index.problem.set_objective({reaction: 1 for reaction in RATIO_REACTIONS})
 
-    def update_constraints(self, percentages):
+    def ratio_constraints(self) -> list:
+        """
+        The {a}_and_{b} constraints between the biomass reactions, created
+        once per model and changed in place by update_constraints. Returns
+        (i, j, constraint) for each pair of RATIO_REACTIONS.
+        """
+        constraints = _ratio_constraints.get(self.model)
+        if constraints is None:
+            reactions = [self.model.reactions.get_by_id(reaction) for reaction in RATIO_REACTIONS]
+            constraints = []
+            new = []
+            for i in range(len(reactions)):
+                for j in range(i + 1, len(reactions)):
+                    name = f"{RATIO_NAMES[i]}_and_{RATIO_NAMES[j]}"
+                    constraint = self.model.constraints.get(name)
+                    if constraint is None:
+                        # the coefficients are set by update_constraints
+                        constraint = self.model.problem.Constraint(
+                            reactions[i].flux_expression - reactions[j].flux_expression,
+                            lb=0,
+                            ub=0,
+                            name=name,
+                            )
+                        new.append(constraint)
+                    constraints.append((i, j, constraint))
+            if new:
+                self.model.add_cons_vars(new)
+            _ratio_constraints[self.model] = constraints
+        if self.index.problem is not None:
+            for _, _, constraint in constraints:
+                self.index.problem.add_constraint(constraint.name)
+        return constraints
+
+    def update_constraints(self, percentages, mass_organ=None):
+        self.percentages = dict(percentages)
         constraint_starch_percentage = min(max(percentages["starch_percent"], 0), 95)
         #print(constraint_starch_percentage, percentages)
 
-        root_reaction: Reaction = self.model.reactions.get_by_id(BIOMASS_ROOT)
-        stem_reaction: Reaction = self.model.reactions.get_by_id(BIOMASS_STEM)
-        leaf_reaction: Reaction = self.model.reactions.get_by_id(BIOMASS_LEAF)
-        seed_reaction: Reaction = self.model.reactions.get_by_id(BIOMASS_SEED)
-        starch_out_reaction: Reaction = self.model.reactions.get_by_id(STARCH_OUT)
-
-        names = ["root", "stem", "leaf", "seed", "starch_out"]
-        reactions = [
-            root_reaction,
-            stem_reaction,
-            leaf_reaction,
-            seed_reaction,
-            starch_out_reaction,
-            ]
+        reactions = [self.index.reactions[reaction] for reaction in RATIO_REACTIONS]
         percentage = [
             float(percentages["root_percent"]),
             float(percentages["stem_percent"]),
@@ -316,57 +740,37 @@ class DynamicModel:
             float(constraint_starch_percentage),
             ]
 
-        mass_organ = [
-            self.plant.root_mass,
-            self.plant.stem_mass,
-            self.plant.leaf_mass,
-            self.plant.seed_mass,
-            self.plant.stem_mass,
-            ]
-
-        n_reactions = len(reactions)
-        cons = []
-
-        for i in range(0, n_reactions):
-            reaction = reactions[i]
-
-            if percentage[i] == 0:
-                # cannot transfer molecule into pool
-                bounds = (0, 0)
-                reaction.bounds = bounds
-
-                # skip iteration since no constraint needs to be set
-                # since the bounds already take care of setting reaction to 0
+        if mass_organ is None:
+            mass_organ = [
+                self.plant.root_mass,
+                self.plant.stem_mass,
+                self.plant.leaf_mass,
+                self.plant.seed_mass,
+                self.plant.stem_mass,
+                ]
+        self.constraint_masses = list(mass_organ)
+
+        # reactions without a percentage can't transfer into their pool, the bounds take care of it
+        for reaction, reaction_percentage in zip(RATIO_REACTIONS, percentage):
+            self.set_bounds(reaction, (0, 1000) if reaction_percentage != 0 else (0, 0))
+
+        # flux_i * mass_i / percentage_i == flux_j * mass_j / percentage_j for all growing pairs,
+        # pairs with a reaction switched off get all coefficients 0
+        for i, j, constraint in self.ratio_constraints():
+            if percentage[i] != 0 and percentage[j] != 0:
+                factor_i = mass_organ[i] / percentage[i]
+                factor_j = mass_organ[j] / percentage[j]
             else:
-                # it's possible to transfer molecule into pool
-                # => set bounds in a way that molecule can be exported
-                bounds = (0, 1000)
-                reaction.bounds = bounds
-
-            for j in range(i + 1, n_reactions):
-                name = f"{names[i]}_and_{names[j]}"
-
-                # check for old constraint and remove them
-                old_cons = self.model.constraints.get(name)
-                if old_cons is not None:
-                    self.model.remove_cons_vars(old_cons)
-
-                # check if new constraint needs to be set in place (percentages != 0)
-                # and set them
-                if percentage[i] != 0 and percentage[j] != 0:
-                    constraint = self.model.problem.Constraint(
-                        (
-                                reactions[i].flux_expression * mass_organ[i] / percentage[i]
-                                - reactions[j].flux_expression
-                                * mass_organ[j]
-                                / percentage[j]
-                        ),
-                        lb=0,
-                        ub=0,
-                        name=name,
-                        )
-
-                    cons.append(constraint)
-
-        if cons:
-            self.model.add_cons_vars(cons)
+                factor_i = factor_j = 0
+            if self.index.problem is not None:
+                self.index.problem.set_coefficients(constraint.name, {
+                    RATIO_REACTIONS[i]: factor_i,
+                    RATIO_REACTIONS[j]: -factor_j,
+                    })
+                continue
+            constraint.set_linear_coefficients({
+                reactions[i].forward_variable: factor_i,
+                reactions[i].reverse_variable: -factor_i,
+                reactions[j].forward_variable: -factor_j,
+                reactions[j].reverse_variable: factor_j,
+                })
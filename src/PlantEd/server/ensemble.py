@@ -0,0 +1,220 @@
+"""
+Lockstep ensembles: many plants with their own policies on one scenario.
+
+All plants of an ensemble share the weather of the scenario, which is
+simulated once, and advance hour by hour together. The plants are split
+into shards, one per worker process. Within a shard the games also share
+one cobra model and solve one after another, so a worker loads the
+metabolic model once no matter how many plants it holds.
+
+Plant i gets the seed seed + i, so the same seed gives the same run, on
+any number of workers. For that every solve starts from the standard
+basis: a warm start would begin at the basis the plant solved before it
+in the shard left behind, and the LP has alternative optima. The flux
+cache, if it is turned on, breaks this too, its hits depend on the
+plants solved before in the same process.
+
+Nothing is written per plant. The observations of every hour are gathered
+into one array per OBSERVATION_FIELDS entry with a column per plant, and
+saved as a single columnar table.
+
+Usage: python ensemble.py [--plants 1000] [--hours 24] [--workers n] [--level spring_high_nitrate]
+                          [--seed 0] [--output ensemble.npz]
+"""
+import argparse
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from PlantEd.server.dynamic_model import configure_model, model_path, SBML_PATH
+from PlantEd.server.game import Game, OBSERVATION_FIELDS
+from PlantEd.server.policy import Policy
+
+# the shard of this process: plant indices, games and policies
+_shard: dict = {}
+
+
+def create_shard(level_name: str, indices: list[int], descriptions: list[dict], seed: int = 0,
+                 path=SBML_PATH) -> int:
+    configure_model(path)
+    games = []
+    for index in indices:
+        # the first game loads the weather and the model, the others share them
+        shared = {} if not games else {"weather": games[0].environment.weather, "model": games[0].model.model}
+        games.append(Game(
+            player_name="ensemble_{}".format(index),
+            icon_name="",
+            level_name=level_name,
+            time_budget=None,
+            log=False,
+            seed=seed + index,
+            **shared,
+            ))
+        # solved in the same way whichever plants share the shard, see the module docstring
+        games[-1].model.warm_start = False
+    _shard["indices"] = list(indices)
+    _shard["games"] = games
+    _shard["policies"] = [Policy(description) for description in descriptions]
+    _shard["hour"] = 0
+    return len(games)
+
+
+def advance_shard(hours: int) -> np.ndarray:
+    """
+    Step every game of the shard by up to hours hours and return their
+    observations as an array of shape (hours, plants, fields). Hours after
+    the end of the game are cut off.
+    """
+    games = _shard["games"]
+    policies = _shard["policies"]
+    rows = []
+    for _ in range(hours):
+        games[0].check_game_end()
+        if not games[0].running:
+            break
+        hour = _shard["hour"]
+        observations = []
+        for game, policy in zip(games, policies):
+            game.step(policy.message(hour, game.resolution))
+            observations.append(game.get_observation())
+        rows.append(observations)
+        _shard["hour"] = hour + 1
+    return np.array(rows, dtype=float).reshape(len(rows), len(games), len(OBSERVATION_FIELDS))
+
+
+def close_shard():
+    # the first game gives the shared model back to the pool
+    for game in _shard.get("games", []):
+        game.close()
+    _shard.clear()
+
+
+class Ensemble:
+    """
+    Args:
+        level_name: scenario all plants are grown in
+        descriptions: one policy description per plant, see policy.py
+        workers: number of worker processes, defaults to the cpu count.
+            0 simulates all plants in the calling process.
+        seed: seed of the first plant, the others count up from it
+    """
+
+    def __init__(self, level_name: str, descriptions: list[dict], workers: int = None, seed: int = 0):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        self.level_name = level_name
+        self.n_plants = len(descriptions)
+        n_shards = max(1, min(workers, self.n_plants))
+        # contiguous shards, so gathered columns are in plant order
+        self.shards = [shard.tolist() for shard in np.array_split(np.arange(self.n_plants), n_shards)]
+        self.pools = []
+        if workers == 0:
+            create_shard(level_name, self.shards[0], descriptions, seed, model_path())
+        else:
+            context = multiprocessing.get_context("spawn")
+            self.pools = [ProcessPoolExecutor(max_workers=1, mp_context=context) for _ in self.shards]
+            futures = [
+                # the workers grow the plants on the model of this process
+                pool.submit(create_shard, level_name, shard, [descriptions[i] for i in shard], seed, model_path())
+                for pool, shard in zip(self.pools, self.shards)
+                ]
+            for future in futures:
+                future.result()
+        self.hours = 0
+        self.columns: dict[str, list[np.ndarray]] = {field: [] for field in OBSERVATION_FIELDS}
+
+    def advance(self, hours: int) -> int:
+        """
+        Advance all plants by up to hours hours and return the hours
+        simulated, less than asked once the scenario is over.
+        """
+        if self.pools:
+            futures = [pool.submit(advance_shard, hours) for pool in self.pools]
+            parts = [future.result() for future in futures]
+        else:
+            parts = [advance_shard(hours)]
+        # (hours, plants, fields), all shards run the same hours
+        observations = np.concatenate(parts, axis=1)
+        for i, field in enumerate(OBSERVATION_FIELDS):
+            self.columns[field].append(observations[:, :, i])
+        self.hours += len(observations)
+        return len(observations)
+
+    def run(self, chunk_hours: int = 24) -> int:
+        """
+        Advance until the end of the scenario, chunk_hours per round trip
+        to the workers.
+        """
+        while self.advance(chunk_hours) == chunk_hours:
+            pass
+        return self.hours
+
+    def observations(self) -> dict[str, np.ndarray]:
+        """
+        Observations so far, per field an array of shape (hours, plants).
+        """
+        return {
+            field: np.concatenate(parts) if parts else np.empty((0, self.n_plants))
+            for field, parts in self.columns.items()
+            }
+
+    def table(self) -> dict[str, np.ndarray]:
+        """
+        One row per plant and hour: hour and plant columns followed by the
+        observation fields.
+        """
+        observations = self.observations()
+        hours, plants = np.meshgrid(np.arange(self.hours), np.arange(self.n_plants), indexing="ij")
+        table = {"hour": hours.ravel(), "plant": plants.ravel()}
+        for field, values in observations.items():
+            table[field] = values.ravel()
+        return table
+
+    def save(self, path: str):
+        np.savez(path, **self.table())
+
+    def close(self):
+        if self.pools:
+            for pool in self.pools:
+                pool.submit(close_shard)
+                pool.shutdown(wait=True)
+            self.pools = []
+        else:
+            close_shard()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Grow an ensemble of plants and report its throughput")
+    parser.add_argument("--plants", type=int, default=1000)
+    parser.add_argument("--hours", type=int, default=24, help="hours to simulate, 0 for the whole scenario")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--level", default="spring_high_nitrate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="save the table of observations here (.npz)")
+    args = parser.parse_args()
+
+    # plants with different allocations, from mostly roots to mostly leaves
+    descriptions = [
+        {"growth_percentages": {"0": {"leaf_percent": 10 + 60 * i / max(1, args.plants - 1),
+                                      "root_percent": 70 - 60 * i / max(1, args.plants - 1)}}}
+        for i in range(args.plants)
+        ]
+    start = time.perf_counter()
+    ensemble = Ensemble(args.level, descriptions, workers=args.workers, seed=args.seed)
+    created = time.perf_counter()
+    hours = ensemble.run() if args.hours == 0 else ensemble.advance(args.hours)
+    end = time.perf_counter()
+    if args.output:
+        ensemble.save(args.output)
+    ensemble.close()
+
+    plant_hours = hours * args.plants
+    print(f"{args.plants} plants in {len(ensemble.shards)} shards, created in {created - start:.1f}s")
+    print(f"{hours} hours in {end - created:.1f}s: {plant_hours / (end - created):.0f} plant hours/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -12,9 +12,35 @@ from PlantEd.server.weather import WeatherSimulator
 fileDir = Path(__file__)
 script_dir = fileDir.parent.parent
 
+# simulated weather by (filename, seed), shared by all environments of this process
+_weather_cache: dict[tuple, WeatherSimulator] = {}
+
+
+def load_weather(filename: str, seed: float) -> WeatherSimulator:
+    """
+    Parse a weather file, build its transition table and simulate the whole
+    trace once per process. The weather is only read after it is simulated,
+    so every game of a scenario can share the same WeatherSimulator.
+    """
+    key = (filename, seed)
+    weather = _weather_cache.get(key)
+    if weather is None:
+        df_weather: pd.DataFrame = pd.read_csv(script_dir / filename)
+        weather = WeatherSimulator(
+            data=df_weather,
+            seed=seed
+        )
+        _weather_cache[key] = weather
+    return weather
+
+
+def preload_scenarios(scenarios: dict):
+    for scenario in scenarios.values():
+        load_weather(scenario["filename"], scenario["weather_seed"])
+
 
 class Environment:
-    def __init__(self, start_time, scenario):
+    def __init__(self, start_time, scenario, weather: WeatherSimulator = None):
         self.time = start_time  # seconds
         self.peak_photon = scenario["photon_peak"]
         self.water_grid: MetaboliteGrid = MetaboliteGrid(max_metabolite_cell=MAX_WATER_PER_CELL,
@@ -26,11 +52,9 @@ class Environment:
         self.nitrate_grid.add2cell(1, 9, 0)
         self.nitrate_grid.add2cell(0.5, 10, 0)
 
-        df_weather: pd.DataFrame = pd.read_csv(script_dir / scenario["filename"])
-        self.weather: WeatherSimulator = WeatherSimulator(
-            data=df_weather,
-            seed=scenario["weather_seed"]
-        )
+        if weather is None:
+            weather = load_weather(scenario["filename"], scenario["weather_seed"])
+        self.weather: WeatherSimulator = weather
 
     def update(self, delta_t):
         weather_state = self.weather.get_weather_state(int(self.time / 3600))
@@ -80,8 +104,9 @@ class Environment:
             "temperature": weather_state.temperature,
             "humidity": weather_state.humidity,
             "precipitation": weather_state.precipitation,
-            "nitrate_grid": self.nitrate_grid.grid.tolist(),
-            "water_grid": self.water_grid.grid.tolist(),
+            # arrays are converted when the state is encoded (see server/wire.py)
+            "nitrate_grid": self.nitrate_grid.grid.copy(),
+            "water_grid": self.water_grid.grid.copy(),
             "sun_intensity": self.get_sun_intensity()
             # "water_grid_size": self.water_grid.grid_size,
         }
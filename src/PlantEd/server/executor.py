@@ -0,0 +1,225 @@
+"""
+Executors decide where the games of a server are simulated.
+
+The module level functions below operate on the games of the current
+process. The InlineExecutor calls them directly on the event loop thread,
+the ProcessPoolSimulationExecutor calls them inside a worker process that
+the session is pinned to. Each worker process loads the metabolic model
+once and keeps all games of its sessions in memory.
+
+Work that belongs to no session, like a fast-forwarded game, goes through
+submit_detached. It never runs in a process that holds games of sessions,
+so a long job doesn't hold up their requests.
+"""
+import asyncio
+import multiprocessing
+import os
+import signal
+from concurrent.futures import ProcessPoolExecutor
+
+from PlantEd.constants import FBA_BACKEND, FLUX_CACHE_SIZE, FLUX_CACHE_TOLERANCE
+from PlantEd.server.dynamic_model import configure_backend, configure_model, model_path, SBML_PATH
+from PlantEd.server.flux_cache import configure_flux_cache, flux_cache
+from PlantEd.server.game import Game
+
+# games simulated by this process, keyed by session id
+_games: dict[str, Game] = {}
+
+
+def _init_worker(backend=FBA_BACKEND, flux_cache_size=FLUX_CACHE_SIZE, flux_cache_tolerance=FLUX_CACHE_TOLERANCE,
+                 path=SBML_PATH):
+    # Ctrl+C and service managers signal the whole process group, the server stops the workers after saving
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    # the model, the weather of all levels and a few prepared models are ready before the first load_level
+    from PlantEd.server.dynamic_model import load_model
+    from PlantEd.server.environment import preload_scenarios
+    from PlantEd.server.game import scenarios
+    from PlantEd.server.model_pool import fill_model_pool
+    configure_backend(backend)
+    configure_flux_cache(flux_cache_size, flux_cache_tolerance)
+    configure_model(path)
+    load_model()
+    preload_scenarios(scenarios)
+    fill_model_pool()
+
+
+def _ping():
+    return True
+
+
+def flux_cache_stats() -> dict:
+    return flux_cache.stats()
+
+
+def create_game(session_id, player_name, icon_name, level_name) -> str:
+    game = Game(
+        player_name=player_name,
+        icon_name=icon_name,
+        level_name=level_name,
+        )
+    _games[session_id] = game
+    return game.level_name
+
+
+def fork_game(session_id, new_session_id, player_name=None) -> str:
+    # forks stay in the process of their origin, the session has to be pinned to the same worker
+    game = _games[session_id].fork(player_name)
+    _games[new_session_id] = game
+    return game.level_name
+
+
+def restore_game(session_id, snapshot) -> str:
+    game = Game.restore(snapshot)
+    _games[session_id] = game
+    return game.level_name
+
+
+def call_game(session_id, method, *args):
+    return getattr(_games[session_id], method)(*args)
+
+
+def discard_game(session_id, method=None, *args):
+    """
+    Remove a game from this process. If method is given it is called on
+    the game before dropping it, e.g. to end it or close its logs.
+    """
+    game = _games.pop(session_id, None)
+    if game is not None and method is not None:
+        return getattr(game, method)(*args)
+
+
+class InlineExecutor:
+    """
+    Runs all games on the event loop thread. Cheapest for a single player,
+    but one long simulation blocks every other connection. Jobs of no
+    session run in a process of their own, which is started for each of
+    them: the solver is not thread-safe.
+
+    Args:
+        backend, flux_cache_size, flux_cache_tolerance: settings of the
+            processes of submit_detached, the same as those of this one
+    """
+
+    def __init__(self, backend: str = FBA_BACKEND, flux_cache_size: int = FLUX_CACHE_SIZE,
+                 flux_cache_tolerance: float = FLUX_CACHE_TOLERANCE):
+        self.initargs = (backend, flux_cache_size, flux_cache_tolerance, model_path())
+
+    def pin(self, session, worker=None):
+        pass
+
+    def release(self, session):
+        pass
+
+    async def submit(self, session, fn, *args):
+        return fn(*args)
+
+    async def submit_background(self, session, fn, *args):
+        # refills, in a thread so they don't block the event loop
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, fn, *args)
+
+    async def submit_detached(self, fn, *args):
+        # e.g. whole games, the games of the event loop keep their solver state to themselves
+        pool = ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_init_worker, initargs=self.initargs)
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(pool, fn, *args)
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    async def call_workers(self, fn, *args) -> list:
+        # one result for the only "worker", this process
+        return [fn(*args)]
+
+    def shutdown(self):
+        pass
+
+
+class ProcessPoolSimulationExecutor:
+    """
+    Runs games in a pool of worker processes. Every worker has a single
+    process, so the games of a session always stay in the same worker and
+    only requests and responses cross the process boundary.
+
+    Jobs of no session run in a separate pool of detached_workers
+    processes, started with the first of them.
+
+    Args:
+        workers: number of worker processes, defaults to the cpu count
+        backend: FBA backend of the workers, see configure_backend
+        detached_workers: number of worker processes for submit_detached
+        flux_cache_size: solutions in the flux cache of each worker
+        flux_cache_tolerance: tolerance of the flux caches
+    """
+
+    def __init__(self, workers: int = None, backend: str = FBA_BACKEND, detached_workers: int = 1,
+                 flux_cache_size: int = FLUX_CACHE_SIZE, flux_cache_tolerance: float = FLUX_CACHE_TOLERANCE):
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # the workers simulate the model of the server process
+        self.initargs = (backend, flux_cache_size, flux_cache_tolerance, model_path())
+        self.detached_workers = detached_workers
+        self.context = multiprocessing.get_context("spawn")
+        self.pools = [
+            ProcessPoolExecutor(max_workers=1, mp_context=self.context, initializer=_init_worker,
+                                initargs=self.initargs)
+            for _ in range(workers)
+            ]
+        self.detached = None
+        self.n_sessions = [0] * workers
+        # start the workers right away so the first load_level does not pay for it
+        for pool in self.pools:
+            pool.submit(_ping)
+
+    def pin(self, session, worker=None):
+        if worker is None:
+            worker = min(range(len(self.pools)), key=lambda i: self.n_sessions[i])
+        self.n_sessions[worker] += 1
+        session.worker = worker
+
+    def release(self, session):
+        if session.worker is not None:
+            self.n_sessions[session.worker] -= 1
+            session.worker = None
+
+    async def submit(self, session, fn, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.pools[session.worker], fn, *args)
+
+    async def submit_background(self, session, fn, *args):
+        # the workers run apart from the event loop already
+        return await self.submit(session, fn, *args)
+
+    async def submit_detached(self, fn, *args):
+        if self.detached is None:
+            self.detached = ProcessPoolExecutor(
+                max_workers=self.detached_workers, mp_context=self.context, initializer=_init_worker,
+                initargs=self.initargs)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.detached, fn, *args)
+
+    async def call_workers(self, fn, *args) -> list:
+        # one result per worker of the sessions, in the order of the workers
+        loop = asyncio.get_running_loop()
+        return await asyncio.gather(*(loop.run_in_executor(pool, fn, *args) for pool in self.pools))
+
+    def shutdown(self):
+        for pool in self.pools:
+            pool.shutdown(wait=False, cancel_futures=True)
+        if self.detached is not None:
+            self.detached.shutdown(wait=False, cancel_futures=True)
+
+
+def create_executor(mode: str = "inline", workers: int = None, backend: str = FBA_BACKEND,
+                    flux_cache_size: int = FLUX_CACHE_SIZE, flux_cache_tolerance: float = FLUX_CACHE_TOLERANCE):
+    if mode == "inline":
+        configure_backend(backend)
+        configure_flux_cache(flux_cache_size, flux_cache_tolerance)
+        return InlineExecutor(backend=backend, flux_cache_size=flux_cache_size,
+                              flux_cache_tolerance=flux_cache_tolerance)
+    elif mode == "process":
+        return ProcessPoolSimulationExecutor(workers=workers, backend=backend, flux_cache_size=flux_cache_size,
+                                             flux_cache_tolerance=flux_cache_tolerance)
+    raise ValueError(f"Unknown simulation executor: {mode}")
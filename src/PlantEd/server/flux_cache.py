@@ -0,0 +1,90 @@
+"""
+LRU cache of FBA solutions, shared by all games of a process.
+
+The solution of DynamicModel.simulate only depends on the upper bounds of
+the inputs, the growth percentages and the ratios of the organ masses, so
+solves with (almost) the same inputs can reuse the fluxes of an earlier
+one, also across players of the same scenario.
+
+Inputs are quantized before they form the key: with a tolerance t, values
+that differ by less than a factor of about (1 + t) share a key. t = 0
+only matches identical inputs.
+"""
+import math
+from collections import OrderedDict
+
+from PlantEd.constants import FLUX_CACHE_SIZE, FLUX_CACHE_TOLERANCE
+
+
+def quantize(value: float, tolerance: float):
+    if tolerance <= 0:
+        return value
+    if value == 0:
+        return 0, 0
+    # relative steps, so small and large bounds are cached with the same precision,
+    # the sign is kept apart because values near 1 and -1 are step 0 like 0 itself
+    return (1 if value > 0 else -1), round(math.log(abs(value)) / math.log1p(tolerance))
+
+
+class FluxCache:
+    """
+    Args:
+        size: number of solutions kept, 0 disables the cache
+        tolerance: relative difference of inputs that still counts as a hit
+    """
+
+    def __init__(self, size: int = FLUX_CACHE_SIZE, tolerance: float = FLUX_CACHE_TOLERANCE):
+        self.size = size
+        self.tolerance = tolerance
+        self.solutions: OrderedDict[tuple, dict] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.size > 0
+
+    def key(self, upper_bounds: tuple, percentages: tuple, masses: tuple) -> tuple:
+        total = sum(masses)
+        return (
+            tuple(quantize(bound, self.tolerance) for bound in upper_bounds),
+            tuple(percentages),
+            tuple(quantize(mass / total if total > 0 else 0, self.tolerance) for mass in masses),
+            )
+
+    def get(self, key: tuple) -> dict | None:
+        fluxes = self.solutions.get(key)
+        if fluxes is None:
+            self.misses += 1
+            return None
+        self.solutions.move_to_end(key)
+        self.hits += 1
+        return fluxes
+
+    def put(self, key: tuple, fluxes: dict):
+        self.solutions[key] = fluxes
+        self.solutions.move_to_end(key)
+        while len(self.solutions) > self.size:
+            self.solutions.popitem(last=False)
+
+    def clear(self):
+        self.solutions.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.solutions),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else None,
+            }
+
+
+# shared by all models of this process, configure with configure_flux_cache
+flux_cache = FluxCache()
+
+
+def configure_flux_cache(size: int = FLUX_CACHE_SIZE, tolerance: float = FLUX_CACHE_TOLERANCE):
+    flux_cache.size = size
+    flux_cache.tolerance = tolerance
+    flux_cache.clear()
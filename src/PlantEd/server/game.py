@@ -1,16 +1,24 @@
+import copy
+import json
 import os
+import pickle
+import random
+import shutil
 import time
+import zlib
 
 import numpy as np
 import pandas
 
-from PlantEd.client.analysis import scoring
-from PlantEd.client.analysis.logger import Log
+from PlantEd.client.analysis.logger import Log, NullLog, copy_log
 from PlantEd.constants import MAX_DAYS, ROOT_COST, BRANCH_COST, LEAF_COST, FLOWER_COST, WATERING_CAN_COST, NITRATE_COST, \
-    Vmax, Km
+    Vmax, Km, ADAPTIVE_STEPPING, ADAPTIVE_MAX_STEP_HOURS, ADAPTIVE_TOLERANCE, SIMULATION_TIME_BUDGET
 from PlantEd.server.plant import Plant
-from PlantEd.server.dynamic_model import DynamicModel
+from PlantEd.server.dynamic_model import DynamicModel, PHOTON
 from PlantEd.server.environment import Environment
+from PlantEd.server.metrics import Metrics
+from PlantEd.server.model_pool import model_pool
+from PlantEd.server.uploads import spool_score
 import logging
 
 logger = logging.getLogger("server")
@@ -56,14 +64,93 @@ scenarios = {
         }
     }
 
+# columns of the observation rows returned by Game.update_batch
+OBSERVATION_FIELDS = (
+    "time",
+    "temperature",
+    "sun_intensity",
+    "humidity",
+    "precipitation",
+    "accessible_water",
+    "accessible_nitrate",
+    "leaf_biomass",
+    "stem_biomass",
+    "root_biomass",
+    "seed_biomass",
+    "starch_pool",
+    "max_starch_pool",
+    "water_pool",
+    "max_water_pool",
+    "green_thumbs",
+    "n_leaves",
+    "n_stems",
+    "n_roots",
+    "n_seeds",
+    "open_spots",
+    )
+
+# hours of the day around dawn (8:00) and dusk (20:00), simulated hour by hour
+TWILIGHT_HOURS = (7, 8, 19, 20)
+
+# bump when the layout of Game.snapshot changes
+SNAPSHOT_VERSION = 3
+
+# plain attributes of a Game, stored as they are in snapshots and forks
+GAME_FIELDS = (
+    "path_to_logs",
+    "player_name",
+    "icon_name",
+    "level_name",
+    "time",
+    "resolution",
+    "green_thumbs",
+    "time_left_from_last_simulation",
+    "running",
+    "nitrate_available",
+    "water_available",
+    "adaptive",
+    "time_budget",
+    "step_hours",
+    "previous_fluxes",
+    "seed",
+    )
+
 
 class Game:
     def __init__(self, player_name, icon_name, level_name="spring_high_nitrate", start_time=0, resolution=3600,
-                 green_thumbs=25):
-        since_epoch = time.time()
-        self.path_to_logs = "./data/finished_games/{}{}".format(player_name, since_epoch)
-        os.makedirs(self.path_to_logs)
-        self.log = Log(self.path_to_logs)  # can be turned off
+                 green_thumbs=25, adaptive=ADAPTIVE_STEPPING, time_budget=SIMULATION_TIME_BUDGET, log=True,
+                 weather=None, model=None, seed=None):
+        """
+        weather and model are only given by ensembles: games then share the
+        WeatherSimulator and the cobra model instead of building their own,
+        and must not be simulated concurrently.
+
+        seed initializes the random generators of the plant, the same seed
+        and messages give the same game, see replay.py. The generators
+        belong to this game only, the random module shared by all games of
+        the process is never seeded.
+        """
+        self.seed = random.randrange(2 ** 32) if seed is None else seed
+        if log:
+            since_epoch = time.time()
+            self.path_to_logs = "./data/finished_games/{}{}".format(player_name, since_epoch)
+            os.makedirs(self.path_to_logs)
+            self.log = Log(self.path_to_logs)  # can be turned off
+            with open(self.path_to_logs + "/game.json", "w") as file:
+                json.dump({
+                    "player_name": player_name,
+                    "icon_name": icon_name,
+                    "level_name": level_name,
+                    "start_time": start_time,
+                    "resolution": resolution,
+                    "green_thumbs": green_thumbs,
+                    "adaptive": adaptive,
+                    "time_budget": time_budget,
+                    "seed": self.seed,
+                    }, file)
+        else:
+            self.path_to_logs = None
+            self.log = NullLog()
         self.player_name = player_name
         self.icon_name = icon_name
         self.level_name = level_name
@@ -71,21 +158,131 @@ class Game:
         self.resolution = resolution
         self.green_thumbs = green_thumbs
         self.time_left_from_last_simulation = 0  # seconds
-        self.plant = Plant(ground_grid_resolution=(20, 6))
-        self.environment = Environment(start_time=self.time, scenario=scenarios[level_name])
-        self.model = DynamicModel(self.environment, self.plant)
+        self.plant = Plant(
+            ground_grid_resolution=(20, 6),
+            rng=random.Random(self.seed),
+            np_rng=np.random.default_rng(self.seed),
+            )
+        self.environment = Environment(start_time=self.time, scenario=scenarios[level_name], weather=weather)
+        self.metrics = Metrics()
+        # borrowed models go back to the pool on close
+        self.model_borrowed = model is None
+        if model is None:
+            model = model_pool.borrow()
+        self.model = DynamicModel(self.environment, self.plant, model=model, metrics=self.metrics, copy_model=False,
+                                  prepared=self.model_borrowed)
         self.running = True
+        self.nitrate_available = 0
+        self.water_available = 0
+        self.adaptive = adaptive  # merge calm hours into one solve, see next_step_hours
+        self.time_budget = time_budget  # seconds of simulation per step, the rest is caught up later
+        self.step_hours = 1
+        self.previous_fluxes = None
 
     def check_game_end(self):
-        if self.time / (60 * 60 * 24) >= MAX_DAYS:
+        # hours still to catch up are simulated before the game ends
+        if self.time / (60 * 60 * 24) >= MAX_DAYS and self.time_left_from_last_simulation < self.resolution:
             self.running = False
 
     def force_end_game(self, message) -> dict:
         self.log.close_model_file()
         #df = pandas.read_csv(self.path_to_logs + "/model_logs.csv")
         #plot.generate_big_plot(df, self.path_to_logs)
-        scoring.upload_score(self.player_name, self.plant.seed_mass, self.path_to_logs, self.icon_name)
-        return {"path_to_logs": self.path_to_logs}
+        # uploaded by the UploadQueue of the server, never blocks the game
+        upload_id = spool_score(self.player_name, self.plant.seed_mass, self.path_to_logs, self.icon_name)
+        self.release_model()
+        return {"path_to_logs": self.path_to_logs, "upload_id": upload_id}
+
+    def close(self):
+        # abandoned game: keep the logs but skip the score upload
+        self.log.close_model_file()
+        self.release_model()
+
+    def release_model(self):
+        # the game can't be simulated any more afterwards
+        if self.model_borrowed:
+            self.model_borrowed = False
+            model_pool.give_back(self.model.model)
+
+    def snapshot(self) -> bytes:
+        """
+        Serialize the whole game: plant organs, both metabolite grids, the
+        weather, the time accumulators and the bounds and constraints of the
+        model. The random generators of the game belong to the plant and
+        are stored with it, the random module of the process is left alone.
+        The log itself is not part of the snapshot, a restored game
+        continues the file at path_to_logs.
+        """
+        self.log.flush()
+        state = {
+            "version": SNAPSHOT_VERSION,
+            "game": {field: getattr(self, field) for field in GAME_FIELDS},
+            "plant": self.plant,
+            "environment": self.environment,
+            "model": self.model.get_state(),
+            }
+        return zlib.compress(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL))
+
+    @classmethod
+    def restore(cls, snapshot: bytes, path_to_logs: str = None) -> "Game":
+        """
+        Create a game from a snapshot. Without path_to_logs the log of the
+        snapshotted game is continued.
+        """
+        state = pickle.loads(zlib.decompress(snapshot))
+        if state["version"] != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {state['version']}")
+        game = cls.__new__(cls)
+        for field, value in state["game"].items():
+            setattr(game, field, value)
+        if path_to_logs is not None:
+            game.path_to_logs = path_to_logs
+        if game.path_to_logs is not None:
+            os.makedirs(game.path_to_logs, exist_ok=True)
+            game.log = Log(game.path_to_logs, append=True)
+        else:
+            game.log = NullLog()
+        game.plant = state["plant"]
+        game.environment = state["environment"]
+        game.metrics = Metrics()
+        game.model_borrowed = True
+        game.model = DynamicModel(game.environment, game.plant, model=model_pool.borrow(), metrics=game.metrics,
+                                  copy_model=False, prepared=True)
+        game.model.set_state(state["model"])
+        return game
+
+    def fork(self, player_name: str = None) -> "Game":
+        """
+        Clone the game in memory, e.g. to simulate several branches from
+        the same state. The fork gets a copy of the log so far and logs to
+        its own directory. The fork gets a copy of the random generators of
+        the plant, both games draw the same numbers from there on.
+        """
+        fork = Game.__new__(Game)
+        for field in GAME_FIELDS:
+            setattr(fork, field, getattr(self, field))
+        if player_name is not None:
+            fork.player_name = player_name
+        if self.path_to_logs is not None:
+            fork.path_to_logs = "./data/finished_games/{}{}".format(fork.player_name, time.time())
+            os.makedirs(fork.path_to_logs)
+            self.log.flush()
+            copy_log(self.path_to_logs, fork.path_to_logs)
+            shutil.copyfile(self.path_to_logs + "/game.json", fork.path_to_logs + "/game.json")
+            fork.log = Log(fork.path_to_logs, append=True)
+        else:
+            fork.log = NullLog()
+
+        # the weather is fully simulated when the game is created and only read afterwards
+        memo = {id(self.environment.weather): self.environment.weather}
+        fork.plant = copy.deepcopy(self.plant)
+        fork.environment = copy.deepcopy(self.environment, memo)
+        fork.metrics = Metrics()
+        # copying the solved model keeps its bounds, constraints and stoichiometry
+        fork.model_borrowed = False
+        fork.model = DynamicModel(fork.environment, fork.plant, model=self.model.model, metrics=fork.metrics)
+        fork.model.set_state(self.model.get_state())
+        return fork
 
     # dt in seconds
     def update(self, message) -> dict:
@@ -95,6 +292,46 @@ class Game:
             # create scores
             # close logs
             # upload data
+        self.step(message)
+        return self.get_game_state()
+
+    def update_batch(self, messages: list[dict], every: int = 0) -> dict:
+        """
+        Run several update messages back to back without building the game
+        state in between. Returns the final state, every k-th state if
+        every > 0, and one observation row per step (see OBSERVATION_FIELDS).
+        """
+        states = []
+        observations = []
+        state = {}
+        for i, message in enumerate(messages):
+            if not self.running:
+                self.log.close_model_file()
+                break
+            self.step(message)
+            observations.append(self.get_observation())
+            # the state of the last step, building it twice would lose the new root ids
+            state = None
+            if every > 0 and (i + 1) % every == 0:
+                state = self.get_game_state()
+                states.append(state)
+        if state is None:
+            state = self.get_game_state()
+
+        return {
+            "n_steps": len(observations),
+            "state": state,
+            "states": states,
+            "observation_fields": OBSERVATION_FIELDS,
+            "observations": np.array(observations).reshape(-1, len(OBSERVATION_FIELDS)),
+            }
+
+    def step(self, message):
+        """
+        Advance the game by one update message: apply the shop actions,
+        simulate delta_t and log the result.
+        """
+        start = time.perf_counter()
         self.check_game_end()
         delta_t = message["delta_t"]
         growth_percentages = message["growth_percentages"]
@@ -145,9 +382,20 @@ class Game:
                                 self.plant.create_new_seed()
                                 self.green_thumbs -= FLOWER_COST
 
-        for i in range(n_simulations):
-            self.plant.update(self.resolution)
-            self.environment.update(self.resolution)
+        hour = 0
+        while hour < n_simulations:
+            if self.time_budget is not None and hour > 0 and time.perf_counter() - start > self.time_budget:
+                # out of time: carry the remaining hours, the client is told about the lag
+                self.time_left_from_last_simulation += (n_simulations - hour) * self.resolution
+                break
+            step_hours = self.next_step_hours(n_simulations - hour, bool(actions) and hour == 0)
+            hour += step_hours
+            # soil and plant stay hourly, only the solve covers the whole step
+            for i in range(step_hours):
+                self.plant.update(self.resolution)
+                soil_start = time.perf_counter()
+                self.environment.update(self.resolution)
+                self.metrics.observe("soil_update", time.perf_counter() - soil_start)
 
             '''print(f"Leaf Mass: {self.plant.leaf_mass}, L Mass to grow: {self.plant.get_leaf_mass_to_grow()}, Max: {self.plant.leaf_mass + self.plant.get_leaf_mass_to_grow()} \n"
                   f"Stem Mass: {self.plant.stem_mass}, S Mass to grow: {self.plant.get_stem_mass_to_grow()}, Max: {self.plant.stem_mass + self.plant.get_stem_mass_to_grow()}\n"
@@ -168,13 +416,20 @@ class Game:
             sum_percentages = sum(
                 [value for key, value in percentages.items() if key != "starch_percent" and key != "stomata"]) + max(0, percentages["starch_percent"])
             if sum_percentages > 0:
-                self.model.simulate(self.resolution, percentages)
+                self.model.simulate(self.resolution * step_hours, percentages)
+                self.adapt_step_hours()
 
         weather_state = self.environment.weather.get_weather_state(int(self.time / 3600))
 
         # Todo make for new roots
-        nitrate_available_mm = self.environment.nitrate_grid.available_relative_mm(delta_t, self.plant.root_mass, Vmax, Km, self.plant.get_root_grid())
+        # per second of the hours simulated, not of delta_t: lag and delta_t = 0 leave hours out or simulate none
+        simulated_seconds = self.resolution * hour
+        if simulated_seconds > 0:
+            self.nitrate_available = self.environment.nitrate_grid.available_relative_mm(
+                simulated_seconds, self.plant.root_mass, Vmax, Km, self.plant.get_root_grid())
+        nitrate_available_mm = self.nitrate_available
         water_available = self.environment.water_grid.available_absolute(self.plant.get_root_grid())
+        self.water_available = water_available
 
         self.log.append_model_row(
             time=self.time,
@@ -197,6 +452,7 @@ class Game:
             root_percent=growth_percentages["root_percent"],
             seed_percent=growth_percentages["seed_percent"],
             starch_percent=growth_percentages["starch_percent"],
+            stomata=growth_percentages["stomata"],
             n_leaves=len(self.plant.leafs),
             n_stems=len(self.plant.branches),
             n_roots=len(self.plant.roots),
@@ -209,15 +465,90 @@ class Game:
         if self.model.used_fluxes is not None:
             self.model.used_fluxes["nitrate_available"] = nitrate_available_mm
 
+        self.metrics.observe("hour_steps", hour)
+        self.metrics.observe("game_step", time.perf_counter() - start)
+
+    def next_step_hours(self, remaining_hours: int, shop_actions: bool) -> int:
+        """
+        Number of hours the next solve covers. Without adaptive stepping
+        every hour is solved. Otherwise the step grows while the fluxes stay
+        calm (see adapt_step_hours), but never covers rain or the hours
+        around dawn and dusk, and the first step after shop actions is a
+        single hour.
+
+        Error: a merged step reuses fluxes that differed by at most
+        ADAPTIVE_TOLERANCE (relative) between the last two solves, so the
+        growth of a merged step deviates from the hourly run by about that
+        fraction as long as the trend continues. Rain, twilight and shop
+        actions, where fluxes jump, are always solved hourly.
+        """
+        if not self.adaptive or shop_actions:
+            return 1
+        first_hour = int(self.environment.time / 3600)
+        step_hours = min(self.step_hours, remaining_hours)
+        for i in range(step_hours):
+            hour = first_hour + i
+            if hour % 24 in TWILIGHT_HOURS or self.environment.weather.get_weather_state(hour).precipitation > 0:
+                return max(i, 1)
+        return step_hours
+
+    def adapt_step_hours(self):
+        """
+        Double the step after a solve whose fluxes and photon bound are
+        within ADAPTIVE_TOLERANCE of the previous one, otherwise fall back
+        to single hours. Fluxes are per gram and second, so solves of
+        different step lengths are comparable.
+        """
+        if not self.adaptive:
+            return
+        fluxes = [*self.model.fluxes.values(), self.model.input_bounds[PHOTON][1]]
+        previous, self.previous_fluxes = self.previous_fluxes, fluxes
+        calm = previous is not None and all(
+            abs(a - b) <= ADAPTIVE_TOLERANCE * max(abs(a), abs(b)) + 1e-12 for a, b in zip(previous, fluxes)
+            )
+        self.step_hours = min(self.step_hours * 2, ADAPTIVE_MAX_STEP_HOURS) if calm else 1
+
+    def get_game_state(self) -> dict:
         game_state = {
             "running": self.running,
             "plant": self.plant.to_dict(),
             "environment": self.environment.to_dict(),
             "green_thumbs": self.green_thumbs,
             "used_fluxes": self.model.used_fluxes,
-            "nitrate_available": nitrate_available_mm,
-            "water_available": water_available,
-            "gametime": self.time
+            "nitrate_available": self.nitrate_available,
+            "water_available": self.water_available,
+            "gametime": self.time,
+            # seconds of game time not simulated yet
+            "lag": self.time_left_from_last_simulation,
             }
 
         return game_state
+
+    def get_metrics(self) -> dict:
+        return self.metrics.to_dict()
+
+    def get_observation(self) -> list[float]:
+        weather_state = self.environment.weather.get_weather_state(int(self.time / 3600))
+        return [
+            self.time,
+            weather_state[0],
+            self.environment.get_sun_intensity(),
+            weather_state[1],
+            weather_state[2],
+            self.water_available,
+            self.nitrate_available,
+            self.plant.leaf_mass,
+            self.plant.stem_mass,
+            self.plant.root_mass,
+            self.plant.seed_mass,
+            self.plant.starch_pool,
+            self.plant.max_starch_pool,
+            self.plant.water_pool,
+            self.plant.max_water_pool,
+            self.green_thumbs,
+            len(self.plant.leafs),
+            len(self.plant.branches),
+            len(self.plant.roots),
+            len(self.plant.seeds),
+            self.plant.get_free_spots(),
+            ]
@@ -10,10 +10,10 @@ Functions that create Constraints are:
 from contextlib import suppress
 from itertools import product
 from pathlib import Path
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Tuple
+from weakref import WeakKeyDictionary
 
 from cobra.core import Metabolite, Model, Reaction, Solution
-from cobra.core.dictlist import DictList
 from cobra.exceptions import OptimizationError
 from optlang.interface import Constraint, Objective
 from sympy import Add
@@ -286,29 +286,35 @@ def update_stoichiometry(
     reaction.add_metabolites(metabolites, combine=False)
 
 
-def _normalize_reactions(
-    transfers: DictList, left: float = 1.0, right: float = 1.0
-):
+class _Transfers:
     """
-    This function modifies each reaction in the transfers list taking the
-    size of the organs into consideration.
+    Coefficient slots of the transfer reactions of one model in the solver:
+    (pair, product, constraint, forward variable, reverse variable) for
+    every metabolite of every transfer reaction. pair indexes the organ
+    pairs root|stem, stem|leaf and leaf|seed. A product gets the mass of
+    the first organ of its pair, a substrate the negative mass of the
+    second one.
     """
 
-    assert left > 0, "Left coefficient must be higher than 0"
-    assert right > 0, "Right coefficient must be higher than 0"
-
-    # conversion
-    LEFT = right
-    RIGHT = left
+    def __init__(self, model: Model):
+        self.slots = []
+        for pair, query in enumerate((r"\[root\|stem\]", r"\[stem\|leaf\]", r"\[leaf\|seed\]")):
+            reactions = model.reactions.query(query)
+            assert len(reactions) != 0, f"No transfers {query} found!"
+            for reaction in reactions:
+                for metabolite, coef in reaction.metabolites.items():
+                    self.slots.append((
+                        pair,
+                        coef > 0,
+                        model.constraints[metabolite.id],
+                        reaction.forward_variable,
+                        reaction.reverse_variable,
+                    ))
+        self.pairs = None  # organ masses per pair the solver holds
 
-    reaction: Reaction
-    for reaction in transfers:
-        update_stoichiometry(reaction, LEFT, RIGHT)
 
-
-root_stem: Optional[DictList] = None
-stem_leaf: Optional[DictList] = None
-leaf_seed: Optional[DictList] = None
+# transfer reactions per model, every game has its own copy of the model
+_transfers: "WeakKeyDictionary[Model, _Transfers]" = WeakKeyDictionary()
 
 
 def normalize(
@@ -317,24 +323,56 @@ def normalize(
     """
     Main function to normalize PlantED model. The non-model argument are
     the values that represents the size of the organ.
+
+    The coefficients are changed in the solver only, the reactions of the
+    cobra model keep their original stoichiometry. Coefficients of organ
+    pairs whose masses did not change since the last call are skipped.
+
+    So the solver and reaction.metabolites disagree once a model has been
+    normalized. Everything built from the reactions sees the SBML
+    stoichiometry: write_sbml_model, LinprogProblem and anything else that
+    exports the model. model.copy() copies the solver, but the copy
+    starts without masses here and its next normalize writes every
+    coefficient. Callers that copy or export a normalized model have to
+    normalize the result again before solving it, e.g. with the masses of
+    normalized_masses. DynamicModel does so in set_state and when it
+    creates a LinprogProblem.
     """
-    global root_stem
-    global stem_leaf
-    global leaf_seed
-
-    if None in (root_stem, stem_leaf, leaf_seed):
-        root_stem = model.reactions.query(r"\[root\|stem\]")
-        stem_leaf = model.reactions.query(r"\[stem\|leaf\]")
-        leaf_seed = model.reactions.query(r"\[leaf\|seed\]")
+    transfers = _transfers.get(model)
+    if transfers is None:
+        transfers = _transfers[model] = _Transfers(model)
     # FIXME: seed
-
-    assert len(root_stem) != 0, "No transfers from root to stem found!"
-    assert len(stem_leaf) != 0, "No transfers from stem to leaf found!"
-    assert len(leaf_seed) != 0, "No transfers from leaf to seed found!"
-
-    _normalize_reactions(root_stem, root, stem)
-    _normalize_reactions(stem_leaf, stem, leaf)
-    _normalize_reactions(leaf_seed, leaf, seed) # ToDo leaf to seed or stem to seed
+    pairs = ((root, stem), (stem, leaf), (leaf, seed)) # ToDo leaf to seed or stem to seed
+    if pairs == transfers.pairs:
+        return
+    for left, right in pairs:
+        assert left > 0, "Left coefficient must be higher than 0"
+        assert right > 0, "Right coefficient must be higher than 0"
+
+    coefficients: Dict[Constraint, Dict] = {}
+    for pair, product, constraint, forward, reverse in transfers.slots:
+        if transfers.pairs is not None and transfers.pairs[pair] == pairs[pair]:
+            continue
+        left, right = pairs[pair]
+        coef = left if product else -right
+        changes = coefficients.setdefault(constraint, {})
+        changes[forward] = coef
+        changes[reverse] = -coef
+    for constraint, changes in coefficients.items():
+        constraint.set_linear_coefficients(changes)
+    transfers.pairs = pairs
+
+
+def normalized_masses(model: Model) -> Tuple[float, float, float, float] | None:
+    """
+    The root, stem, leaf and seed masses model was last normalized to, or
+    None if normalize was never called for it.
+    """
+    transfers = _transfers.get(model)
+    if transfers is None or transfers.pairs is None:
+        return None
+    (root, stem), (_, leaf), (_, seed) = transfers.pairs
+    return root, stem, leaf, seed
 
 
 def create_objective(model: Model, direction: str = "max") -> Objective:
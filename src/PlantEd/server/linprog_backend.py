@@ -0,0 +1,200 @@
+"""
+FBA with scipy.optimize.linprog instead of cobra and optlang.
+
+The structure of the LP never changes while a game runs: the
+stoichiometric matrix, the ratio constraints and the objective stay, only
+a few bounds and the coefficients of the ratio constraints and transfer
+reactions change between steps. LinprogProblem exports all of it once
+from the cobra model into numpy arrays and a sparse matrix, changes the
+numbers in place and hands the arrays to HiGHS for every solve. Nothing
+goes through sympy or the optlang interface per step.
+
+There is one variable per reaction (the net flux, bounded like the
+reaction) and every constraint is a row of A x = b. Constraints with
+lb != ub get a slack variable bounded by lb and ub instead: a x - s = 0.
+
+The cobra model itself is not changed by the problem. Like
+helpers.normalize, normalize only changes the problem, the reactions keep
+their SBML stoichiometry. DynamicModel keeps the problem of a model in its
+ModelIndex, select the backend with configure_backend or --backend of the
+server.
+"""
+import math
+
+import numpy as np
+import scipy.sparse
+from cobra import Model
+from cobra.exceptions import OptimizationError
+from cobra.util.solver import linear_reaction_coefficients
+from scipy.optimize import linprog
+
+
+class LinprogProblem:
+    """
+    Args:
+        model: cobra model with the metabolites, reactions, extra
+            constraints and objective to export
+        time_limit: seconds HiGHS may take per solve
+    """
+
+    def __init__(self, model: Model, time_limit: float = 1):
+        self.time_limit = time_limit
+        self.columns = {reaction.id: i for i, reaction in enumerate(model.reactions)}
+        self.rows = {metabolite.id: i for i, metabolite in enumerate(model.metabolites)}
+        self.rhs = [0] * len(self.rows)
+        self.lower = [reaction.lower_bound for reaction in model.reactions]
+        self.upper = [reaction.upper_bound for reaction in model.reactions]
+        self.objective = np.zeros(len(self.lower))
+        # entries of the matrix, in the order they were added
+        self.entries: dict[tuple[int, int], float] = {}
+        self.matrix = None
+        self.positions = None
+        for column, reaction in enumerate(model.reactions):
+            for metabolite, coefficient in reaction.metabolites.items():
+                self.entries[(self.rows[metabolite.id], column)] = coefficient
+        # the rest of the constraints, e.g. the ratio constraints, as net flux coefficients
+        variables = {}
+        for reaction in model.reactions:
+            variables[reaction.forward_variable.name] = (reaction.id, 1)
+            variables[reaction.reverse_variable.name] = (reaction.id, -1)
+        for constraint in model.constraints:
+            if constraint.name in self.rows:
+                continue
+            coefficients = {}
+            for variable, value in constraint.get_linear_coefficients(constraint.variables).items():
+                if variable.name not in variables:
+                    raise ValueError(f"Constraint {constraint.name} uses {variable.name}, which is no reaction")
+                reaction, sign = variables[variable.name]
+                # the reverse variable has the negated coefficient of the forward one
+                coefficients.setdefault(reaction, sign * value)
+            self.add_constraint(constraint.name, coefficients, constraint.lb, constraint.ub)
+        self.set_objective({
+            reaction.id: coefficient for reaction, coefficient in linear_reaction_coefficients(model).items()
+            })
+        self.transfers = None  # positions of the transfer coefficients, see normalize
+        self.pairs = None
+        self.solution = None
+        self.status = None
+        self.iterations = 0
+
+    def add_constraint(self, name: str, coefficients: dict = None, lb: float = 0, ub: float = 0):
+        """
+        Add a row lb <= sum(coefficient * flux) <= ub. Does nothing if a
+        constraint of that name exists already.
+        """
+        if name in self.rows:
+            return
+        row = len(self.rows)
+        self.rows[name] = row
+        if lb is None or ub is None or lb != ub:
+            self.columns[f"slack_{name}"] = column = len(self.lower)
+            self.lower.append(-math.inf if lb is None else lb)
+            self.upper.append(math.inf if ub is None else ub)
+            self.objective = np.append(self.objective, 0)
+            self.entries[(row, column)] = -1
+            self.rhs.append(0)
+        else:
+            self.rhs.append(lb)
+        self.set_coefficients(name, coefficients or {})
+
+    def set_coefficients(self, name: str, coefficients: dict):
+        # coefficients of reactions by id, 0 keeps the entry so it can be changed again cheaply
+        row = self.rows[name]
+        for reaction, value in coefficients.items():
+            self.set_entry(row, self.columns[reaction], value)
+
+    def set_entry(self, row: int, column: int, value: float):
+        key = (row, column)
+        if self.matrix is not None:
+            position = self.positions.get(key)
+            if position is None:
+                # a new entry changes the structure, the matrix is built again before the next solve
+                self.matrix = None
+            else:
+                self.matrix.data[position] = value
+        self.entries[key] = value
+
+    def set_objective(self, coefficients: dict):
+        # maximized
+        self.objective[:] = 0
+        for reaction, coefficient in coefficients.items():
+            self.objective[self.columns[reaction]] = coefficient
+
+    def set_bounds(self, reaction: str, bounds: tuple):
+        column = self.columns[reaction]
+        self.lower[column], self.upper[column] = bounds
+
+    def get_bounds(self, reaction: str) -> tuple:
+        column = self.columns[reaction]
+        return self.lower[column], self.upper[column]
+
+    def normalize(self, model: Model, root: float, stem: float, leaf: float, seed: float):
+        """
+        Same as helpers.normalize: products of the transfer reactions get
+        the mass of the first organ of their pair, substrates the negative
+        mass of the second one. Unchanged pairs are skipped.
+        """
+        if self.transfers is None:
+            self.transfers = []
+            for pair, query in enumerate((r"\[root\|stem\]", r"\[stem\|leaf\]", r"\[leaf\|seed\]")):
+                reactions = model.reactions.query(query)
+                assert len(reactions) != 0, f"No transfers {query} found!"
+                for reaction in reactions:
+                    for metabolite, coef in reaction.metabolites.items():
+                        self.transfers.append((pair, coef > 0, self.rows[metabolite.id], self.columns[reaction.id]))
+        pairs = ((root, stem), (stem, leaf), (leaf, seed))
+        if pairs == self.pairs:
+            return
+        for left, right in pairs:
+            assert left > 0, "Left coefficient must be higher than 0"
+            assert right > 0, "Right coefficient must be higher than 0"
+        for pair, product, row, column in self.transfers:
+            if self.pairs is not None and self.pairs[pair] == pairs[pair]:
+                continue
+            left, right = pairs[pair]
+            self.set_entry(row, column, left if product else -right)
+        self.pairs = pairs
+
+    def build(self):
+        keys = list(self.entries)
+        rows = np.array([row for row, _ in keys], dtype=np.int64)
+        columns = np.array([column for _, column in keys], dtype=np.int64)
+        # no duplicates, so the csr matrix keeps one slot per entry, zeros included
+        matrix = scipy.sparse.csr_matrix(
+            (np.array(list(self.entries.values()), dtype=float), (rows, columns)),
+            shape=(len(self.rows), len(self.lower)),
+            )
+        # the slot of every entry in matrix.data, to change coefficients in place
+        self.positions = {}
+        for row in range(matrix.shape[0]):
+            for position in range(matrix.indptr[row], matrix.indptr[row + 1]):
+                self.positions[(row, int(matrix.indices[position]))] = position
+        self.matrix = matrix
+
+    def solve(self) -> float:
+        """
+        Maximize the objective and return its value, nan if HiGHS found no
+        optimal solution.
+        """
+        if self.matrix is None or self.matrix.shape != (len(self.rows), len(self.lower)):
+            self.build()
+        result = linprog(
+            -self.objective,
+            A_eq=self.matrix,
+            b_eq=np.array(self.rhs, dtype=float),
+            bounds=np.column_stack((self.lower, self.upper)),
+            method="highs",
+            options={"time_limit": self.time_limit},
+            )
+        self.status = result.message
+        self.iterations = result.nit
+        if result.status != 0:
+            self.solution = None
+            return math.nan
+        self.solution = result.x
+        return -result.fun
+
+    def fluxes(self, reactions) -> dict:
+        if self.solution is None:
+            raise OptimizationError(f"linprog found no optimal solution: {self.status}")
+        return {reaction: float(self.solution[self.columns[reaction]]) for reaction in reactions}
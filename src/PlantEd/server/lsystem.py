@@ -51,7 +51,8 @@ class Letter:
             t: float = None,
             branching_t: list[float] = None,
             length: float = 0,
-            pos: tuple[float, float] = (0, 0)
+            pos: tuple[float, float] = (0, 0),
+            np_rng: np.random.Generator = None,
     ):
         self.id: int = id
         self.tier: int = tier
@@ -59,7 +60,7 @@ class Letter:
         self.dir: tuple[float, float] = dir
         if branching_t is None:
             self.branching_t: float = (
-                np.random.random(max_branches).tolist()
+                (np_rng if np_rng is not None else np.random).random(max_branches).tolist()
                 if max_branches is not None
                 else None
             )  # branching dist
@@ -209,7 +210,12 @@ class LSystem:
             directions: list[tuple[float, float]] = [],
             positions: list[tuple[float, float]] = None,
             mass: float = 0,
+            rng: random.Random = None,
+            np_rng: np.random.Generator = None,
     ):
+        # random numbers of this plant only, games sharing a process must not share a generator
+        self.rng = rng if rng is not None else random.Random()
+        self.np_rng = np_rng if np_rng is not None else np.random.default_rng()
         self.root_grid: np.ndarray = root_grid
         self.water_grid_pos: tuple[float, float] = water_grid_pos
         self.positions: list[tuple[float, float]] = positions if positions is not None else []
@@ -290,6 +296,7 @@ class LSystem:
             max_branches=dic["max_branches"],
             branches=[apex],
             t=1,
+            np_rng=self.np_rng,
         )
         branching.branching_t.sort()
         basal = Letter(
@@ -381,6 +388,7 @@ class LSystem:
                 max_branches=letter.max_branches - len(letter.branches),
                 branches=[apex],
                 t=1,
+                np_rng=self.np_rng,
             )
             segment.branching_t = letter.branching_t
             letter.branching_t = []
@@ -411,10 +419,10 @@ class LSystem:
             )
 
     def get_random_dir(self, tries, growth_dir=None, down=(0, 1)):
-        phi = random.uniform(0, math.pi)
+        phi = self.rng.uniform(0, math.pi)
         dir = (math.cos(phi), math.sin(phi))
         for i in range(0, tries):
-            phi = random.uniform(0, math.pi)
+            phi = self.rng.uniform(0, math.pi)
             x = math.cos(phi)
             y = math.sin(phi)
 
@@ -464,7 +472,7 @@ class LSystem:
 
     def get_ortogonal(self, v1):
         norm_vec = self.unit_vector(v1)
-        v2 = np.random.randn(2)
+        v2 = self.np_rng.standard_normal(2)
         v2 -= v2.dot(norm_vec) * norm_vec
         v2 /= np.linalg.norm(v2)
         return v2
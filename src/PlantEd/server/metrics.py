@@ -0,0 +1,137 @@
+"""
+Low overhead metrics for the server.
+
+Timings are taken with time.perf_counter around the phases of a request and
+collected in histograms with fixed buckets, so recording a value is a
+bisect plus two additions and histograms of different games can be merged.
+
+Names used by the server:
+
+    request         seconds from receiving a command to having its response
+    encode          seconds to serialize a response (JSON or binary)
+    queue_depth     commands received but not yet answered, at arrival
+    game_step       seconds of one Game.step
+    hour_steps      simulated hours per Game.step
+    soil_update     seconds of Environment.update (rain, water and nitrate)
+    model_setup     seconds to update bounds, constraints and stoichiometry
+    solver          seconds of the LP solve in DynamicModel.simulate
+    simulate        seconds of one DynamicModel.simulate
+    flux_cache_hit  1 for each solve answered by the flux cache, 0 for a miss,
+                    so the mean is the hit rate
+    solver_iterations
+                    simplex iterations of one solve (GLPK and linprog)
+    warm_start_fallback
+                    1 for each warm started solve that failed and was
+                    repeated from the standard basis
+"""
+import bisect
+import math
+
+# seconds, 10us to 100s in steps of ~x2
+TIME_BUCKETS = tuple(10 ** (exponent / 3) for exponent in range(-15, 7))
+# counts, e.g. hour steps per request or queue depth
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024)
+
+COUNT_METRICS = ("queue_depth", "hour_steps", "flux_cache_hit", "solver_iterations", "warm_start_fallback")
+
+
+class Histogram:
+    """
+    Counts values in buckets given by their upper bounds. Values above the
+    last bound go into an extra overflow bucket.
+    """
+
+    def __init__(self, bounds=TIME_BUCKETS):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other: "Histogram"):
+        if other.bounds != self.bounds:
+            raise ValueError("Histograms with different buckets can not be merged")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile, exact for the
+        extremes.
+        """
+        if self.count == 0:
+            return None
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.bounds + (self.max,), self.counts):
+            seen += count
+            if seen >= rank:
+                return min(max(bound, self.min), self.max)
+        return self.max
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "mean": self.sum / self.count if self.count else None,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "bounds": list(self.bounds),
+            "counts": list(self.counts),
+            }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "Histogram":
+        histogram = cls(data["bounds"])
+        histogram.counts = list(data["counts"])
+        histogram.count = data["count"]
+        histogram.sum = data["sum"]
+        if data["count"]:
+            histogram.min = data["min"]
+            histogram.max = data["max"]
+        return histogram
+
+
+class Metrics:
+    """
+    A set of named histograms, created on first use.
+    """
+
+    def __init__(self):
+        self.histograms: dict[str, Histogram] = {}
+
+    def histogram(self, name: str) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = Histogram(COUNT_BUCKETS if name in COUNT_METRICS else TIME_BUCKETS)
+            self.histograms[name] = histogram
+        return histogram
+
+    def observe(self, name: str, value: float):
+        self.histogram(name).observe(value)
+
+    def merge(self, data: dict):
+        """
+        Add the histograms of another Metrics, given as to_dict() output.
+        """
+        for name, histogram in data.items():
+            self.histogram(name).merge(Histogram.from_dict(histogram))
+
+    def to_dict(self) -> dict:
+        return {name: histogram.to_dict() for name, histogram in self.histograms.items()}
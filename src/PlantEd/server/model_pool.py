@@ -0,0 +1,70 @@
+"""
+Prepared copies of the metabolic model for new games.
+
+Copying the cobra model and setting its objective and initial constraints
+is the bulk of creating a game. The pool does that ahead of time: a game
+borrows a prepared model when it is created and gives it back when it is
+closed, after which its bounds and ratio constraints are reset. The
+stoichiometry is left as it is, simulate normalizes it before every solve.
+
+fill is cheap to call often, it only copies models while the pool holds
+fewer than size. The server calls it after load_level, so the copy is made
+between requests instead of during one. With the inline executor it runs
+in a thread next to the event loop, one fill at a time.
+"""
+import threading
+
+import cobra
+
+from PlantEd.constants import MODEL_POOL_SIZE
+from PlantEd.server.dynamic_model import DynamicModel, load_model
+
+
+class ModelPool:
+    """
+    Args:
+        size: number of prepared models kept, 0 disables the pool
+    """
+
+    def __init__(self, size: int = MODEL_POOL_SIZE):
+        self.size = size
+        self.models: list[cobra.Model] = []
+        self.lock = threading.Lock()
+        self.fill_lock = threading.Lock()
+        self.borrowed = 0
+        self.prepared = 0
+
+    def prepare(self) -> cobra.Model:
+        self.prepared += 1
+        return DynamicModel(None, None, model=load_model()).model
+
+    def borrow(self) -> cobra.Model:
+        with self.lock:
+            model = self.models.pop() if self.models else None
+        self.borrowed += 1
+        return model if model is not None else self.prepare()
+
+    def give_back(self, model: cobra.Model):
+        DynamicModel(None, None, model=model, copy_model=False, prepared=True).reset()
+        with self.lock:
+            if len(self.models) < self.size:
+                self.models.append(model)
+
+    def fill(self):
+        # concurrent fills would copy more models than the pool keeps
+        with self.fill_lock:
+            while len(self.models) < self.size:
+                model = self.prepare()
+                with self.lock:
+                    self.models.append(model)
+
+    def stats(self) -> dict:
+        return {"size": len(self.models), "borrowed": self.borrowed, "prepared": self.prepared}
+
+
+# shared by all games of this process
+model_pool = ModelPool()
+
+
+def fill_model_pool():
+    model_pool.fill()
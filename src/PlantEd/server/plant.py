@@ -1,4 +1,5 @@
 import json
+import random
 import numpy as np
 
 from PlantEd.constants import START_LEAF_BIOMASS_GRAM, START_STEM_BIOMASS_GRAM, \
@@ -36,11 +37,14 @@ class Seed:
 
 
 class Plant:
-    def __init__(self, ground_grid_resolution):
+    def __init__(self, ground_grid_resolution, rng: random.Random = None, np_rng: np.random.Generator = None):
+        # the random numbers of this plant, see Game.__init__
+        self.rng = rng if rng is not None else random.Random()
+        self.np_rng = np_rng if np_rng is not None else np.random.default_rng()
         self.leafs: list[Leaf] = [Leaf(0, START_LEAF_BIOMASS_GRAM)]
         self.branches: list[Branch] = [Branch(0, START_STEM_BIOMASS_GRAM, BRANCH_SPOTS_BASE)]
         self.roots: list[Root] = []
-        self.root_generator = RootGenerator()
+        self.root_generator = RootGenerator(rng=self.rng)
         self.new_root_ids: list[int] = []
         self.roots.append(Root(0, START_ROOT_BIOMASS_GRAM))
         self.root_generator.generate_root_list(id=0, start_mass=START_ROOT_BIOMASS_GRAM/2)
@@ -56,6 +60,8 @@ class Plant:
         #        ground_grid_resolution,
         #    ),  # same resolution as environment grids
         #    water_grid_pos=(0, 900),  # hardcoded at ui [game.py 310]
+        #    rng=self.rng,
+        #    np_rng=self.np_rng,
         #)
         #self.lsystem.create_new_first_letter((0, 1), PLANT_POS, self.root_mass)
         #self.lsystem.update(self.root_mass)
@@ -0,0 +1,100 @@
+"""
+Scripted allocation policies to play whole games on the server, e.g. to
+evaluate balancing changes without a client.
+
+A policy is described by a dict with all hours counted from the start of
+the game:
+
+    growth_percentages  {hour: percentages}, each entry is used from its
+                        hour until the next one. percentages holds
+                        leaf_percent, stem_percent, root_percent and
+                        starch_percent like the messages of the client.
+    stomata             [open_hour, close_hour], hours of the day with open
+                        stomata, or a bool for always open / closed
+    shop_actions        {hour: {action: content}}, same actions and content
+                        as the shop_actions of the client, e.g.
+                        {"buy_leaf": 1, "buy_root": {"directions": [[40, 800]]}}
+
+Keys may be strings, so descriptions can be sent as JSON.
+"""
+import bisect
+
+from PlantEd.server.game import Game, OBSERVATION_FIELDS
+
+SHOP_ACTIONS = ("buy_watering_can", "buy_nitrate", "buy_leaf", "buy_branch", "buy_root", "buy_seed")
+
+DEFAULT_PERCENTAGES = {
+    "leaf_percent": 30,
+    "stem_percent": 20,
+    "root_percent": 40,
+    "seed_percent": 0,
+    "starch_percent": 10,
+    }
+
+
+class Policy:
+    """
+    Turns a policy description into one update message per game hour.
+    """
+
+    def __init__(self, description: dict):
+        schedule = description.get("growth_percentages", {0: DEFAULT_PERCENTAGES})
+        self.hours = sorted(int(hour) for hour in schedule)
+        by_hour = {int(hour): percentages for hour, percentages in schedule.items()}
+        self.percentages = [{**DEFAULT_PERCENTAGES, **by_hour[hour]} for hour in self.hours]
+        self.stomata = description.get("stomata", True)
+        self.shop_actions = {int(hour): actions for hour, actions in description.get("shop_actions", {}).items()}
+
+    def stomata_open(self, hour: int) -> bool:
+        if isinstance(self.stomata, bool):
+            return self.stomata
+        open_hour, close_hour = self.stomata
+        return open_hour <= hour % 24 < close_hour
+
+    def growth_percentages(self, hour: int) -> dict:
+        index = bisect.bisect_right(self.hours, hour) - 1
+        percentages = dict(self.percentages[max(index, 0)])
+        percentages["stomata"] = self.stomata_open(hour)
+        return percentages
+
+    def message(self, hour: int, resolution: int = 3600) -> dict:
+        actions = self.shop_actions.get(hour, {})
+        return {
+            "delta_t": resolution,
+            "growth_percentages": self.growth_percentages(hour),
+            "shop_actions": {action: actions.get(action) for action in SHOP_ACTIONS},
+            }
+
+
+def fast_forward(description: dict, level_name: str = "spring_high_nitrate", player_name: str = "policy",
+                 seed: int = 0) -> dict:
+    """
+    Play a whole game with a scripted policy and return the score (final
+    seed mass) and the trajectory as columns: the observations of every
+    hour (see OBSERVATION_FIELDS) and the growth percentages of the
+    policy. The game runs without a time budget and the same seed, so the
+    same policy always gets the same result. Nothing is written to disk
+    or uploaded.
+    """
+    policy = Policy(description)
+    game = Game(player_name=player_name, icon_name="", level_name=level_name, time_budget=None, log=False, seed=seed)
+    log = {field: [] for field in OBSERVATION_FIELDS}
+    hour = 0
+    while True:
+        game.check_game_end()
+        if not game.running:
+            break
+        message = policy.message(hour, game.resolution)
+        game.step(message)
+        for field, value in zip(OBSERVATION_FIELDS, game.get_observation()):
+            log[field].append(value)
+        for name, value in message["growth_percentages"].items():
+            log.setdefault(name, []).append(value)
+        hour += 1
+    game.close()
+
+    return {
+        "score": game.plant.seed_mass,
+        "hours": hour,
+        "log": log,
+        }
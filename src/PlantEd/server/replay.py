@@ -0,0 +1,143 @@
+"""
+Deterministic replay of a finished game from its log.
+
+Every row of model_logs.csv belongs to one Game.update: the game time after
+the update, the growth percentages, the stomata and the shop actions. With
+the settings and the random seed stored in game.json next to the log, the
+messages of the client can be rebuilt and played again without a client.
+The replay checks that the plant grows exactly as logged, which makes a
+recorded game both a realistic benchmark workload and a regression test
+for changes to the solver and the model setup.
+
+Replays are exact for games that ran without a time budget and without
+a tolerant flux cache. With a budget (see Game.time_budget) hours can be
+deferred to later updates, which the log doesn't record, so replay
+refuses such games up front.
+
+Usage: python replay.py data/finished_games/<game> [--rtol 1e-9] [--cold] [--backend cobra|linprog]
+"""
+import argparse
+import ast
+import json
+import time
+
+import numpy as np
+import pandas
+
+from PlantEd.constants import WARM_START, FBA_BACKEND
+from PlantEd.server.dynamic_model import BACKENDS, configure_backend
+from PlantEd.server.game import Game, OBSERVATION_FIELDS
+from PlantEd.server.policy import SHOP_ACTIONS
+
+# compared row by row with the log
+TRAJECTORY_FIELDS = ("leaf_biomass", "stem_biomass", "root_biomass", "seed_biomass", "starch_pool")
+
+
+class ReplayMismatch(AssertionError):
+    pass
+
+
+class ReplayUnsupported(ValueError):
+    pass
+
+
+def read_game(path_to_logs: str) -> tuple[dict, pandas.DataFrame]:
+    with open(path_to_logs + "/game.json") as file:
+        info = json.load(file)
+    # round_trip parses the logged floats exactly
+    log = pandas.read_csv(path_to_logs + "/model_logs.csv", float_precision="round_trip")
+    return info, log
+
+
+def messages(info: dict, log: pandas.DataFrame) -> list[dict]:
+    """
+    Rebuild the update messages of the client, one per log row.
+    """
+    previous_time = info["start_time"]
+    rebuilt = []
+    for row in log.itertuples(index=False):
+        shop_actions = {action: None for action in SHOP_ACTIONS}
+        shop_actions.update(ast.literal_eval(row.action))
+        rebuilt.append({
+            "delta_t": row.time - previous_time,
+            "growth_percentages": {
+                "leaf_percent": row.leaf_percent,
+                "stem_percent": row.stem_percent,
+                "root_percent": row.root_percent,
+                "seed_percent": row.seed_percent,
+                "starch_percent": row.starch_percent,
+                "stomata": bool(row.stomata),
+                },
+            "shop_actions": shop_actions,
+            })
+        previous_time = row.time
+    return rebuilt
+
+
+def replay(path_to_logs: str, rtol: float = 1e-9, warm_start: bool = WARM_START) -> dict:
+    """
+    Play the logged game again without logging and compare the biomass
+    trajectory. Raises ReplayMismatch at the first row that differs by
+    more than rtol, otherwise returns the timings and metrics of the run.
+    warm_start=False solves every step from scratch, e.g. to compare the
+    solver_iterations of both. Games recorded with a time budget raise
+    ReplayUnsupported.
+    """
+    info, log = read_game(path_to_logs)
+    if info.get("time_budget") is not None:
+        raise ReplayUnsupported(
+            f"{path_to_logs} was recorded with a time budget of {info['time_budget']}s, "
+            f"its deferred hours are not logged")
+    game = Game(
+        player_name=info["player_name"],
+        icon_name=info["icon_name"],
+        level_name=info["level_name"],
+        start_time=info["start_time"],
+        resolution=info["resolution"],
+        green_thumbs=info["green_thumbs"],
+        adaptive=info["adaptive"],
+        time_budget=None,
+        log=False,
+        seed=info["seed"],
+        )
+    game.model.warm_start = warm_start
+    columns = [OBSERVATION_FIELDS.index(field) for field in TRAJECTORY_FIELDS]
+    expected = log[list(TRAJECTORY_FIELDS)].to_numpy()
+
+    start = time.perf_counter()
+    for i, message in enumerate(messages(info, log)):
+        game.step(message)
+        observed = np.array(game.get_observation())[columns]
+        if not np.allclose(observed, expected[i], rtol=rtol, atol=0):
+            field = TRAJECTORY_FIELDS[int(np.argmax(~np.isclose(observed, expected[i], rtol=rtol, atol=0)))]
+            raise ReplayMismatch(
+                f"Replay of {path_to_logs} differs at row {i} (time {game.time}): "
+                f"{field} {observed[TRAJECTORY_FIELDS.index(field)]} != {expected[i][TRAJECTORY_FIELDS.index(field)]}")
+    seconds = time.perf_counter() - start
+    game.close()
+
+    return {
+        "steps": len(log),
+        "seconds": seconds,
+        "seconds_per_step": seconds / len(log) if len(log) else None,
+        "metrics": game.metrics.to_dict(),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a finished game and check its biomass trajectory")
+    parser.add_argument("path_to_logs")
+    parser.add_argument("--rtol", type=float, default=1e-9)
+    parser.add_argument("--cold", action="store_true", help="solve every step without warm start")
+    parser.add_argument("--backend", choices=BACKENDS, default=FBA_BACKEND,
+                        help="FBA backend, the other one may pick another of several optima, raise --rtol")
+    args = parser.parse_args()
+    configure_backend(args.backend)
+    result = replay(args.path_to_logs, rtol=args.rtol, warm_start=not args.cold)
+    print(f"replayed {result['steps']} steps in {result['seconds']:.2f}s, trajectory matches")
+    for name, histogram in result["metrics"].items():
+        print(f"{name:>16} count {histogram['count']:>6} mean {histogram['mean']:.6f} p99 {histogram['p99']:.6f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -10,8 +10,11 @@ class RootGenerator:
     def __init__(
             self,
             start_pos: tuple[int, int] = (10, 0),
-            delta_mass_to_get_grid: float = MAXIMUM_ROOT_BIOMASS_GRAM/20
+            delta_mass_to_get_grid: float = MAXIMUM_ROOT_BIOMASS_GRAM/20,
+            rng: random.Random = None,
     ):
+        # random numbers of this plant only, games sharing a process must not share a generator
+        self.rng = rng if rng is not None else random.Random()
         self.start_pos = start_pos
         self.delta_mass_to_get_grid = delta_mass_to_get_grid
         self.root_grid_size = ROOT_GRID_SIZE
@@ -109,6 +112,7 @@ class RootGenerator:
         if start_pos is None:
             start_pos = self.start_pos
         root_structure: RootStructure = RootStructure(
+            rng=self.rng,
             root_id=root_id,
             tier=tier,
             tries=self.root_classes[tier]["tries"],
@@ -131,7 +135,7 @@ class RootGenerator:
                 tier=root_structure.tier + 1,
                 start_mass=start_mass + (end_mass - start_mass) * t,
                 end_mass=root_structure.end_mass,
-                direction=get_ortogonal(root_structure.direction),
+                direction=get_ortogonal(root_structure.direction, self.rng),
                 start_pos=root_structure.get_pos_at_t(t_branch=t),
             )
         return root_list
@@ -171,6 +175,7 @@ class RootStructure:
             n_branches: int = 0,
             n_segments: int = 5,
             stop_upward: bool = True,
+            rng: random.Random = None,
     ):
         self.root_id = root_id
         self.tier = tier
@@ -185,8 +190,9 @@ class RootStructure:
         self.n_branches = n_branches
         self.stop_upward = stop_upward
 
-        self.branches_t: list[float] = [random.random() for _ in range(n_branches)]
-        self.segments_t: list[float] = [random.random() for _ in range(n_segments)]
+        self.rng = rng if rng is not None else random.Random()
+        self.branches_t: list[float] = [self.rng.random() for _ in range(n_branches)]
+        self.segments_t: list[float] = [self.rng.random() for _ in range(n_segments)]
         self.segments_t.sort()
         self.segments_t.append(1)  # add ending
         self.segments: list[tuple[float, float]] = [self.start_pos]
@@ -263,6 +269,7 @@ class RootStructure:
             # random_point = self.generate_random_point(length)
 
             random_direction = semi_random_vector(
+                rng=self.rng,
                 previous_direction=self.direction,
                 gravity_effect=self.gravity_effect,
                 num_tries=self.tries,
@@ -275,8 +282,8 @@ class RootStructure:
             previous_pos = next_pos
             t_sum_previous += delta_t
 
-def get_ortogonal(v1):
-    flip = random.randint(0, 1) * 2 - 1
+def get_ortogonal(v1, rng: random.Random):
+    flip = rng.randint(0, 1) * 2 - 1
     orthogonal_vector = (-v1[1] * flip, v1[0])
     return orthogonal_vector
 
@@ -285,8 +292,8 @@ def add_vector(vector_a: tuple[float, float], vector_b: tuple[float, float]) ->
     return vector_a[0] + vector_b[0], vector_a[1] + vector_b[1]
 
 
-def semi_random_vector(previous_direction: tuple[float, float], gravity_effect: float, num_tries: int,
-                       stop_upwards: bool = False) -> Union[None, tuple[float, float]]:
+def semi_random_vector(rng: random.Random, previous_direction: tuple[float, float], gravity_effect: float,
+                       num_tries: int, stop_upwards: bool = False) -> Union[None, tuple[float, float]]:
     # Normalize the desired direction
     gravity_vector = (0, gravity_effect)
     previous_direction = normalize_vector(previous_direction)
@@ -299,9 +306,9 @@ def semi_random_vector(previous_direction: tuple[float, float], gravity_effect:
     for _ in range(num_tries):
         # Generate a random 2D vector
         if stop_upwards:
-            random_vector = [random.uniform(-1, 1), random.uniform(0, 1)]
+            random_vector = [rng.uniform(-1, 1), rng.uniform(0, 1)]
         else:
-            random_vector = [random.uniform(-1, 1), random.uniform(-1, 1)]
+            random_vector = [rng.uniform(-1, 1), rng.uniform(-1, 1)]
         random_vector = normalize_vector(random_vector)
 
         # Calculate the angle between the random vector and the desired direction
@@ -1,58 +1,353 @@
-# Usage: python server.py <level>
+# Usage: python server.py [--port 8765] [--max-sessions n] [--idle-timeout seconds]
+#                         [--executor inline|process] [--workers n] [--upload-url url]
+#                         [--snapshot-dir dir] [--backend cobra|linprog]
+#                         [--flux-cache-size n] [--flux-cache-tolerance t]
+import argparse
 import asyncio
+import os
+import signal
+import time
 import websockets
 import json
-from PlantEd.server.game import Game
+from PlantEd.constants import MAX_SESSIONS, SESSION_IDLE_TIMEOUT, SESSION_EVICTION_INTERVAL, SIMULATION_EXECUTOR, \
+    SIMULATION_WORKERS, SCORE_UPLOAD_URL, SESSION_SNAPSHOT_DIR, FBA_BACKEND, FLUX_CACHE_SIZE, FLUX_CACHE_TOLERANCE
+from PlantEd.server import wire
+from PlantEd.server.delta import StateSync
+from PlantEd.server.dynamic_model import BACKENDS
+from PlantEd.server.executor import create_executor, create_game, call_game, discard_game, fork_game, restore_game, \
+    flux_cache_stats
+from PlantEd.server.metrics import Metrics
+from PlantEd.server.model_pool import fill_model_pool
+from PlantEd.server.policy import fast_forward
+from PlantEd.server.sessions import SessionRegistry, SessionLimitReached
+from PlantEd.server.uploads import UploadQueue
 
 
 class Server:
-    def __init__(self):
-        self.game = None
+    def __init__(self, max_sessions=MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT, executor=SIMULATION_EXECUTOR,
+                 workers=SIMULATION_WORKERS, upload_url=SCORE_UPLOAD_URL, snapshot_dir=SESSION_SNAPSHOT_DIR,
+                 backend=FBA_BACKEND, flux_cache_size=FLUX_CACHE_SIZE, flux_cache_tolerance=FLUX_CACHE_TOLERANCE):
+        self.snapshot_dir = snapshot_dir
+        self.sessions = SessionRegistry(max_sessions=max_sessions, idle_timeout=idle_timeout)
+        self.executor = create_executor(executor, workers=workers, backend=backend, flux_cache_size=flux_cache_size,
+                                        flux_cache_tolerance=flux_cache_tolerance)
+        self.uploads = UploadQueue(url=upload_url)
+        self.metrics = Metrics()
+        self.pending = 0  # commands received but not answered yet
+        self.background = set()  # tasks nobody awaits, referenced until they are done
 
-    def load_level(self, command) -> dict:
+    async def load_level(self, command) -> dict:
         print("load level")
-        self.game = Game(
-            player_name=command["player_name"],
-            icon_name=command["icon_name"],
-            level_name=command["level_name"],
-        )
-        return {"level loaded": self.game.level_name}
-
-    def close_level(self, message) -> dict:
+        try:
+            session = self.sessions.open()
+        except SessionLimitReached:
+            # make room by dropping abandoned games before giving up
+            await self.evict_idle_sessions()
+            try:
+                session = self.sessions.open()
+            except SessionLimitReached as e:
+                return {"error": str(e)}
+        async with session.lock:
+            self.executor.pin(session)
+            try:
+                level_name = await self.executor.submit(
+                    session,
+                    create_game,
+                    session.session_id,
+                    command["player_name"],
+                    command["icon_name"],
+                    command["level_name"],
+                    )
+            except Exception:
+                self.executor.release(session)
+                self.sessions.remove(session.session_id)
+                raise
+        # replace the borrowed model after the response, not during the next load_level
+        self.run_in_background(self.executor.submit_background(session, fill_model_pool))
+        # the client asks for an encoding, older clients get json
+        if command.get("encoding") in wire.ENCODINGS:
+            session.encoding = command["encoding"]
+        if command.get("delta"):
+            session.sync = StateSync()
+        return {
+            "level loaded": level_name,
+            "session_id": session.session_id,
+            "encoding": session.encoding,
+            "delta": session.sync is not None,
+            }
+
+    def run_in_background(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+
+    async def fork_level(self, session, message) -> dict:
+        # branch a running game, the fork is a new session in the same worker
+        try:
+            fork = self.sessions.open()
+        except SessionLimitReached:
+            # make room by dropping abandoned games before giving up
+            await self.evict_idle_sessions()
+            try:
+                fork = self.sessions.open()
+            except SessionLimitReached as e:
+                return {"error": str(e)}
+        self.executor.pin(fork, worker=session.worker)
+        try:
+            level_name = await self.executor.submit(
+                fork, fork_game, session.session_id, fork.session_id, message.get("player_name"))
+        except Exception:
+            self.executor.release(fork)
+            self.sessions.remove(fork.session_id)
+            raise
+        fork.encoding = session.encoding
+        if session.sync is not None:
+            fork.sync = StateSync()
+        return {
+            "level loaded": level_name,
+            "session_id": fork.session_id,
+            "encoding": fork.encoding,
+            "delta": fork.sync is not None,
+            }
+
+    async def close_level(self, session, message) -> dict:
         print("close level")
-        response = self.game.force_end_game(message)
-        self.game = None
+        response = await self.executor.submit(session, discard_game, session.session_id, "force_end_game", message)
+        self.executor.release(session)
+        self.sessions.remove(session.session_id)
+        self.uploads.wake()
         return response
 
-
-    def update(self, message) -> dict:
+    async def update(self, session, message) -> dict:
         # Update Plant, Environment, Water grid etc.
-        game_state = self.game.update(message)
+        game_state = await self.executor.submit(session, call_game, session.session_id, "update", message)
         return game_state
 
-    async def respond(self, websocket):
-        async for message in websocket:
-            command = json.loads(message)
-            response = {}
+    async def update_batch(self, session, message) -> dict:
+        # several updates in one request, e.g. for bots and fast-forwarding
+        return await self.executor.submit(
+            session, call_game, session.session_id, "update_batch", message["steps"], message.get("every", 0))
+
+    async def fast_forward(self, message) -> dict:
+        # a whole game in one request, the game is not kept as a session
+        # and runs apart from the workers of the sessions, so they keep being served
+        return await self.executor.submit_detached(
+            fast_forward, message["policy"], message.get("level_name", "spring_high_nitrate"))
+
+    async def stats(self) -> dict:
+        """
+        Metrics of the server and of every session. The game metrics of
+        all running sessions are merged into the global ones. flux_cache
+        holds the stats of the flux cache of each worker.
+        """
+        server = Metrics()
+        games = Metrics()
+        sessions = {}
+        for session in list(self.sessions.sessions.values()):
+            try:
+                game_metrics = await self.executor.submit(session, call_game, session.session_id, "get_metrics")
+            except KeyError:
+                continue  # game is still being created
+            server.merge(session.metrics.to_dict())
+            games.merge(game_metrics)
+            sessions[session.session_id] = {
+                "idle_time": session.idle_time(),
+                "metrics": {**session.metrics.to_dict(), **game_metrics},
+                }
+        server.merge(self.metrics.to_dict())
+        return {
+            "active_sessions": len(self.sessions),
+            "queue_depth": self.pending,
+            "uploads": self.uploads.status(),
+            "flux_cache": await self.executor.call_workers(flux_cache_stats),
+            "global": {**server.to_dict(), **games.to_dict()},
+            "sessions": sessions,
+            }
+
+    async def save_sessions(self):
+        """
+        Write a snapshot of every game to snapshot_dir, so a restarted
+        server can continue them.
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        for session in list(self.sessions.sessions.values()):
+            snapshot = await self.executor.submit(session, call_game, session.session_id, "snapshot")
+            path = os.path.join(self.snapshot_dir, session.session_id)
+            with open(path + ".snapshot", "wb") as file:
+                file.write(snapshot)
+            with open(path + ".json", "w") as file:
+                json.dump({"encoding": session.encoding, "delta": session.sync is not None}, file)
+        print(f"saved {len(self.sessions)} sessions")
+
+    async def restore_sessions(self):
+        """
+        Reopen the sessions saved by save_sessions under their old ids.
+        Delta sessions start over with a keyframe. Snapshots beyond
+        max_sessions stay in snapshot_dir for a server with more room.
+        """
+        if not os.path.isdir(self.snapshot_dir):
+            return
+        for file in sorted(os.listdir(self.snapshot_dir)):
+            if not file.endswith(".snapshot"):
+                continue
+            session_id = file[:-len(".snapshot")]
+            try:
+                session = self.sessions.open(session_id=session_id)
+            except SessionLimitReached as e:
+                print(f"keep snapshot of session {session_id}: {e}")
+                continue
+            path = os.path.join(self.snapshot_dir, session_id)
+            with open(path + ".snapshot", "rb") as f:
+                snapshot = f.read()
+            with open(path + ".json") as f:
+                settings = json.load(f)
+            self.executor.pin(session)
+            await self.executor.submit(session, restore_game, session.session_id, snapshot)
+            session.encoding = settings["encoding"]
+            if settings["delta"]:
+                session.sync = StateSync()
+            os.remove(path + ".snapshot")
+            os.remove(path + ".json")
+        print(f"restored {len(self.sessions)} sessions")
+
+    async def close_sessions(self):
+        """
+        Close the games of all sessions, which writes the rows their logs
+        still buffer. Their scores are not uploaded.
+        """
+        for session in list(self.sessions.sessions.values()):
+            await self.executor.submit(session, discard_game, session.session_id, "close")
+            self.executor.release(session)
+            self.sessions.remove(session.session_id)
+
+    async def evict_idle_sessions(self):
+        for session in self.sessions.evict_idle():
+            print(f"evict idle session {session.session_id}")
+            await self.executor.submit(session, discard_game, session.session_id, "close")
+            self.executor.release(session)
+
+    async def handle(self, command) -> dict:
+        if command["type"] == "load_level":
+            return await self.load_level(command["message"])
+        if command["type"] == "fast_forward":
+            return await self.fast_forward(command["message"])
+        if command["type"] == "upload_status":
+            return self.uploads.status()
+        if command["type"] == "stats":
+            return await self.stats()
+
+        session = self.sessions.get(command.get("session_id"))
+        if session is None:
+            return {"error": f"unknown session {command.get('session_id')}"}
+
+        async with session.lock:
+            session.touch()
             if command["type"] == "simulate":
-                response = self.update(command["message"])
-            elif command["type"] == "load_level":
-                response = self.load_level(command["message"])
+                game_state = await self.update(session, command["message"])
+                if session.sync is not None:
+                    # only send what changed since the state the client holds
+                    return session.sync.encode(game_state, ack=command.get("ack"))
+                return game_state
+            elif command["type"] == "simulate_batch":
+                return await self.update_batch(session, command["message"])
+            elif command["type"] == "fork_level":
+                return await self.fork_level(session, command["message"])
             elif command["type"] == "end_level":
-                response = self.close_level(command["message"])
+                return await self.close_level(session, command["message"])
+        return {}
+
+    async def respond(self, websocket):
+        async for message in websocket:
+            start = time.perf_counter()
+            self.metrics.observe("queue_depth", self.pending)
+            self.pending += 1
+            try:
+                command = json.loads(message)
+                response = await self.handle(command)
+                if "request_id" in command:
+                    # lets clients with several requests in flight match responses
+                    response = {**response, "request_id": command["request_id"]}
+                encode_start = time.perf_counter()
+                payload = self.encode(command, response)
+            finally:
+                self.pending -= 1
+            end = time.perf_counter()
+
+            # sessions keep their own request times, sessionless commands count globally
+            session_id = command.get("session_id") or response.get("session_id")
+            session = self.sessions.get(session_id) if session_id is not None else None
+            metrics = session.metrics if session is not None else self.metrics
+            metrics.observe("request", end - start)
+            metrics.observe("encode", end - encode_start)
+            await websocket.send(payload)
+
+    def encode(self, command, response):
+        if command["type"] in ("simulate", "simulate_batch"):
+            session = self.sessions.get(command.get("session_id"))
+            if session is not None and session.encoding == wire.BINARY:
+                if command["type"] == "simulate_batch":
+                    return wire.encode(response, paths=wire.BATCH_ARRAYS)
+                return wire.encode(response)
+        return json.dumps(response, indent=2, default=wire.json_default)
 
-            await websocket.send(json.dumps(response, indent=2))
+    async def evict_idle_sessions_periodically(self, interval=SESSION_EVICTION_INTERVAL):
+        while True:
+            await asyncio.sleep(interval)
+            await self.evict_idle_sessions()
 
     async def main(self, port):
-        async with websockets.serve(self.respond, "localhost", port):
-            await asyncio.Future()  # run forever
+        self.uploads.start()
+        if self.snapshot_dir is not None:
+            await self.restore_sessions()
+        # SIGINT and SIGTERM end the server normally, so the sessions are saved while the workers still run
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        signals = []
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(signum, stop.set)
+                signals.append(signum)
+            except NotImplementedError:
+                pass  # e.g. on Windows, Ctrl+C still ends the server through KeyboardInterrupt
+        eviction = asyncio.create_task(self.evict_idle_sessions_periodically())
+        try:
+            async with websockets.serve(self.respond, "localhost", port):
+                await stop.wait()  # run until stopped
+        finally:
+            eviction.cancel()
+            for signum in signals:
+                loop.remove_signal_handler(signum)
+            if self.snapshot_dir is not None:
+                await self.save_sessions()
+            # before the workers are stopped with the games and their unwritten log rows
+            await self.close_sessions()
+            self.uploads.stop(timeout=1)
+            self.executor.shutdown()
 
 
-def start(port=8765):
-    server = Server()
+def start(port=8765, max_sessions=MAX_SESSIONS, idle_timeout=SESSION_IDLE_TIMEOUT, executor=SIMULATION_EXECUTOR,
+          workers=SIMULATION_WORKERS, upload_url=SCORE_UPLOAD_URL, snapshot_dir=SESSION_SNAPSHOT_DIR,
+          backend=FBA_BACKEND, flux_cache_size=FLUX_CACHE_SIZE, flux_cache_tolerance=FLUX_CACHE_TOLERANCE):
+    server = Server(max_sessions=max_sessions, idle_timeout=idle_timeout, executor=executor, workers=workers,
+                    upload_url=upload_url, snapshot_dir=snapshot_dir, backend=backend,
+                    flux_cache_size=flux_cache_size, flux_cache_tolerance=flux_cache_tolerance)
     asyncio.run(server.main(port))
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-sessions", type=int, default=MAX_SESSIONS)
+    parser.add_argument("--idle-timeout", type=float, default=SESSION_IDLE_TIMEOUT)
+    parser.add_argument("--executor", choices=["inline", "process"], default=SIMULATION_EXECUTOR)
+    parser.add_argument("--workers", type=int, default=SIMULATION_WORKERS)
+    parser.add_argument("--upload-url", default=SCORE_UPLOAD_URL)
+    parser.add_argument("--snapshot-dir", default=SESSION_SNAPSHOT_DIR)
+    parser.add_argument("--backend", choices=BACKENDS, default=FBA_BACKEND)
+    parser.add_argument("--flux-cache-size", type=int, default=FLUX_CACHE_SIZE)
+    parser.add_argument("--flux-cache-tolerance", type=float, default=FLUX_CACHE_TOLERANCE)
+    args = parser.parse_args()
     print("Starting Server")
-    start()
+    start(port=args.port, max_sessions=args.max_sessions, idle_timeout=args.idle_timeout, executor=args.executor,
+          workers=args.workers, upload_url=args.upload_url, snapshot_dir=args.snapshot_dir, backend=args.backend,
+          flux_cache_size=args.flux_cache_size, flux_cache_tolerance=args.flux_cache_tolerance)
@@ -0,0 +1,100 @@
+import asyncio
+import time
+import uuid
+
+from PlantEd.constants import MAX_SESSIONS, SESSION_IDLE_TIMEOUT
+from PlantEd.server import wire
+from PlantEd.server.delta import StateSync
+from PlantEd.server.metrics import Metrics
+
+
+class SessionLimitReached(Exception):
+    pass
+
+
+class Session:
+    """
+    One running game on the server. The lock serializes requests of the
+    same session, while requests of different sessions can interleave.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.worker = None  # executor worker the game lives in
+        self.encoding = wire.JSON  # encoding of simulate responses
+        self.sync: StateSync | None = None  # delta sync, if the client asked for it
+        self.lock = asyncio.Lock()
+        self.metrics = Metrics()  # request and encode time of this session
+        self.created = time.monotonic()
+        self.last_active = self.created
+
+    def touch(self):
+        self.last_active = time.monotonic()
+
+    def idle_time(self, now: float = None) -> float:
+        if now is None:
+            now = time.monotonic()
+        return now - self.last_active
+
+
+class SessionRegistry:
+    """
+    Keeps all sessions of a server keyed by their session id.
+
+    Args:
+        max_sessions: upper limit of sessions kept at once
+        idle_timeout: seconds without a request after which a session
+            can be evicted
+    """
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.sessions: dict[str, Session] = {}
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __contains__(self, session_id):
+        return session_id in self.sessions
+
+    def open(self, session_id: str = None) -> Session:
+        """
+        Create a new, empty session. Raises SessionLimitReached if the
+        registry is full; call evict_idle first to make room. A session_id
+        is only given for sessions restored from a snapshot.
+        """
+        if len(self.sessions) >= self.max_sessions:
+            raise SessionLimitReached(f"Server is full ({self.max_sessions} sessions)")
+        session = Session(session_id if session_id is not None else uuid.uuid4().hex)
+        self.sessions[session.session_id] = session
+        return session
+
+    def get(self, session_id: str = None) -> Session | None:
+        """
+        Return the session for session_id. Without a session_id the only
+        session is returned, so single player clients keep working.
+        """
+        if session_id is None:
+            if len(self.sessions) == 1:
+                return next(iter(self.sessions.values()))
+            return None
+        return self.sessions.get(session_id)
+
+    def remove(self, session_id: str) -> Session | None:
+        return self.sessions.pop(session_id, None)
+
+    def evict_idle(self, now: float = None) -> list[Session]:
+        """
+        Remove and return all sessions idle for longer than idle_timeout.
+        Sessions currently handling a request are kept.
+        """
+        if now is None:
+            now = time.monotonic()
+        evicted = [
+            session for session in self.sessions.values()
+            if session.idle_time(now) > self.idle_timeout and not session.lock.locked()
+            ]
+        for session in evicted:
+            del self.sessions[session.session_id]
+        return evicted
@@ -0,0 +1,150 @@
+"""
+Score uploads in the background.
+
+Finished games only write an upload job to the spool directory, which is
+cheap and works from any executor worker. The UploadQueue of the server
+picks the jobs up in a thread, posts them to the highscore endpoint and
+retries failed uploads with exponential backoff. Jobs stay in the spool
+until they succeed, so pending uploads survive a restart of the server.
+
+A job is a JSON file <job_id>.json holding the upload arguments plus the
+number of attempts, the time of the next attempt and the last error.
+"""
+import json
+import os
+import threading
+import time
+import uuid
+
+from PlantEd.client.analysis import scoring
+from PlantEd.constants import SCORE_SPOOL_DIR, SCORE_UPLOAD_URL, UPLOAD_RETRY_DELAY, UPLOAD_MAX_RETRY_DELAY, \
+    UPLOAD_MAX_ATTEMPTS
+
+
+def _write_job(path: str, job: dict):
+    # write to a temporary file first, so the queue never reads half a job
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(job, file)
+    os.replace(tmp_path, path)
+
+
+def spool_score(name, score, path_to_logs, icon_name, spool_dir=SCORE_SPOOL_DIR) -> str:
+    """
+    Add a score upload to the spool and return its job id.
+    """
+    os.makedirs(spool_dir, exist_ok=True)
+    job_id = uuid.uuid4().hex
+    job = {
+        "name": name,
+        "score": score,
+        "path_to_logs": path_to_logs,
+        "icon_name": icon_name,
+        "attempts": 0,
+        "next_attempt": 0,
+        "last_error": None,
+        }
+    _write_job(os.path.join(spool_dir, job_id + ".json"), job)
+    return job_id
+
+
+class UploadQueue:
+    """
+    Uploads spooled scores in a background thread.
+
+    Args:
+        spool_dir: directory the jobs are read from
+        url: highscore endpoint, point it to a local server for tests
+        retry_delay: seconds before the first retry, doubled per attempt
+        max_retry_delay: upper limit of the delay between two retries
+        max_attempts: jobs failing this often are renamed to .failed
+    """
+
+    def __init__(self, spool_dir: str = SCORE_SPOOL_DIR, url: str = SCORE_UPLOAD_URL,
+                 retry_delay: float = UPLOAD_RETRY_DELAY, max_retry_delay: float = UPLOAD_MAX_RETRY_DELAY,
+                 max_attempts: int = UPLOAD_MAX_ATTEMPTS):
+        self.spool_dir = spool_dir
+        self.url = url
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.max_attempts = max_attempts
+        self.uploaded = 0
+        self.failed = 0
+        self.last_error = None
+        self.wakeup = threading.Event()
+        self.stopped = threading.Event()
+        self.thread = None
+        os.makedirs(self.spool_dir, exist_ok=True)
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="score-uploads", daemon=True)
+        self.thread.start()
+
+    def stop(self, timeout: float = None):
+        self.stopped.set()
+        self.wakeup.set()
+        if self.thread is not None:
+            self.thread.join(timeout)
+
+    def wake(self):
+        # a new job was spooled, don't wait for the next retry
+        self.wakeup.set()
+
+    def pending_jobs(self) -> list[str]:
+        return sorted(file for file in os.listdir(self.spool_dir) if file.endswith(".json"))
+
+    def status(self) -> dict:
+        return {
+            "pending": len(self.pending_jobs()),
+            "uploaded": self.uploaded,
+            "failed": self.failed,
+            "last_error": self.last_error,
+            }
+
+    def process(self, now: float = None) -> float:
+        """
+        Try all jobs that are due. Returns the seconds until the next job
+        is due, or None if the spool is empty.
+        """
+        if now is None:
+            now = time.time()
+        next_due = None
+        for file in self.pending_jobs():
+            if self.stopped.is_set():
+                break
+            path = os.path.join(self.spool_dir, file)
+            try:
+                with open(path) as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job["next_attempt"] > now:
+                wait = job["next_attempt"] - now
+                next_due = wait if next_due is None else min(next_due, wait)
+                continue
+
+            error = scoring.upload_score(job["name"], job["score"], job["path_to_logs"], job["icon_name"], url=self.url)
+            if error is None:
+                os.remove(path)
+                self.uploaded += 1
+                continue
+
+            self.last_error = error
+            job["attempts"] += 1
+            job["last_error"] = error
+            if job["attempts"] >= self.max_attempts:
+                os.replace(path, path[:-len(".json")] + ".failed")
+                self.failed += 1
+                continue
+            delay = min(self.retry_delay * 2 ** (job["attempts"] - 1), self.max_retry_delay)
+            job["next_attempt"] = now + delay
+            _write_job(path, job)
+            next_due = delay if next_due is None else min(next_due, delay)
+        return next_due
+
+    def run(self):
+        while not self.stopped.is_set():
+            # cleared before processing, a job spooled meanwhile wakes the next wait
+            self.wakeup.clear()
+            next_due = self.process()
+            self.wakeup.wait(next_due)
@@ -5,7 +5,7 @@ import random
 from collections import namedtuple
 import pandas as pd
 
-weather_state = namedtuple("state", ["temperature", "humidity", "precipitation"])
+weather_state = namedtuple("weather_state", ["temperature", "humidity", "precipitation"])
 
 
 class WeatherSimulator:
@@ -115,7 +115,8 @@ class WeatherSimulator:
             end_hour: Last hour for which the weather is to be simulated.
                 If not already done, the weather will also be simulated for all previous hours.
         """
-        random.seed(self.seed)
+        # a generator of its own, so simulating the weather neither depends on nor moves the random module
+        rng = random.Random(self.seed)
 
         for hour in range(self.latest_hour + 1, end_hour + 1, 1):
             curr_temp = self.temp_min + self.curr_temp_bin * self.temp_step
@@ -134,7 +135,7 @@ class WeatherSimulator:
             next_state_probs = {
                 k: v for k, v in next_state_probs.items() if v > 0
             }  # remove zero-probability states
-            next_state = random.choices(
+            next_state = rng.choices(
                 list(next_state_probs.keys()),
                 list(next_state_probs.values()),
             )[0]
@@ -0,0 +1,112 @@
+"""
+Binary wire format for game states sent from the server to the client.
+
+A message consists of a fixed header, the JSON encoded remainder of the
+game state and the raw little-endian float32 buffers of all arrays:
+
+    header      magic (4s), version (B), flags (B), n_arrays (H), meta_length (I)
+    meta        utf-8 JSON, padded to a multiple of 4 bytes. The list of
+                arrays (path, shape) is stored under the key "__arrays__".
+    buffers     one float32 buffer per array, in the order of "__arrays__"
+
+The client decodes the arrays with np.frombuffer, so no copy is made.
+Arrays decoded this way are read-only.
+"""
+import json
+import math
+import struct
+
+import numpy as np
+
+JSON = "json"
+BINARY = "binary"
+ENCODINGS = (JSON, BINARY)
+
+MAGIC = b"PEDW"
+VERSION = 1
+HEADER = struct.Struct("<4sBBHI")
+DTYPE = np.dtype("<f4")
+ARRAYS_KEY = "__arrays__"
+
+# fields of Game.update that are sent as float32 buffers
+GAME_STATE_ARRAYS = (
+    ("environment", "water_grid"),
+    ("environment", "nitrate_grid"),
+    ("plant", "leafs_biomass"),
+    ("plant", "stems_biomass"),
+    ("plant", "roots_biomass"),
+    ("plant", "seeds_biomass"),
+    )
+
+# fields of Game.update_batch, the final state is nested under "state"
+BATCH_ARRAYS = (("observations",),) + tuple(("state",) + path for path in GAME_STATE_ARRAYS)
+
+
+def json_default(obj):
+    """
+    Fallback for json.dumps, so game states containing numpy values can
+    still be sent as JSON.
+    """
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _padding(length: int) -> int:
+    return -length % 4
+
+
+def encode(state: dict, paths=GAME_STATE_ARRAYS) -> bytes:
+    """
+    Encode a game state. The fields given by paths are written as float32
+    buffers, paths missing in state are skipped. state is not modified.
+    """
+    meta = dict(state)
+    descriptors = []
+    buffers = []
+    for path in paths:
+        node = meta
+        for key in path[:-1]:
+            if not isinstance(node.get(key), dict):
+                node = None
+                break
+            # copy along the path to leave the callers dict untouched
+            node[key] = dict(node[key])
+            node = node[key]
+        if node is None or path[-1] not in node:
+            continue
+        array = np.ascontiguousarray(node.pop(path[-1]), dtype=DTYPE)
+        descriptors.append([list(path), list(array.shape)])
+        buffers.append(array.tobytes())
+
+    meta[ARRAYS_KEY] = descriptors
+    meta_bytes = json.dumps(meta, separators=(",", ":"), default=json_default).encode("utf-8")
+    header = HEADER.pack(MAGIC, VERSION, 0, len(descriptors), len(meta_bytes))
+    return b"".join([header, meta_bytes, b"\0" * _padding(len(meta_bytes))] + buffers)
+
+
+def decode(payload: bytes) -> dict:
+    """
+    Decode a message created by encode. Arrays are views into payload.
+    """
+    magic, version, _, n_arrays, meta_length = HEADER.unpack_from(payload, 0)
+    if magic != MAGIC:
+        raise ValueError("Payload is not a PlantEd binary message")
+    if version != VERSION:
+        raise ValueError(f"Unsupported wire format version {version}")
+
+    offset = HEADER.size
+    meta = json.loads(bytes(payload[offset:offset + meta_length]))
+    offset += meta_length + _padding(meta_length)
+
+    for path, shape in meta.pop(ARRAYS_KEY):
+        count = math.prod(shape)
+        array = np.frombuffer(payload, dtype=DTYPE, count=count, offset=offset).reshape(shape)
+        offset += count * DTYPE.itemsize
+        node = meta
+        for key in path[:-1]:
+            node = node[key]
+        node[path[-1]] = array
+    return meta
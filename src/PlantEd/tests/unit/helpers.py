@@ -0,0 +1,71 @@
+"""
+Messages and fixtures shared by the unit tests of the game server.
+"""
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from PlantEd.server.dynamic_model import configure_model, load_model
+
+# a small model with the reactions the game uses, the tests run on it instead of the game's model
+SMALL_MODEL_PATH = Path(__file__).parent / "data/small_model.sbml"
+
+MESSAGE = {
+    "delta_t": 3600,
+    "growth_percentages": {
+        "leaf_percent": 30,
+        "stem_percent": 20,
+        "root_percent": 40,
+        "seed_percent": 0,
+        "starch_percent": 10,
+        "stomata": True,
+        },
+    "shop_actions": {
+        "buy_watering_can": None,
+        "buy_nitrate": None,
+        "buy_leaf": None,
+        "buy_branch": None,
+        "buy_root": None,
+        "buy_seed": None,
+        },
+    }
+
+
+def use_small_model():
+    """
+    Create the games and prepared models of this process from the small
+    model and return it. It is parsed here, so no model cache is written
+    to the working directory. Worker processes started afterwards use it
+    as well.
+    """
+    configure_model(SMALL_MODEL_PATH)
+    return load_model(cache_dir=None)
+
+
+def summary(game):
+    return (
+        game.time,
+        game.green_thumbs,
+        game.plant.leaf_mass,
+        game.plant.stem_mass,
+        game.plant.root_mass,
+        game.plant.starch_pool,
+        game.plant.water_pool,
+        game.environment.water_grid.grid.sum(),
+        game.environment.nitrate_grid.grid.sum(),
+        )
+
+
+class TemporaryDirectoryTestCase(unittest.TestCase):
+    """
+    Runs every test in a temporary working directory, games write their
+    logs relative to it. The directory is left and removed after tearDown.
+    """
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.tmp = tempfile.TemporaryDirectory()
+        os.chdir(self.tmp.name)
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(os.chdir, self.cwd)
@@ -0,0 +1,39 @@
+import unittest
+
+from PlantEd.server.game import Game, TWILIGHT_HOURS
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestAdaptiveStepping(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def run_game(self, adaptive):
+        # the same seed, the first roots are random
+        game = Game("adaptive", "icon", "spring_high_nitrate", adaptive=adaptive, seed=0)
+        for _ in range(2):
+            game.update({**MESSAGE, "delta_t": 24 * 3600})
+        game.close()
+        return game
+
+    def test_fewer_solves_within_tolerance(self):
+        fixed = self.run_game(adaptive=False)
+        adaptive = self.run_game(adaptive=True)
+        self.assertEqual(adaptive.time, fixed.time)
+        self.assertLess(adaptive.metrics.histograms["simulate"].count, fixed.metrics.histograms["simulate"].count)
+        for organ in ("leaf_mass", "stem_mass", "root_mass", "starch_pool"):
+            self.assertAlmostEqual(getattr(adaptive.plant, organ), getattr(fixed.plant, organ),
+                                   delta=0.01 * abs(getattr(fixed.plant, organ)))
+
+    def test_twilight_and_shop_actions_are_single_hours(self):
+        game = Game("adaptive", "icon", "spring_high_nitrate", adaptive=True)
+        game.step_hours = 8
+        self.assertEqual(game.next_step_hours(8, shop_actions=True), 1)
+        game.environment.time = TWILIGHT_HOURS[0] * 3600
+        self.assertEqual(game.next_step_hours(8, shop_actions=False), 1)
+        game.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,38 @@
+import math
+import unittest
+
+from PlantEd.server.game import Game
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestCatchUp(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        # a budget this small runs a single hour per request
+        self.game = Game("catch_up", "icon", "spring_high_nitrate", time_budget=1e-9)
+
+    def tearDown(self):
+        self.game.close()
+
+    def test_lag_is_carried_and_caught_up(self):
+        state = self.game.update({**MESSAGE, "delta_t": 4 * 3600})
+        self.assertEqual(state["lag"], 3 * 3600)
+        self.assertEqual(state["gametime"], 4 * 3600)
+        self.assertEqual(self.game.environment.time, 3600)
+
+        for lag in (2, 1, 0):
+            state = self.game.update({**MESSAGE, "delta_t": 0})
+            self.assertEqual(state["lag"], lag * 3600)
+            # per second of the simulated hour, not of delta_t
+            self.assertTrue(math.isfinite(state["nitrate_available"]))
+        self.assertEqual(self.game.environment.time, self.game.time)
+
+    def test_nothing_to_simulate(self):
+        state = self.game.update({**MESSAGE, "delta_t": 0})
+        self.assertEqual(state["gametime"], 0)
+        self.assertEqual(state["nitrate_available"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,68 @@
+import unittest
+
+import cobra
+
+from PlantEd.server.compress_model import compress, validate, KEPT_REACTIONS
+from PlantEd.server.dynamic_model import BOUND_RANGES
+from PlantEd.tests.unit.helpers import use_small_model
+
+
+def extended_model() -> cobra.Model:
+    """
+    The small test model with photosynthesis split into a linear pathway
+    and a reaction that can never carry flux.
+    """
+    model = use_small_model().copy()
+    photo = model.reactions.get_by_id("Photo_leaf")
+    sug_l = model.metabolites.get_by_id("sug_l")
+    first = cobra.Metabolite("pre1_l", compartment=sug_l.compartment)
+    second = cobra.Metabolite("pre2_l", compartment=sug_l.compartment)
+    dead = cobra.Metabolite("dead_l", compartment=sug_l.compartment)
+    photo.add_metabolites({sug_l: -1, first: 2})
+    step = cobra.Reaction("Photo_step_leaf", lower_bound=-1000, upper_bound=1000)
+    step.add_metabolites({first: -1, second: 1})
+    release = cobra.Reaction("Photo_release_leaf", lower_bound=0, upper_bound=1000)
+    release.add_metabolites({second: -2, sug_l: 1})
+    blocked = cobra.Reaction("Dead_end_leaf", lower_bound=0, upper_bound=1000)
+    blocked.add_metabolites({dead: -1, sug_l: 1})
+    model.add_reactions([step, release, blocked])
+    return model
+
+
+class TestCompressModel(unittest.TestCase):
+    def setUp(self):
+        self.original = extended_model()
+        self.compressed, self.report = compress(self.original)
+
+    def test_removes_and_lumps(self):
+        self.assertIn("Dead_end_leaf", self.report["blocked"])
+        self.assertEqual(len(self.report["lumped"]), 2)
+        self.assertLess(len(self.compressed.reactions), len(self.original.reactions))
+        self.assertNotIn("pre1_l", self.compressed.metabolites)
+        self.assertNotIn("pre2_l", self.compressed.metabolites)
+
+    def test_kept_reactions_are_intact(self):
+        for reaction in KEPT_REACTIONS:
+            original = self.original.reactions.get_by_id(reaction)
+            compressed = self.compressed.reactions.get_by_id(reaction)
+            self.assertEqual(compressed.bounds, original.bounds)
+            self.assertEqual({m.id: c for m, c in compressed.metabolites.items()},
+                             {m.id: c for m, c in original.metabolites.items()})
+        self.assertEqual(len(self.compressed.reactions.query(r"\[root\|stem\]")),
+                         len(self.original.reactions.query(r"\[root\|stem\]")))
+
+    def test_game_bounds_of_all_kept_reactions(self):
+        # blocked reactions are found with the bounds of the game, not those of the SBML file
+        self.assertEqual(set(BOUND_RANGES), set(KEPT_REACTIONS))
+
+    def test_same_fluxes(self):
+        self.assertEqual(validate(self.original, self.compressed), [])
+
+    def test_detects_changed_fluxes(self):
+        self.compressed.reactions.get_by_id("Photo_leaf").add_metabolites(
+            {self.compressed.metabolites.get_by_id("sug_l"): 1})
+        self.assertNotEqual(validate(self.original, self.compressed), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+
+import numpy as np
+
+from PlantEd.server.delta import StateSync, StateMirror
+
+
+def make_state(leaf_mass=0.01, water=500.0, time=0, new_roots=()):
+    return {
+        "running": True,
+        "plant": {"leafs_biomass": [(0, leaf_mass)], "starch_pool": 2.0, "root": {"roots": list(new_roots)}},
+        "environment": {"water_grid": np.full((20, 6), water), "temperature": 10.0},
+        "gametime": time,
+        }
+
+
+class TestDeltaSync(unittest.TestCase):
+    def setUp(self):
+        self.sync = StateSync(keyframe_interval=10)
+        self.mirror = StateMirror()
+
+    def send(self, state, ack=None):
+        return self.mirror.receive(self.sync.encode(state, ack=ack))
+
+    def test_first_response_is_keyframe(self):
+        response = self.sync.encode(make_state())
+        self.assertTrue(response["keyframe"])
+        self.assertEqual(response["revision"], 1)
+
+    def test_delta_only_contains_changes(self):
+        self.send(make_state())
+        state = make_state(leaf_mass=0.02)
+        state["environment"]["water_grid"][3, 2] = 10
+        response = self.sync.encode(state, ack=self.mirror.revision)
+        self.assertFalse(response["keyframe"])
+        self.assertEqual(response["changed"], {"plant": {"leafs_biomass": [(0, 0.02)]}})
+        self.assertEqual(response["cells"], {"environment.water_grid": [[3 * 6 + 2], [10.0]]})
+
+    def test_mirror_rebuilds_full_state(self):
+        self.send(make_state())
+        state = make_state(leaf_mass=0.03, time=3600)
+        state["environment"]["water_grid"][0, 0] = 1
+        rebuilt = self.send(state, ack=self.mirror.revision)
+        self.assertEqual(rebuilt["plant"], state["plant"])
+        self.assertEqual(rebuilt["gametime"], 3600)
+        np.testing.assert_array_equal(rebuilt["environment"]["water_grid"], state["environment"]["water_grid"])
+
+    def test_delta_against_older_revision(self):
+        self.send(make_state())
+        first = self.mirror.revision
+        self.send(make_state(water=400), ack=first)
+        rebuilt = self.send(make_state(water=300), ack=first)
+        self.assertEqual(rebuilt["environment"]["water_grid"][5, 5], 300)
+
+    def test_unknown_base_requests_keyframe(self):
+        self.send(make_state())
+        other = StateMirror()
+        self.assertIsNone(other.receive(self.sync.encode(make_state(), ack=self.mirror.revision)))
+        self.assertIsNone(other.revision)
+
+    def test_new_roots_are_shown_once(self):
+        self.send(make_state())
+        rebuilt = self.send(make_state(new_roots=[["root 1"]]), ack=self.mirror.revision)
+        self.assertEqual(rebuilt["plant"]["root"]["roots"], [["root 1"]])
+        rebuilt = self.send(make_state(), ack=self.mirror.revision)
+        self.assertEqual(rebuilt["plant"]["root"]["roots"], [])
+
+    def test_new_roots_survive_unknown_base(self):
+        self.send(make_state())
+        other = StateMirror()
+        response = self.sync.encode(make_state(new_roots=[["root 1"]]), ack=self.mirror.revision)
+        self.assertIsNone(other.receive(response))
+        # the keyframe only holds the roots that are new since then
+        keyframe = self.sync.encode(make_state(new_roots=[["root 2"]]), ack=other.revision)
+        self.assertTrue(keyframe["keyframe"])
+        rebuilt = other.receive(keyframe)
+        self.assertEqual(rebuilt["plant"]["root"]["roots"], [["root 1"], ["root 2"]])
+
+    def test_keyframe_interval(self):
+        for i in range(10):
+            response = self.sync.encode(make_state(time=i), ack=self.mirror.revision)
+            self.mirror.receive(response)
+        self.assertTrue(response["keyframe"])
+
+
+if __name__ == '__main__':
+    unittest.main()
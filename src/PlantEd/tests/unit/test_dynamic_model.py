@@ -0,0 +1,131 @@
+import math
+import unittest
+from unittest import mock
+
+from PlantEd.server.dynamic_model import DynamicModel, BIOMASS_LEAF, BIOMASS_ROOT, BIOMASS_STEM, \
+    PHOTON, CO2, FLUX_REACTIONS
+from PlantEd.tests.unit.helpers import use_small_model
+
+PERCENTAGES = {
+    "root_percent": 40,
+    "stem_percent": 20,
+    "leaf_percent": 30,
+    "seed_percent": 0,
+    "starch_percent": 10,
+    "stomata": True,
+    }
+
+
+class TestRatioConstraints(unittest.TestCase):
+    def setUp(self):
+        # constraints with explicit masses need neither plant nor environment
+        self.model = DynamicModel(None, None, model=use_small_model())
+        self.n_constraints = len(self.model.model.constraints)
+
+    def coefficients(self, name):
+        constraint = self.model.model.constraints.get(name)
+        return {variable.name: value for variable, value in constraint.get_linear_coefficients(
+            constraint.variables).items()}
+
+    def test_updated_in_place(self):
+        constraint = self.model.model.constraints.get("root_and_leaf")
+        self.model.update_constraints(PERCENTAGES, mass_organ=[2, 1, 3, 0, 1])
+        self.model.update_constraints(PERCENTAGES, mass_organ=[4, 1, 3, 0, 1])
+        self.assertIs(self.model.model.constraints.get("root_and_leaf"), constraint)
+        self.assertEqual(len(self.model.model.constraints), self.n_constraints)
+        root = self.model.model.reactions.get_by_id(BIOMASS_ROOT)
+        leaf = self.model.model.reactions.get_by_id(BIOMASS_LEAF)
+        coefficients = self.coefficients("root_and_leaf")
+        self.assertAlmostEqual(coefficients[root.forward_variable.name], 4 / 40)
+        self.assertAlmostEqual(coefficients[root.reverse_variable.name], -4 / 40)
+        self.assertAlmostEqual(coefficients[leaf.forward_variable.name], -3 / 30)
+
+    def test_zero_percentage_is_switched_off(self):
+        self.model.update_constraints({**PERCENTAGES, "stem_percent": 0}, mass_organ=[2, 1, 3, 0, 1])
+        self.assertEqual(self.model.model.reactions.get_by_id(BIOMASS_STEM).bounds, (0, 0))
+        self.assertFalse(any(self.coefficients("root_and_stem").values()))
+        self.assertFalse(any(self.coefficients("stem_and_leaf").values()))
+        self.assertTrue(any(self.coefficients("root_and_leaf").values()))
+
+    def test_ratio_is_kept(self):
+        model = self.model.model
+        # light and co2 for the plant to grow
+        self.model.set_bounds(PHOTON, (0, 100))
+        self.model.set_bounds(CO2, (-1000, 1000))
+        self.model.update_constraints(PERCENTAGES, mass_organ=[1, 1, 1, 0, 1])
+        model.slim_optimize()
+        root = model.reactions.get_by_id(BIOMASS_ROOT).flux
+        leaf = model.reactions.get_by_id(BIOMASS_LEAF).flux
+        stem = model.reactions.get_by_id(BIOMASS_STEM).flux
+        self.assertGreater(root, 0)
+        self.assertAlmostEqual(leaf / root, 30 / 40)
+        self.assertAlmostEqual(stem / root, 20 / 40)
+
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.model = DynamicModel(None, None, model=use_small_model())
+        self.model.set_bounds(PHOTON, (0, 100))
+        self.model.set_bounds(CO2, (-1000, 1000))
+        self.model.update_constraints(PERCENTAGES, mass_organ=[1, 1, 1, 0, 1])
+
+    def iterations(self):
+        return self.model.metrics.histogram("solver_iterations")
+
+    def test_resolve_from_optimal_basis(self):
+        self.model.optimize()
+        self.model.optimize()
+        self.assertEqual(self.iterations().count, 2)
+        self.assertGreater(self.iterations().max, 0)
+        self.assertEqual(self.iterations().min, 0)
+
+    def test_cold_start(self):
+        self.model.warm_start = False
+        first = self.model.optimize()
+        self.assertEqual(self.model.optimize(), first)
+        self.assertEqual(self.iterations().min, self.iterations().max)
+
+    def test_fallback(self):
+        solve = self.model.model.slim_optimize
+        with mock.patch.object(self.model.model, "slim_optimize", side_effect=[math.nan, solve()]):
+            self.assertFalse(math.isnan(self.model.optimize()))
+        self.assertEqual(self.model.metrics.histogram("warm_start_fallback").count, 1)
+
+
+class TestModelIndex(unittest.TestCase):
+    def setUp(self):
+        self.model = DynamicModel(None, None, model=use_small_model())
+        self.model.set_bounds(PHOTON, (0, 100))
+        self.model.set_bounds(CO2, (-1000, 1000))
+        self.model.update_constraints(PERCENTAGES, mass_organ=[1, 1, 1, 0, 1])
+
+    def test_fluxes_match_reactions(self):
+        self.model.optimize()
+        fluxes = self.model.index.fluxes()
+        self.assertEqual(list(fluxes), list(FLUX_REACTIONS))
+        for reaction, flux in fluxes.items():
+            self.assertEqual(flux, self.model.model.reactions.get_by_id(reaction).flux)
+
+    def test_bounds_are_cached(self):
+        reaction = self.model.model.reactions.get_by_id(PHOTON)
+        self.assertEqual(self.model.get_bounds(PHOTON), reaction.bounds)
+        with mock.patch.object(type(reaction), "bounds", new_callable=mock.PropertyMock) as bounds:
+            self.model.set_bounds(PHOTON, (0, 100))
+            self.model.get_bounds(PHOTON)
+            bounds.assert_not_called()
+
+    def test_shared_by_models(self):
+        other = DynamicModel(None, None, model=self.model.model, copy_model=False, prepared=True)
+        self.assertIs(other.index, self.model.index)
+        other.set_bounds(PHOTON, (0, 50))
+        self.assertEqual(self.model.get_bounds(PHOTON), (0, 50))
+
+    def test_reset_reads_bounds(self):
+        self.model.model.reactions.get_by_id(PHOTON).bounds = (0, 500)
+        self.model.reset()
+        self.assertEqual(self.model.model.reactions.get_by_id(PHOTON).bounds, (0, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
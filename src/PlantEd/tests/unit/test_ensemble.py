@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+
+from PlantEd.server.ensemble import Ensemble
+from PlantEd.server.game import OBSERVATION_FIELDS
+from PlantEd.tests.unit.helpers import TemporaryDirectoryTestCase, use_small_model
+
+
+class TestEnsemble(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.ensemble = self.create(seed=0)
+
+    def create(self, seed, workers=0):
+        return Ensemble("spring_high_nitrate", [
+            {"growth_percentages": {"0": {"leaf_percent": 70, "root_percent": 10}}},
+            {"growth_percentages": {"0": {"leaf_percent": 10, "root_percent": 70}}},
+            {"stomata": False},
+            ], workers=workers, seed=seed)
+
+    def tearDown(self):
+        self.ensemble.close()
+
+    def test_lockstep(self):
+        # into the morning, the plants don't grow at night
+        self.assertEqual(self.ensemble.advance(10), 10)
+        self.assertEqual(self.ensemble.advance(2), 2)
+        observations = self.ensemble.observations()
+        self.assertEqual(set(observations), set(OBSERVATION_FIELDS))
+        self.assertEqual(observations["leaf_biomass"].shape, (12, 3))
+        # same weather for all plants, different allocation
+        np.testing.assert_array_equal(observations["time"][-1], [12 * 3600] * 3)
+        np.testing.assert_array_equal(observations["temperature"][:, 0], observations["temperature"][:, 2])
+        self.assertNotEqual(observations["leaf_biomass"][-1, 0], observations["leaf_biomass"][-1, 1])
+
+    def test_games_share_weather_and_model(self):
+        from PlantEd.server import ensemble
+        games = ensemble._shard["games"]
+        self.assertIs(games[0].environment.weather, games[2].environment.weather)
+        self.assertIs(games[0].model.model, games[1].model.model)
+        self.assertIsNone(games[1].path_to_logs)
+
+    def test_same_seed_same_run(self):
+        from PlantEd.server import ensemble
+        self.ensemble.close()
+        self.ensemble = self.create(seed=3)
+        self.assertEqual([game.seed for game in ensemble._shard["games"]], [3, 4, 5])
+        self.ensemble.advance(14)
+        runs = [self.ensemble.observations()]
+        # the same plants split over two worker processes
+        self.ensemble.close()
+        self.ensemble = self.create(seed=3, workers=2)
+        self.ensemble.advance(14)
+        runs.append(self.ensemble.observations())
+        for field in runs[0]:
+            np.testing.assert_array_equal(runs[0][field], runs[1][field])
+
+    def test_close_releases_games(self):
+        from PlantEd.server import ensemble
+        games = ensemble._shard["games"]
+        self.ensemble.close()
+        self.assertEqual(ensemble._shard, {})
+        # the model the shard borrowed is back in the pool
+        self.assertFalse(games[0].model_borrowed)
+
+    def test_save_table(self):
+        self.ensemble.advance(2)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "ensemble.npz")
+            self.ensemble.save(path)
+            table = np.load(path)
+            self.assertEqual(table["plant"].tolist(), [0, 1, 2, 0, 1, 2])
+            self.assertEqual(table["hour"].tolist(), [0, 0, 0, 1, 1, 1])
+            self.assertEqual(len(table["leaf_biomass"]), 6)
+
+
+if __name__ == '__main__':
+    unittest.main()
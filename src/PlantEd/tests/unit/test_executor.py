@@ -0,0 +1,52 @@
+import asyncio
+import os
+import time
+import unittest
+
+from PlantEd.server.executor import InlineExecutor, ProcessPoolSimulationExecutor, create_game, call_game, discard_game
+from PlantEd.server.sessions import Session
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestProcessPoolSimulationExecutor(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        # the worker simulates the model of this process
+        use_small_model()
+        self.executor = ProcessPoolSimulationExecutor(workers=1)
+        self.addCleanup(self.executor.shutdown)
+
+    def test_pinned_session_responsive_during_detached_job(self):
+        session = Session("a")
+        self.executor.pin(session)
+
+        async def run():
+            await self.executor.submit(session, create_game, session.session_id, "", "", "spring_high_nitrate")
+            # stands in for a fast-forwarded game, started before the update of the session
+            detached = asyncio.ensure_future(self.executor.submit_detached(time.sleep, 10))
+            start = time.perf_counter()
+            game_state = await self.executor.submit(session, call_game, session.session_id, "update", MESSAGE)
+            self.assertLess(time.perf_counter() - start, 10)
+            self.assertFalse(detached.done())
+            detached.cancel()
+            await self.executor.submit(session, discard_game, session.session_id, "close")
+            return game_state
+
+        self.assertIn("plant", asyncio.run(run()))
+        # the detached pool has no sessions pinned to it
+        self.assertEqual(self.executor.n_sessions, [1])
+
+
+class TestInlineExecutor(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def test_detached_job_in_own_process(self):
+        # not in a thread, games of the event loop and the detached job would share the solver
+        pid = asyncio.run(InlineExecutor().submit_detached(os.getpid))
+        self.assertNotEqual(pid, os.getpid())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,89 @@
+import asyncio
+import unittest
+
+from PlantEd.server.flux_cache import FluxCache, configure_flux_cache, flux_cache
+from PlantEd.server.game import Game
+from PlantEd.server.server import Server
+from PlantEd.tests.unit.helpers import MESSAGE, summary, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestFluxCache(unittest.TestCase):
+    def test_exact(self):
+        cache = FluxCache(size=10, tolerance=0)
+        key = cache.key((1.0, 2.0), (30, 20), (0.1, 0.2))
+        self.assertIsNone(cache.get(key))
+        cache.put(key, {"flux": 1})
+        self.assertEqual(cache.get(cache.key((1.0, 2.0), (30, 20), (0.1, 0.2))), {"flux": 1})
+        self.assertIsNone(cache.get(cache.key((1.0, 2.0000001), (30, 20), (0.1, 0.2))))
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.stats()["misses"], 2)
+
+    def test_tolerance_and_mass_ratios(self):
+        cache = FluxCache(size=10, tolerance=0.01)
+        cache.put(cache.key((100.0, 0.0), (30, 20), (0.1, 0.2)), {"flux": 1})
+        # same mass ratios, bound within the tolerance
+        self.assertIsNotNone(cache.get(cache.key((100.1, 0.0), (30, 20), (0.2, 0.4))))
+        self.assertIsNone(cache.get(cache.key((110.0, 0.0), (30, 20), (0.1, 0.2))))
+        self.assertIsNone(cache.get(cache.key((100.0, 0.0), (40, 20), (0.1, 0.2))))
+
+    def test_zero_and_one_differ(self):
+        cache = FluxCache(size=10, tolerance=0.01)
+        keys = {cache.key((value,), (30, 20), (0.1, 0.2)) for value in (0, 1, -1, 0.0, -0.0)}
+        self.assertEqual(len(keys), 3)
+        cache.put(cache.key((0,), (30, 20), (0.1, 0.2)), {"flux": 0})
+        self.assertIsNone(cache.get(cache.key((1,), (30, 20), (0.1, 0.2))))
+
+    def test_lru(self):
+        cache = FluxCache(size=2, tolerance=0)
+        for i in range(3):
+            cache.put(cache.key((i,), (), (1,)), {"flux": i})
+        self.assertIsNone(cache.get(cache.key((0,), (), (1,))))
+        self.assertEqual(cache.stats()["size"], 2)
+
+
+class TestServerFluxCache(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        # back to the cache of constants.py for the other tests
+        self.addCleanup(configure_flux_cache)
+
+    def test_configured_and_reported(self):
+        server = Server(executor="inline", flux_cache_size=5, flux_cache_tolerance=0.1)
+        self.assertEqual((flux_cache.size, flux_cache.tolerance), (5, 0.1))
+        flux_cache.put(flux_cache.key((1.0,), (), (1,)), {"flux": 1})
+        stats = asyncio.run(server.stats())
+        self.assertEqual(stats["flux_cache"], [flux_cache.stats()])
+        self.assertEqual(stats["flux_cache"][0]["size"], 1)
+
+
+class TestCachedGames(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.addCleanup(configure_flux_cache)
+
+    def play(self):
+        game = Game("cache", "", log=False, seed=3)
+        for _ in range(12):
+            game.update(MESSAGE)
+        # closed games give their model back to the pool, which resets it
+        self.addCleanup(game.close)
+        return game
+
+    def test_same_state_with_and_without_cache(self):
+        configure_flux_cache(size=0)
+        uncached = self.play()
+        configure_flux_cache(size=100, tolerance=0)
+        self.play()
+        # the same inputs again, every solve is answered by the cache
+        cached = self.play()
+        self.assertEqual(cached.metrics.histograms["flux_cache_hit"].min, 1)
+        self.assertEqual(summary(cached), summary(uncached))
+        expected, actual = uncached.model.get_state(), cached.model.get_state()
+        # the basis is that of the last solve, which the cached game skipped
+        for field in expected.keys() - {"basis"}:
+            self.assertEqual(actual[field], expected[field], field)
+
+
+if __name__ == '__main__':
+    unittest.main()
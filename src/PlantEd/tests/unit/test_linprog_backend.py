@@ -0,0 +1,89 @@
+import copy
+import itertools
+import math
+import unittest
+
+from cobra.exceptions import OptimizationError
+
+from PlantEd.server.compress_model import solve, VALIDATION_BOUNDS, VALIDATION_PERCENTAGES, VALIDATION_MASSES
+from PlantEd.server.dynamic_model import DynamicModel, configure_backend, PHOTON, NITRATE, \
+    BIOMASS_ROOT, BIOMASS_LEAF
+from PlantEd.server.game import Game
+from PlantEd.server.linprog_backend import LinprogProblem
+from PlantEd.tests.unit.helpers import MESSAGE, use_small_model
+
+
+class TestLinprogBackend(unittest.TestCase):
+    def setUp(self):
+        model = use_small_model()
+        self.cobra = DynamicModel(None, None, model=model, backend="cobra")
+        self.linprog = DynamicModel(None, None, model=model, backend="linprog")
+        self.cobra.warm_start = False
+
+    def test_same_optimum(self):
+        for values in itertools.product(*VALIDATION_BOUNDS.values()):
+            bounds = dict(zip(VALIDATION_BOUNDS, values))
+            for percentages, masses in itertools.product(VALIDATION_PERCENTAGES, VALIDATION_MASSES):
+                expected = solve(self.cobra, bounds, percentages, masses)
+                actual = solve(self.linprog, bounds, percentages, masses)
+                # several flux distributions can reach it, the growth is the same
+                for name in ("objective", BIOMASS_ROOT, BIOMASS_LEAF):
+                    self.assertTrue(math.isclose(expected[name], actual[name], rel_tol=1e-6, abs_tol=1e-9))
+
+    def test_cobra_model_is_untouched(self):
+        reaction = self.linprog.model.reactions.get_by_id(PHOTON)
+        bounds = reaction.bounds
+        self.linprog.set_bounds(PHOTON, (0, 123))
+        self.assertEqual(reaction.bounds, bounds)
+        self.assertEqual(self.linprog.get_bounds(PHOTON), (0, 123))
+        self.assertEqual(self.linprog.index.problem.get_bounds(PHOTON), (0, 123))
+
+    def test_coefficients_change_in_place(self):
+        problem = self.linprog.index.problem
+        solve(self.linprog, dict(zip(VALIDATION_BOUNDS, (b[-1] for b in VALIDATION_BOUNDS.values()))),
+              VALIDATION_PERCENTAGES[0], VALIDATION_MASSES[0])
+        matrix = problem.matrix
+        solve(self.linprog, {}, VALIDATION_PERCENTAGES[1], VALIDATION_MASSES[1])
+        self.assertIs(problem.matrix, matrix)
+
+    def test_infeasible(self):
+        # the roots have to grow, but no nitrate is taken up
+        self.linprog.set_bounds(NITRATE, (0, 0))
+        self.linprog.set_bounds(BIOMASS_ROOT, (1, 1000))
+        self.assertTrue(math.isnan(self.linprog.optimize()))
+        with self.assertRaises(OptimizationError):
+            self.linprog.index.fluxes()
+
+    def test_ranged_constraint(self):
+        model = use_small_model().copy()
+        photon = model.reactions.get_by_id(PHOTON)
+        model.add_cons_vars(model.problem.Constraint(photon.flux_expression, lb=0, ub=5, name="photon_limit"))
+        problem = LinprogProblem(model)
+        self.assertEqual(problem.get_bounds("slack_photon_limit"), (0, 5))
+
+
+class TestLinprogGame(unittest.TestCase):
+    def setUp(self):
+        use_small_model()
+        configure_backend("linprog")
+
+    def tearDown(self):
+        configure_backend()
+
+    def test_game_grows(self):
+        game = Game(player_name="linprog", icon_name="", time_budget=None, log=False)
+        self.assertIsNotNone(game.model.index.problem)
+        mass = game.plant.root_mass
+        # into the first day
+        for _ in range(12):
+            game.update(copy.deepcopy(MESSAGE))
+        self.assertGreater(game.plant.root_mass, mass)
+        game.close()
+
+    def test_unknown_backend(self):
+        with self.assertRaises(ValueError):
+            configure_backend("gurobi")
+
+
+if __name__ == '__main__':
+    unittest.main()
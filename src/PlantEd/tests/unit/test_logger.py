@@ -0,0 +1,65 @@
+import os
+import tempfile
+import unittest
+
+import numpy as np
+import pandas
+
+from PlantEd.client.analysis.logger import Log, COLUMN_NAMES, read_columns
+
+
+def row(i):
+    values = {name: float(i) for name in COLUMN_NAMES}
+    values.update(n_leaves=i, n_stems=1, n_roots=2, n_seeds=0, green_thumbs=25 - i, open_spots=3,
+                  stomata=i % 2 == 0, action=[("buy_leaf", i)] if i % 3 == 0 else [])
+    return values
+
+
+class TestLog(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def read_csv(self):
+        return pandas.read_csv(os.path.join(self.path, "model_logs.csv"))
+
+    def test_rows_are_written_in_batches(self):
+        log = Log(self.path, buffer_rows=4, binary=False)
+        for i in range(6):
+            log.append_model_row(**row(i))
+        self.assertEqual(len(self.read_csv()), 4)
+        log.close_model_file()
+        df = self.read_csv()
+        self.assertEqual(list(df.columns), list(COLUMN_NAMES))
+        # analysis scripts read the original columns by position, new ones come last
+        self.assertEqual(list(df.columns[-3:]), ["open_spots", "action", "stomata"])
+        self.assertEqual(df["n_leaves"].tolist(), list(range(6)))
+        self.assertEqual(df["stomata"].tolist(), [True, False] * 3)
+        self.assertEqual(df["action"][3], "[('buy_leaf', 3)]")
+
+    def test_append_continues(self):
+        log = Log(self.path, binary=False)
+        log.append_model_row(**row(0))
+        log.close_model_file()
+        log = Log(self.path, append=True, binary=False)
+        log.append_model_row(**row(1))
+        log.close_model_file()
+        self.assertEqual(self.read_csv()["time"].tolist(), [0.0, 1.0])
+
+    def test_binary_columns(self):
+        log = Log(self.path, buffer_rows=3, binary=True)
+        for i in range(5):
+            log.append_model_row(**row(i))
+        log.close_model_file()
+        columns = read_columns(self.path)
+        self.assertIsInstance(columns["leaf_biomass"], np.memmap)
+        np.testing.assert_array_equal(columns["leaf_biomass"], self.read_csv()["leaf_biomass"])
+        np.testing.assert_array_equal(columns["green_thumbs"], [25, 24, 23, 22, 21])
+        self.assertEqual(columns["action"], self.read_csv()["action"].fillna("").tolist())
+
+
+if __name__ == '__main__':
+    unittest.main()
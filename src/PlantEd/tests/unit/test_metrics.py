@@ -0,0 +1,37 @@
+import unittest
+
+from PlantEd.server.metrics import Histogram, Metrics, COUNT_BUCKETS
+
+
+class TestMetrics(unittest.TestCase):
+    def test_histogram(self):
+        histogram = Histogram(bounds=(1, 2, 4))
+        for value in (0.5, 1.5, 1.5, 3, 10):
+            histogram.observe(value)
+        self.assertEqual(histogram.counts, [1, 2, 1, 1])
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.min, 0.5)
+        self.assertEqual(histogram.max, 10)
+        self.assertEqual(histogram.quantile(0.5), 2)
+        self.assertEqual(histogram.quantile(1), 10)
+        self.assertIsNone(Histogram().quantile(0.5))
+
+    def test_merge(self):
+        first = Metrics()
+        second = Metrics()
+        first.observe("solver", 0.01)
+        second.observe("solver", 0.02)
+        second.observe("hour_steps", 3)
+        first.merge(second.to_dict())
+        data = first.to_dict()
+        self.assertEqual(data["solver"]["count"], 2)
+        self.assertAlmostEqual(data["solver"]["sum"], 0.03)
+        self.assertEqual(data["hour_steps"]["bounds"], list(COUNT_BUCKETS))
+
+    def test_merge_requires_same_buckets(self):
+        with self.assertRaises(ValueError):
+            Histogram(bounds=(1, 2)).merge(Histogram(bounds=(1, 3)))
+
+
+if __name__ == '__main__':
+    unittest.main()
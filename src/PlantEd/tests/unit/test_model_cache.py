@@ -0,0 +1,46 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from PlantEd.server import dynamic_model
+from PlantEd.server.dynamic_model import load_model
+from PlantEd.tests.unit.helpers import SMALL_MODEL_PATH
+
+
+class TestModelCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.sbml = os.path.join(self.tmp.name, "model.sbml")
+        shutil.copyfile(SMALL_MODEL_PATH, self.sbml)
+        self.cache_dir = os.path.join(self.tmp.name, "cache")
+
+    def tearDown(self):
+        dynamic_model._models.pop(self.sbml, None)
+        self.tmp.cleanup()
+
+    def test_loaded_once_per_process(self):
+        self.assertIs(load_model(self.sbml, self.cache_dir), load_model(self.sbml, self.cache_dir))
+
+    def test_later_processes_skip_parsing(self):
+        parsed = load_model(self.sbml, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 1)
+        # as if in a new process
+        dynamic_model._models.pop(self.sbml)
+        with mock.patch("cobra.io.read_sbml_model", side_effect=AssertionError("parsed again")):
+            cached = load_model(self.sbml, self.cache_dir)
+        self.assertEqual([r.id for r in cached.reactions], [r.id for r in parsed.reactions])
+        self.assertAlmostEqual(cached.slim_optimize(), parsed.slim_optimize())
+
+    def test_changed_file_is_parsed_again(self):
+        load_model(self.sbml, self.cache_dir)
+        dynamic_model._models.pop(self.sbml)
+        with open(self.sbml, "a") as file:
+            file.write("\n")
+        load_model(self.sbml, self.cache_dir)
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,80 @@
+import asyncio
+import threading
+import unittest
+
+from PlantEd.server.dynamic_model import BIOMASS_ROOT, BIOMASS_LEAF, PHOTON
+from PlantEd.server.executor import InlineExecutor
+from PlantEd.server.game import Game
+from PlantEd.server.model_pool import ModelPool, model_pool
+from PlantEd.tests.unit.helpers import MESSAGE, summary, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestModelPool(unittest.TestCase):
+    def setUp(self):
+        use_small_model()
+
+    def test_fill_and_borrow(self):
+        pool = ModelPool(size=2)
+        pool.fill()
+        self.assertEqual(pool.stats()["size"], 2)
+        model = pool.borrow()
+        self.assertEqual(model.objective.name, "multi_objective")
+        self.assertEqual(model.reactions.get_by_id(BIOMASS_ROOT).bounds, (0, 1000))
+        self.assertEqual(model.reactions.get_by_id(BIOMASS_LEAF).bounds, (0, 0))
+        self.assertEqual(pool.stats()["size"], 1)
+
+    def test_give_back_resets(self):
+        pool = ModelPool(size=1)
+        model = pool.borrow()
+        model.reactions.get_by_id(PHOTON).bounds = (0, 500)
+        model.reactions.get_by_id(BIOMASS_LEAF).bounds = (0, 1000)
+        pool.give_back(model)
+        self.assertIs(pool.borrow(), model)
+        self.assertEqual(model.reactions.get_by_id(PHOTON).bounds, (0, 0))
+        self.assertEqual(model.reactions.get_by_id(BIOMASS_LEAF).bounds, (0, 0))
+
+    def test_full_pool_drops_models(self):
+        pool = ModelPool(size=0)
+        pool.give_back(pool.borrow())
+        self.assertEqual(pool.stats()["size"], 0)
+
+    def test_concurrent_fills(self):
+        pool = ModelPool(size=2)
+        threads = [threading.Thread(target=pool.fill) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(pool.stats(), {"size": 2, "borrowed": 0, "prepared": 2})
+
+    def test_inline_refill_leaves_event_loop(self):
+        # the refill after load_level must not block other connections
+        thread = asyncio.run(InlineExecutor().submit_background(None, threading.get_ident))
+        self.assertNotEqual(thread, threading.get_ident())
+
+
+class TestGamesReuseModels(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def play(self):
+        game = Game("pool", "", seed=3)
+        for _ in range(12):
+            game.update(MESSAGE)
+        return game
+
+    def test_reused_model_gives_same_game(self):
+        first = self.play()
+        first.close()
+        self.assertIn(first.model.model, model_pool.models)
+        second = self.play()
+        self.assertIs(second.model.model, first.model.model)
+        self.assertEqual(summary(second), summary(first))
+        second.close()
+        second.close()
+        self.assertEqual(model_pool.models.count(second.model.model), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+from unittest import mock
+
+from PlantEd.server import helpers
+from PlantEd.server.dynamic_model import model_index
+from PlantEd.tests.unit.helpers import use_small_model
+
+
+def coefficient(model, reaction_id, metabolite_id):
+    reaction = model.reactions.get_by_id(reaction_id)
+    constraint = model.constraints[metabolite_id]
+    return constraint.get_linear_coefficients([reaction.forward_variable])[reaction.forward_variable]
+
+
+class TestNormalize(unittest.TestCase):
+    def setUp(self):
+        self.model = use_small_model().copy()
+        self.masses = dict(root=0.5, stem=0.25, leaf=2.0, seed=0.1)
+
+    def test_same_as_cobra_stoichiometry(self):
+        helpers.normalize(self.model, **self.masses)
+        reference = use_small_model().copy()
+        for query, (left, right) in (
+                (r"\[root\|stem\]", ("root", "stem")),
+                (r"\[stem\|leaf\]", ("stem", "leaf")),
+                (r"\[leaf\|seed\]", ("leaf", "seed"))):
+            for reaction in reference.reactions.query(query):
+                helpers.update_stoichiometry(reaction, self.masses[right], self.masses[left])
+        for reaction in reference.reactions.query(r"_tx_\["):
+            for metabolite in reaction.metabolites:
+                self.assertEqual(coefficient(self.model, reaction.id, metabolite.id),
+                                 coefficient(reference, reaction.id, metabolite.id))
+
+    def test_substrate_and_product(self):
+        helpers.normalize(self.model, **self.masses)
+        self.assertEqual(coefficient(self.model, "h2o_tx_[root|stem]", "h2o_r"), -0.25)
+        self.assertEqual(coefficient(self.model, "h2o_tx_[root|stem]", "h2o_s"), 0.5)
+
+    def test_unchanged_masses_are_skipped(self):
+        helpers.normalize(self.model, **self.masses)
+        constraint_type = type(self.model.constraints[0])
+        with mock.patch.object(constraint_type, "set_linear_coefficients", autospec=True) as set_coefficients:
+            helpers.normalize(self.model, **self.masses)
+            self.assertEqual(set_coefficients.call_count, 0)
+            # only the pair leaf|seed changes
+            helpers.normalize(self.model, **{**self.masses, "seed": 0.2})
+        changed = {call.args[0].name for call in set_coefficients.call_args_list}
+        leaf_seed = {metabolite.id for reaction in self.model.reactions.query(r"\[leaf\|seed\]")
+                     for metabolite in reaction.metabolites}
+        self.assertTrue(changed)
+        self.assertLessEqual(changed, leaf_seed)
+        self.assertNotIn("h2o_r", changed)
+
+    def test_reactions_keep_sbml_stoichiometry(self):
+        reaction = self.model.reactions.get_by_id("h2o_tx_[root|stem]")
+        stoichiometry = {metabolite.id: value for metabolite, value in reaction.metabolites.items()}
+        self.assertIsNone(helpers.normalized_masses(self.model))
+        helpers.normalize(self.model, **self.masses)
+        self.assertEqual({metabolite.id: value for metabolite, value in reaction.metabolites.items()}, stoichiometry)
+        self.assertEqual(helpers.normalized_masses(self.model), (0.5, 0.25, 2.0, 0.1))
+        # a copy has the normalized solver, but has to be normalized again before it counts as such
+        self.assertIsNone(helpers.normalized_masses(self.model.copy()))
+
+    def test_linprog_export_is_normalized_again(self):
+        helpers.normalize(self.model, **self.masses)
+        problem = model_index(self.model, "linprog").problem
+        row, column = problem.rows["h2o_s"], problem.columns["h2o_tx_[root|stem]"]
+        self.assertEqual(problem.entries[(row, column)], 0.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+import os
+import unittest
+
+from PlantEd.server.policy import Policy, SHOP_ACTIONS, fast_forward
+from PlantEd.tests.unit.helpers import TemporaryDirectoryTestCase, use_small_model
+
+
+class TestPolicy(unittest.TestCase):
+    def setUp(self):
+        self.policy = Policy({
+            "growth_percentages": {"0": {"leaf_percent": 50}, "240": {"leaf_percent": 10, "root_percent": 70}},
+            "stomata": [6, 20],
+            "shop_actions": {"24": {"buy_leaf": 1}},
+            })
+
+    def test_schedule(self):
+        self.assertEqual(self.policy.growth_percentages(0)["leaf_percent"], 50)
+        self.assertEqual(self.policy.growth_percentages(239)["leaf_percent"], 50)
+        self.assertEqual(self.policy.growth_percentages(240)["leaf_percent"], 10)
+        self.assertEqual(self.policy.growth_percentages(500)["root_percent"], 70)
+
+    def test_stomata(self):
+        self.assertFalse(self.policy.growth_percentages(5)["stomata"])
+        self.assertTrue(self.policy.growth_percentages(24 + 6)["stomata"])
+        self.assertFalse(self.policy.growth_percentages(24 + 20)["stomata"])
+
+    def test_shop_actions(self):
+        message = self.policy.message(24)
+        self.assertEqual(set(message["shop_actions"]), set(SHOP_ACTIONS))
+        self.assertEqual(message["shop_actions"]["buy_leaf"], 1)
+        self.assertIsNone(self.policy.message(25)["shop_actions"]["buy_leaf"])
+        self.assertEqual(message["delta_t"], 3600)
+
+
+class TestFastForward(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def test_whole_game_in_memory(self):
+        result = fast_forward({"stomata": [6, 20]})
+        self.assertGreater(result["hours"], 0)
+        self.assertEqual(len(result["log"]["seed_biomass"]), result["hours"])
+        self.assertEqual(result["log"]["seed_biomass"][-1], result["score"])
+        self.assertEqual(os.listdir(), [])
+        # no time budget and a fixed seed, the same policy gets the same game
+        self.assertEqual(fast_forward({"stomata": [6, 20]}), result)
+
+
+if __name__ == '__main__':
+    unittest.main()
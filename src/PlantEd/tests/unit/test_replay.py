@@ -0,0 +1,91 @@
+import copy
+import random
+import unittest
+
+import pandas
+
+from PlantEd.server.game import Game
+from PlantEd.server.replay import replay, read_game, messages, ReplayMismatch, ReplayUnsupported
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestReplay(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.game = Game(player_name="replay", icon_name="", green_thumbs=100)
+        self.sent = []
+        for hour in range(14):
+            message = copy.deepcopy(MESSAGE)
+            # uneven steps, stomata and shop actions that use the random module
+            message["delta_t"] = 1800 if hour % 3 else 5400
+            message["growth_percentages"]["stomata"] = hour % 2 == 0
+            if hour == 2:
+                message["shop_actions"]["buy_root"] = {"directions": [[40, 800]]}
+            if hour == 5:
+                message["shop_actions"]["buy_leaf"] = 1
+            self.game.update(message)
+            self.sent.append(message)
+        self.game.close()
+
+    def test_messages(self):
+        info, log = read_game(self.game.path_to_logs)
+        self.assertEqual(info["seed"], self.game.seed)
+        self.assertEqual(messages(info, log), self.sent)
+
+    def test_replay_matches(self):
+        result = replay(self.game.path_to_logs)
+        self.assertEqual(result["steps"], 14)
+        self.assertIn("solver", result["metrics"])
+
+    def test_mismatch(self):
+        path = self.game.path_to_logs + "/model_logs.csv"
+        log = pandas.read_csv(path)
+        log.loc[10, "leaf_biomass"] *= 1.01
+        log.to_csv(path, index=False)
+        with self.assertRaises(ReplayMismatch):
+            replay(self.game.path_to_logs)
+
+    def test_time_budget_is_refused(self):
+        game = Game(player_name="budget", icon_name="", time_budget=1)
+        game.update(copy.deepcopy(MESSAGE))
+        game.close()
+        with self.assertRaises(ReplayUnsupported):
+            replay(game.path_to_logs)
+
+
+class TestGameRandomness(unittest.TestCase):
+    def setUp(self):
+        use_small_model()
+
+    def play(self, game, other=None):
+        for hour in range(3):
+            message = copy.deepcopy(MESSAGE)
+            if hour == 1:
+                message["shop_actions"]["buy_root"] = {"directions": [[40, 800]]}
+            game.update(message)
+            if other is not None:
+                # another session of the same process, drawing its own roots in between
+                other.update(copy.deepcopy(message))
+        roots = game.plant.root_generator.to_dict(root_ids=range(len(game.plant.roots)))
+        game.close()
+        return roots
+
+    def game(self, seed):
+        return Game(player_name="random", icon_name="", green_thumbs=100, log=False, seed=seed)
+
+    def test_games_in_one_process(self):
+        alone = self.play(self.game(5))
+        first = self.game(5)
+        other = self.game(6)
+        self.assertEqual(self.play(first, other), alone)
+        other.close()
+
+    def test_module_random_is_untouched(self):
+        state = random.getstate()
+        self.game(7).close()
+        self.assertEqual(random.getstate(), state)
+
+
+if __name__ == '__main__':
+    unittest.main()
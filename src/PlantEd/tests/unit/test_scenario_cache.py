@@ -0,0 +1,32 @@
+import random
+import unittest
+
+from PlantEd.server.environment import Environment, load_weather
+from PlantEd.server.game import scenarios
+
+
+class TestScenarioCache(unittest.TestCase):
+    def test_environments_share_weather(self):
+        first = Environment(0, scenarios["spring_low_nitrate"])
+        second = Environment(0, scenarios["spring_high_nitrate"])
+        self.assertIs(first.weather, second.weather)
+        self.assertIsNot(first.nitrate_grid, second.nitrate_grid)
+
+    def test_keyed_by_file_and_seed(self):
+        spring = scenarios["spring_high_nitrate"]
+        summer = scenarios["summer_high_nitrate"]
+        self.assertIsNot(load_weather(spring["filename"], spring["weather_seed"]),
+                         load_weather(summer["filename"], summer["weather_seed"]))
+
+    def test_weather_leaves_random_module_alone(self):
+        random.seed(1)
+        expected = random.random()
+        random.seed(1)
+        scenario = scenarios["fall_low_nitrate"]
+        # a seed that is not cached yet, so the weather is simulated here
+        load_weather(scenario["filename"], 12345)
+        self.assertEqual(random.random(), expected)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import asyncio
+import unittest
+
+from PlantEd.server.server import Server
+from PlantEd.tests.unit.helpers import TemporaryDirectoryTestCase, use_small_model
+
+LEVEL = {"player_name": "", "icon_name": "", "level_name": "spring_high_nitrate"}
+
+
+class TestServerSessions(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def test_fork_evicts_idle_sessions(self):
+        server = Server(max_sessions=2, idle_timeout=10, executor="inline")
+
+        async def run():
+            idle = await server.handle({"type": "load_level", "message": LEVEL})
+            active = await server.handle({"type": "load_level", "message": LEVEL})
+            server.sessions.get(idle["session_id"]).last_active -= 60
+            fork = await server.handle(
+                {"type": "fork_level", "session_id": active["session_id"], "message": {}})
+            self.assertNotIn("error", fork)
+            self.assertIsNone(server.sessions.get(idle["session_id"]))
+            self.assertIsNotNone(server.sessions.get(fork["session_id"]))
+            await server.close_sessions()
+
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+import asyncio
+import json
+import os
+import signal
+import unittest
+
+from PlantEd.server.executor import discard_game
+from PlantEd.server.game import Game
+from PlantEd.server.server import Server
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestServerSnapshots(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.snapshot_dir = os.path.join(self.tmp.name, "sessions")
+        os.makedirs(self.snapshot_dir)
+        for session_id in ("a", "b"):
+            game = Game(session_id, "", log=False)
+            with open(os.path.join(self.snapshot_dir, session_id + ".snapshot"), "wb") as file:
+                file.write(game.snapshot())
+            with open(os.path.join(self.snapshot_dir, session_id + ".json"), "w") as file:
+                json.dump({"encoding": "json", "delta": False}, file)
+            game.close()
+            # the inline executor keeps restored games in this process
+            self.addCleanup(discard_game, session_id, "close")
+
+    def snapshots(self):
+        return sorted(file for file in os.listdir(self.snapshot_dir) if file.endswith(".snapshot"))
+
+    def test_restore_beyond_max_sessions(self):
+        server = Server(max_sessions=1, snapshot_dir=self.snapshot_dir, executor="inline")
+        asyncio.run(server.restore_sessions())
+        self.assertEqual(len(server.sessions), 1)
+        self.assertIsNotNone(server.sessions.get("a"))
+        # the snapshot that didn't fit is kept for a later start
+        self.assertEqual(self.snapshots(), ["b.snapshot"])
+
+    def test_sigterm_saves_sessions(self):
+        server = Server(snapshot_dir=self.snapshot_dir, executor="inline")
+
+        async def run():
+            asyncio.get_running_loop().call_later(0.5, os.kill, os.getpid(), signal.SIGTERM)
+            await server.main(0)
+
+        asyncio.run(run())
+        self.assertEqual(self.snapshots(), ["a.snapshot", "b.snapshot"])
+
+
+class TestServerShutdown(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+
+    def test_sigterm_writes_buffered_logs(self):
+        server = Server(executor="inline")
+
+        async def run():
+            main = asyncio.ensure_future(server.main(0))
+            await asyncio.sleep(0)  # the server runs and handles signals
+            response = await server.handle({"type": "load_level", "message": {
+                "player_name": "", "icon_name": "", "level_name": "spring_high_nitrate"}})
+            for _ in range(3):
+                await server.handle({"type": "simulate", "session_id": response["session_id"], "message": MESSAGE})
+            os.kill(os.getpid(), signal.SIGTERM)
+            await main
+
+        asyncio.run(run())
+        self.assertEqual(len(server.sessions), 0)
+        [game_dir] = os.listdir("data/finished_games")
+        with open(os.path.join("data/finished_games", game_dir, "model_logs.csv")) as file:
+            # header and one row per update, fewer than the log buffers
+            self.assertEqual(len(file.readlines()), 1 + 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,41 @@
+import unittest
+
+from PlantEd.server.sessions import SessionRegistry, SessionLimitReached
+
+
+class TestSessionRegistry(unittest.TestCase):
+    def test_open_and_get(self):
+        registry = SessionRegistry(max_sessions=2)
+        first = registry.open()
+        second = registry.open()
+        self.assertIs(registry.get(first.session_id), first)
+        self.assertIs(registry.get(second.session_id), second)
+        self.assertNotEqual(first.session_id, second.session_id)
+
+    def test_without_id_only_single_session_is_returned(self):
+        registry = SessionRegistry()
+        self.assertIsNone(registry.get())
+        session = registry.open()
+        self.assertIs(registry.get(), session)
+        registry.open()
+        self.assertIsNone(registry.get())
+
+    def test_session_cap(self):
+        registry = SessionRegistry(max_sessions=1)
+        registry.open()
+        with self.assertRaises(SessionLimitReached):
+            registry.open()
+
+    def test_evict_idle(self):
+        registry = SessionRegistry(idle_timeout=10)
+        idle = registry.open()
+        active = registry.open()
+        active.last_active = idle.last_active + 15
+        evicted = registry.evict_idle(now=idle.last_active + 20)
+        self.assertEqual(evicted, [idle])
+        self.assertNotIn(idle.session_id, registry)
+        self.assertIn(active.session_id, registry)
+
+
+if __name__ == '__main__':
+    unittest.main()
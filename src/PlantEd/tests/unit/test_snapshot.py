@@ -0,0 +1,59 @@
+import random
+import unittest
+
+from PlantEd.server.game import Game
+from PlantEd.tests.unit.helpers import MESSAGE, summary, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestSnapshot(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.game = Game("snapshot", "icon", "spring_high_nitrate")
+        for _ in range(12):
+            self.game.update(MESSAGE)
+
+    def tearDown(self):
+        self.game.close()
+
+    def test_restore_continues_identically(self):
+        restored = Game.restore(self.game.snapshot(), path_to_logs="./data/restored")
+        self.assertEqual(summary(restored), summary(self.game))
+        for _ in range(12):
+            self.game.update(MESSAGE)
+            restored.update(MESSAGE)
+        self.assertEqual(summary(restored), summary(self.game))
+        restored.close()
+
+    def test_restore_keeps_other_games(self):
+        other = Game("other", "icon", "spring_high_nitrate")
+        other_state = other.plant.rng.getstate()
+        module_state = random.getstate()
+        restored = Game.restore(self.game.snapshot(), path_to_logs="./data/restored")
+        self.assertEqual(other.plant.rng.getstate(), other_state)
+        self.assertEqual(random.getstate(), module_state)
+        # the restored game draws the roots its origin draws
+        buy_root = {**MESSAGE, "shop_actions": {**MESSAGE["shop_actions"], "buy_root": {"directions": [[40, 800]]}}}
+        self.game.update(buy_root)
+        restored.update(buy_root)
+        self.assertEqual(len(restored.plant.roots), 2)
+        root_ids = range(len(self.game.plant.roots))
+        self.assertEqual(restored.plant.root_generator.to_dict(root_ids),
+                         self.game.plant.root_generator.to_dict(root_ids))
+        restored.close()
+        other.close()
+
+    def test_fork_is_independent(self):
+        fork = self.game.fork("fork")
+        for _ in range(12):
+            self.game.update(MESSAGE)
+            fork.update(MESSAGE)
+        self.assertEqual(summary(fork), summary(self.game))
+        fork.update({**MESSAGE, "delta_t": 3600 * 6})
+        self.assertNotEqual(summary(fork), summary(self.game))
+        self.assertNotEqual(fork.path_to_logs, self.game.path_to_logs)
+        fork.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,33 @@
+import unittest
+
+from PlantEd.server.game import Game
+from PlantEd.tests.unit.helpers import MESSAGE, TemporaryDirectoryTestCase, use_small_model
+
+
+class TestUpdateBatch(TemporaryDirectoryTestCase):
+    def setUp(self):
+        super().setUp()
+        use_small_model()
+        self.game = Game("batch", "icon", "spring_high_nitrate")
+
+    def tearDown(self):
+        self.game.close()
+
+    def test_last_state_keeps_new_roots(self):
+        buy_root = {**MESSAGE, "shop_actions": {**MESSAGE["shop_actions"], "buy_root": {"directions": [[40, 800]]}}}
+        result = self.game.update_batch([MESSAGE, buy_root], every=2)
+        self.assertEqual(result["n_steps"], 2)
+        self.assertEqual(len(result["states"]), 1)
+        # the state is built once, the first root and the one bought in the last step are in it
+        self.assertIs(result["state"], result["states"][-1])
+        self.assertEqual(len(result["state"]["plant"]["root"]["roots"]), 2)
+
+    def test_state_without_every(self):
+        result = self.game.update_batch([MESSAGE, MESSAGE])
+        self.assertEqual(result["states"], [])
+        # the first root of the plant was never sent before
+        self.assertEqual(len(result["state"]["plant"]["root"]["roots"]), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,90 @@
+import os
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from PlantEd.server.uploads import UploadQueue, spool_score
+
+
+class StandInHighscoreServer(BaseHTTPRequestHandler):
+    status_code = 200
+    received = []
+
+    def do_POST(self):
+        self.received.append(self.rfile.read(int(self.headers["Content-Length"])))
+        self.send_response(self.status_code)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class TestUploadQueue(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.spool_dir = os.path.join(self.tmp.name, "score_spool")
+        self.logs = os.path.join(self.tmp.name, "game")
+        os.makedirs(self.logs)
+        with open(os.path.join(self.logs, "model_logs.csv"), "w") as file:
+            file.write("time,seed_biomass\n0,0.1\n")
+
+        StandInHighscoreServer.status_code = 200
+        StandInHighscoreServer.received = []
+        self.http = HTTPServer(("localhost", 0), StandInHighscoreServer)
+        threading.Thread(target=self.http.serve_forever, daemon=True).start()
+        self.url = f"http://localhost:{self.http.server_port}/post.php"
+
+    def tearDown(self):
+        self.http.shutdown()
+        self.http.server_close()
+        self.tmp.cleanup()
+
+    def test_upload(self):
+        queue = UploadQueue(spool_dir=self.spool_dir, url=self.url)
+        spool_score("player", 1.5, self.logs, "icon", spool_dir=self.spool_dir)
+        self.assertEqual(queue.status()["pending"], 1)
+        self.assertIsNone(queue.process())
+        self.assertEqual(queue.status(), {"pending": 0, "uploaded": 1, "failed": 0, "last_error": None})
+        self.assertIn(b"player", StandInHighscoreServer.received[0])
+
+    def test_retry_with_backoff(self):
+        StandInHighscoreServer.status_code = 500
+        queue = UploadQueue(spool_dir=self.spool_dir, url=self.url, retry_delay=10, max_attempts=3)
+        spool_score("player", 1.5, self.logs, "icon", spool_dir=self.spool_dir)
+        self.assertEqual(queue.process(now=0), 10)
+        self.assertEqual(queue.process(now=5), 5)  # not due yet
+        self.assertEqual(len(StandInHighscoreServer.received), 1)
+        self.assertEqual(queue.process(now=10), 20)
+        self.assertIsNotNone(queue.status()["last_error"])
+
+        StandInHighscoreServer.status_code = 200
+        queue.process(now=30)
+        self.assertEqual(queue.status()["pending"], 0)
+        self.assertEqual(queue.status()["uploaded"], 1)
+
+    def test_give_up(self):
+        StandInHighscoreServer.status_code = 500
+        queue = UploadQueue(spool_dir=self.spool_dir, url=self.url, retry_delay=0, max_attempts=2)
+        spool_score("player", 1.5, self.logs, "icon", spool_dir=self.spool_dir)
+        queue.process(now=0)
+        queue.process(now=1)
+        self.assertEqual(queue.status()["pending"], 0)
+        self.assertEqual(queue.status()["failed"], 1)
+        self.assertTrue(any(file.endswith(".failed") for file in os.listdir(self.spool_dir)))
+
+    def test_background_thread(self):
+        queue = UploadQueue(spool_dir=self.spool_dir, url=self.url)
+        queue.start()
+        spool_score("player", 1.5, self.logs, "icon", spool_dir=self.spool_dir)
+        queue.wake()
+        for _ in range(100):
+            if queue.status()["uploaded"]:
+                break
+            threading.Event().wait(0.05)
+        queue.stop(timeout=1)
+        self.assertEqual(queue.status()["uploaded"], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
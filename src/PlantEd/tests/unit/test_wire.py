@@ -0,0 +1,63 @@
+import json
+import unittest
+
+import numpy as np
+
+from PlantEd.server import wire
+
+
+class TestWireFormat(unittest.TestCase):
+    def setUp(self):
+        self.state = {
+            "running": True,
+            "plant": {
+                "leafs_biomass": [(0, 0.01), (1, 0.02)],
+                "stems_biomass": [(0, 0.02, 3)],
+                "roots_biomass": [(0, 0.02)],
+                "seeds_biomass": [],
+                "starch_pool": 2.5,
+                },
+            "environment": {
+                "water_grid": np.arange(120, dtype=float).reshape(20, 6),
+                "nitrate_grid": np.ones((20, 6)),
+                "temperature": 12.5,
+                },
+            "gametime": 3600,
+            }
+
+    def test_round_trip(self):
+        decoded = wire.decode(wire.encode(self.state))
+        self.assertEqual(decoded["running"], True)
+        self.assertEqual(decoded["gametime"], 3600)
+        self.assertEqual(decoded["environment"]["temperature"], 12.5)
+        self.assertEqual(decoded["plant"]["starch_pool"], 2.5)
+        np.testing.assert_array_equal(decoded["environment"]["water_grid"], self.state["environment"]["water_grid"])
+        np.testing.assert_allclose(decoded["plant"]["leafs_biomass"], [[0, 0.01], [1, 0.02]], rtol=1e-6)
+        self.assertEqual(decoded["plant"]["stems_biomass"].shape, (1, 3))
+        self.assertEqual(len(decoded["plant"]["seeds_biomass"]), 0)
+
+    def test_input_is_not_modified(self):
+        wire.encode(self.state)
+        self.assertIn("water_grid", self.state["environment"])
+        self.assertIsInstance(self.state["plant"]["leafs_biomass"], list)
+
+    def test_missing_fields_are_skipped(self):
+        self.assertEqual(wire.decode(wire.encode({})), {})
+
+    def test_json_fallback(self):
+        decoded = json.loads(json.dumps(self.state, default=wire.json_default))
+        self.assertEqual(decoded["environment"]["water_grid"][1][0], 6.0)
+
+    def test_binary_is_smaller_than_json(self):
+        self.assertLess(len(wire.encode(self.state)), len(json.dumps(self.state, default=wire.json_default)))
+
+    def test_batch_round_trip(self):
+        batch = {"n_steps": 3, "state": self.state, "states": [], "observations": np.ones((3, 21))}
+        decoded = wire.decode(wire.encode(batch, paths=wire.BATCH_ARRAYS))
+        self.assertEqual(decoded["observations"].shape, (3, 21))
+        self.assertEqual(decoded["state"]["environment"]["water_grid"].shape, (20, 6))
+        self.assertEqual(decoded["n_steps"], 3)
+
+
+if __name__ == '__main__':
+    unittest.main()